@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+try:
+    from backend.functions.lexical_search_service import (
+        FILE_TO_BOOK_CODE,
+        MAX_BOOK_SEARCH,
+        _iter_lexical_excel_files,
+        _resolve_book_label,
+        _search_lexical_source_internal,
+    )
+    from backend.functions.semantic_search_service import AVERAGE_QUERY_SCORING, _normalize_index_id, search_semantic_index_async
+except Exception:
+    from functions.lexical_search_service import (
+        FILE_TO_BOOK_CODE,
+        MAX_BOOK_SEARCH,
+        _iter_lexical_excel_files,
+        _resolve_book_label,
+        _search_lexical_source_internal,
+    )
+    from functions.semantic_search_service import AVERAGE_QUERY_SCORING, _normalize_index_id, search_semantic_index_async
+
+
+RRF_FUSION = "rrf"
+WEIGHTED_FUSION = "weighted"
+HYBRID_FUSION_METHODS = (RRF_FUSION, WEIGHTED_FUSION)
+HYBRID_RRF_K = 60
+HYBRID_CANDIDATE_MULTIPLIER = 4
+DEFAULT_HYBRID_SEMANTIC_WEIGHT = 0.5
+
+
+def _resolve_lexical_source(index_id: str) -> tuple[Path, str, str, str]:
+    for source_path in _iter_lexical_excel_files():
+        file_stem = source_path.stem.strip()
+        if file_stem.lower() != index_id:
+            continue
+        book_code = FILE_TO_BOOK_CODE.get(file_stem, file_stem)
+        return source_path, book_code, _resolve_book_label(book_code, file_stem), file_stem
+    raise FileNotFoundError(f"Base lexical nao encontrada para o indice semantico: {index_id}.")
+
+
+def _normalize_fusion_method(value: Any) -> str:
+    method = str(value or RRF_FUSION).strip().lower()
+    if method not in HYBRID_FUSION_METHODS:
+        raise ValueError(f"Metodo de fusao invalido: {value}.")
+    return method
+
+
+def _hybrid_key(match: dict[str, Any], index_id: str) -> tuple[str, int]:
+    # Chunks do mesmo paragrafo compartilham a linha de origem; o paragrafo e a unidade de fusao.
+    return index_id, int(match.get("row") or 0)
+
+
+def _lexical_match_payload(match: dict[str, Any], index_id: str, index_label: str) -> dict[str, Any]:
+    return {
+        "book": index_id.upper(),
+        "index_id": index_id,
+        "index_label": index_label,
+        "row": int(match.get("row") or 0),
+        "text": str(match.get("text") or "").strip(),
+        "metadata": {
+            key: value
+            for key, value in (
+                ("title", match.get("title")),
+                ("number", match.get("number")),
+                ("pagina", match.get("pagina")),
+            )
+            if value not in (None, "")
+        },
+        "score": 0.0,
+        "semantic_score": None,
+        "alignment_score": None,
+    }
+
+
+def fuse_hybrid_rankings(
+    lexical_matches: list[dict[str, Any]],
+    semantic_matches: list[dict[str, Any]],
+    *,
+    index_id: str,
+    index_label: str,
+    limit: int,
+    fusion: str = RRF_FUSION,
+    semantic_weight: float = DEFAULT_HYBRID_SEMANTIC_WEIGHT,
+    rrf_k: int = HYBRID_RRF_K,
+) -> list[dict[str, Any]]:
+    method = _normalize_fusion_method(fusion)
+    semantic_weight = min(1.0, max(0.0, float(semantic_weight)))
+    lexical_weight = 1.0 - semantic_weight
+
+    # Cada chave guarda (payload, rank lexical, rank semantico); ranks comecam em 1.
+    fused: dict[tuple[str, int], list[Any]] = {}
+    for rank, match in enumerate(semantic_matches, start=1):
+        key = _hybrid_key(match, index_id)
+        if key not in fused:
+            fused[key] = [dict(match), None, rank]
+    for rank, match in enumerate(lexical_matches, start=1):
+        key = _hybrid_key(match, index_id)
+        entry = fused.get(key)
+        if entry is None:
+            fused[key] = [_lexical_match_payload(match, index_id, index_label), rank, None]
+        elif entry[1] is None:
+            entry[1] = rank
+
+    lexical_count = max(1, len(lexical_matches))
+    results: list[dict[str, Any]] = []
+    for payload, lexical_rank, semantic_rank in fused.values():
+        if method == RRF_FUSION:
+            hybrid_score = 0.0
+            if lexical_rank is not None:
+                hybrid_score += lexical_weight / (rrf_k + lexical_rank)
+            if semantic_rank is not None:
+                hybrid_score += semantic_weight / (rrf_k + semantic_rank)
+        else:
+            # A busca lexical nao tem score; usa o rank normalizado como relevancia em [0, 1].
+            lexical_score = 1.0 - ((lexical_rank - 1) / lexical_count) if lexical_rank is not None else 0.0
+            semantic_score = float(payload.get("score") or 0.0) if semantic_rank is not None else 0.0
+            hybrid_score = (lexical_weight * lexical_score) + (semantic_weight * semantic_score)
+        payload["hybrid_score"] = float(hybrid_score)
+        payload["lexical_rank"] = lexical_rank
+        payload["semantic_rank"] = semantic_rank
+        payload["sources"] = [
+            source
+            for source, rank in (("lexical", lexical_rank), ("semantic", semantic_rank))
+            if rank is not None
+        ]
+        results.append(payload)
+
+    results.sort(
+        key=lambda item: (
+            -item["hybrid_score"],
+            item["semantic_rank"] if item["semantic_rank"] is not None else float("inf"),
+            item["lexical_rank"] if item["lexical_rank"] is not None else float("inf"),
+            item["row"],
+        )
+    )
+    return results[:max(1, int(limit or 1))]
+
+
+async def search_hybrid_index_async(
+    index_id: str,
+    query: str,
+    limit: int,
+    api_key: str,
+    min_score: float | None = None,
+    use_rag_context: bool = False,
+    vector_store_ids: list[str] | None = None,
+    ignore_base_calibration: bool = False,
+    fusion: str = RRF_FUSION,
+    semantic_weight: float = DEFAULT_HYBRID_SEMANTIC_WEIGHT,
+    query_scoring: str = AVERAGE_QUERY_SCORING,
+) -> dict[str, Any]:
+    normalized_index_id = _normalize_index_id(index_id)
+    fusion = _normalize_fusion_method(fusion)
+    source_path, book_code, book_label, file_stem = _resolve_lexical_source(normalized_index_id)
+    max_rows = max(1, int(limit or 1))
+    candidate_limit = min(MAX_BOOK_SEARCH, max_rows * HYBRID_CANDIDATE_MULTIPLIER)
+
+    # Lexical (openpyxl) roda numa thread enquanto o pipeline semantico resolve embeddings e scoring.
+    lexical_result, semantic_result = await asyncio.gather(
+        asyncio.to_thread(
+            _search_lexical_source_internal,
+            source_path=source_path,
+            resolved_book_code=book_code,
+            resolved_book_label=book_label,
+            file_stem=file_stem,
+            term=query,
+            limit=candidate_limit,
+        ),
+        search_semantic_index_async(
+            normalized_index_id,
+            query,
+            candidate_limit,
+            api_key,
+            min_score=min_score,
+            exclude_lexical_duplicates=False,
+            use_rag_context=use_rag_context,
+            vector_store_ids=vector_store_ids,
+            ignore_base_calibration=ignore_base_calibration,
+            query_scoring=query_scoring,
+        ),
+    )
+    lexical_total, lexical_matches = lexical_result
+    semantic_total, _, recommended_min_score, effective_min_score, rag_context, semantic_matches = semantic_result
+    index_label = str(semantic_matches[0].get("index_label") or book_label) if semantic_matches else book_label
+    matches = fuse_hybrid_rankings(
+        lexical_matches,
+        semantic_matches,
+        index_id=normalized_index_id,
+        index_label=index_label,
+        limit=max_rows,
+        fusion=fusion,
+        semantic_weight=semantic_weight,
+    )
+    return {
+        "lexical_total": lexical_total,
+        "semantic_total": semantic_total,
+        "recommended_min_score": recommended_min_score,
+        "effective_min_score": effective_min_score,
+        "rag_context": rag_context,
+        "matches": matches,
+    }
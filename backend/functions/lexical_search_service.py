@@ -242,7 +242,7 @@ def _compile_boolean_predicate(query: str) -> Callable[[str], bool]:
     return _predicate
 
 
-def _compile_prefilter(query: str) -> Optional[Callable[[str], bool]]:
+def _extract_prefilter_literals(query: str) -> Optional[tuple[list[str], list[str]]]:
     q = _sanitize_search_text(query)
     if not q:
         return None
@@ -279,6 +279,15 @@ def _compile_prefilter(query: str) -> Optional[Callable[[str], bool]]:
 
     if not must_have and not must_not:
         return None
+    return must_have, must_not
+
+
+def _compile_prefilter(query: str) -> Optional[Callable[[str], bool]]:
+    literals = _extract_prefilter_literals(query)
+    if literals is None:
+        return None
+
+    must_have, must_not = literals
 
     def _prefilter(pnorm: str) -> bool:
         return all(lit in pnorm for lit in must_have) and all(lit not in pnorm for lit in must_not)
@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import json
+import time
+import tracemalloc
+from collections.abc import Callable
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+
+try:
+    from backend.functions import semantic_search_service
+    from backend.functions.semantic_chunking import chunk_semantic_text, chunk_semantic_text_linear, resolve_chunk_measure
+    from backend.functions.semantic_embedding_providers import STUB_EMBEDDING_PROVIDER
+    from backend.functions.semantic_embedding_shards import ShardedEmbeddings
+    from backend.functions.semantic_index_builder import _write_json_atomic, rebuild_semantic_index
+except Exception:
+    from functions import semantic_search_service
+    from functions.semantic_chunking import chunk_semantic_text, chunk_semantic_text_linear, resolve_chunk_measure
+    from functions.semantic_embedding_providers import STUB_EMBEDDING_PROVIDER
+    from functions.semantic_embedding_shards import ShardedEmbeddings
+    from functions.semantic_index_builder import _write_json_atomic, rebuild_semantic_index
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore[assignment]
+
+
+BENCHMARK_VERSION = 1
+BENCHMARK_DENSE_MODE = "dense"
+BENCHMARK_SHARDED_MODE = "sharded"
+BENCHMARK_INDEX_PREFIX = "bench_"
+DEFAULT_BENCHMARK_ROWS = 5000
+DEFAULT_BENCHMARK_DIMENSIONS = 256
+DEFAULT_BENCHMARK_QUERIES = 50
+DEFAULT_BENCHMARK_TOP_K = 10
+DEFAULT_BENCHMARK_SEED = 0
+BENCHMARK_TOPIC_ROWS = 50
+BENCHMARK_TOPIC_WORDS = 24
+BENCHMARK_COMMON_WORDS = 200
+BENCHMARK_QUERY_TERMS = 4
+DEFAULT_CHUNKING_REPEATS = 3
+
+
+def _synthetic_word(rng: np.random.Generator) -> str:
+    syllables = ("ca", "de", "fi", "lo", "mu", "ra", "se", "ti", "vo", "xe", "ne", "pa", "qui", "bro", "zen")
+    return "".join(syllables[int(position)] for position in rng.integers(0, len(syllables), size=int(rng.integers(2, 5))))
+
+
+def build_synthetic_rows(rows: int, seed: int = DEFAULT_BENCHMARK_SEED) -> list[dict[str, Any]]:
+    # Cada linha mistura vocabulario do proprio topico com palavras comuns, imitando verbetes de um mesmo tema.
+    rng = np.random.default_rng(seed)
+    topic_count = max(1, int(rows) // BENCHMARK_TOPIC_ROWS)
+    common_words = [_synthetic_word(rng) for _ in range(BENCHMARK_COMMON_WORDS)]
+    topic_words = [[f"{_synthetic_word(rng)}{topic}" for _ in range(BENCHMARK_TOPIC_WORDS)] for topic in range(topic_count)]
+    synthetic_rows: list[dict[str, Any]] = []
+    for position in range(max(0, int(rows))):
+        topic = int(rng.integers(0, topic_count))
+        words = [topic_words[topic][int(item)] for item in rng.integers(0, BENCHMARK_TOPIC_WORDS, size=10)]
+        words += [common_words[int(item)] for item in rng.integers(0, BENCHMARK_COMMON_WORDS, size=6)]
+        rng.shuffle(words)
+        text = " ".join(words).capitalize() + "."
+        synthetic_rows.append({
+            "row": position + 2,
+            "text": text,
+            "text_plain": text,
+            "metadata": {"title": f"Topico {topic}"},
+        })
+    return synthetic_rows
+
+
+def build_benchmark_queries(rows: list[dict[str, Any]], count: int, seed: int = DEFAULT_BENCHMARK_SEED) -> list[str]:
+    rng = np.random.default_rng(seed + 1)
+    texts = [str(row.get("text_plain") or row.get("text") or "") for row in rows]
+    texts = [text for text in texts if text.split()]
+    if not texts:
+        return []
+    queries: list[str] = []
+    for position in rng.integers(0, len(texts), size=max(0, int(count))):
+        words = texts[int(position)].rstrip(".").lower().split()
+        picked = rng.choice(len(words), size=min(BENCHMARK_QUERY_TERMS, len(words)), replace=False)
+        queries.append(" ".join(words[int(item)] for item in sorted(picked)))
+    return queries
+
+
+def build_benchmark_index(
+    index_dir: Path,
+    rows: list[dict[str, Any]],
+    *,
+    dimensions: int = DEFAULT_BENCHMARK_DIMENSIONS,
+    shard_rows: int | None = None,
+) -> dict[str, Any]:
+    index_dir.mkdir(parents=True, exist_ok=True)
+    model = f"stub-hash-{int(dimensions)}"
+    (index_dir / "manifest.json").write_text(
+        json.dumps({"index_label": index_dir.name.upper(), "embedding_provider": STUB_EMBEDDING_PROVIDER, "model": model}),
+        encoding="utf-8",
+    )
+    (index_dir / "metadata.json").write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+    started = time.perf_counter()
+    result = rebuild_semantic_index(index_dir, api_key="", provider=STUB_EMBEDDING_PROVIDER, model=model, shard_rows=shard_rows)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def _latency_summary(samples_ms: list[float]) -> dict[str, float]:
+    if not samples_ms:
+        return {"p50": 0.0, "p95": 0.0, "mean": 0.0, "max": 0.0}
+    values = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "mean": round(float(values.mean()), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def _recall_at_k(expected_rows: list[int], found_rows: list[int]) -> float:
+    if not expected_rows:
+        return 1.0
+    return len(set(expected_rows) & set(found_rows)) / len(expected_rows)
+
+
+def _exact_top_rows(loaded: dict[str, Any], query_vector: np.ndarray, k: int) -> list[int]:
+    # Referencia exata: produto em float32 e ordenacao total, sem corte nem rerank.
+    embeddings = loaded["embeddings"]
+    metadata = loaded["metadata"]
+    if isinstance(embeddings, ShardedEmbeddings):
+        # Mesmo desempate (score decrescente, posicao crescente) pelo merge dos top-k de cada shard.
+        order, _, _, _ = embeddings.top_k(query_vector.astype(np.float32), k)
+    else:
+        scores = np.asarray(embeddings @ query_vector.astype(np.float32), dtype=np.float32).reshape(-1)
+        order = np.argsort(-scores, kind="stable")[:k]
+    return [int(metadata[int(position)].get("row") or 0) for position in order]
+
+
+def _peak_traced_bytes(run: Callable[[], Any]) -> int:
+    # tracemalloc distorce a latencia; a memoria e medida numa execucao separada.
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+    return max(0, int(peak - baseline))
+
+
+def _max_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    # Linux reporta ru_maxrss em KiB.
+    return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+
+
+@contextmanager
+def _benchmark_index_caches() -> Iterator[None]:
+    # A pasta dos indices e passada explicitamente; SEMANTIC_DIR do processo nunca e alterado.
+    # Ao sair, os caches nao guardam indices nem resultados do benchmark.
+    semantic_search_service.clear_semantic_result_cache()
+    try:
+        yield
+    finally:
+        semantic_search_service.clear_semantic_result_cache()
+        with semantic_search_service._SEMANTIC_INDEX_CACHE_LOCK:
+            for index_id in [key for key in semantic_search_service._SEMANTIC_INDEX_CACHE if key.startswith(BENCHMARK_INDEX_PREFIX)]:
+                semantic_search_service._SEMANTIC_INDEX_CACHE.pop(index_id, None)
+
+
+def _benchmark_mode(
+    semantic_dir: Path,
+    index_id: str,
+    queries: list[str],
+    *,
+    k: int,
+    parallel_overview: bool,
+) -> dict[str, Any]:
+    with _benchmark_index_caches():
+        loaded = semantic_search_service._load_semantic_index(index_id, semantic_dir=semantic_dir)
+        label = str(loaded["manifest"].get("index_label") or index_id)
+        # Mesmo vetor de query (com expansoes) que o pipeline de busca usaria.
+        query_vectors = [
+            semantic_search_service._get_semantic_query_vector(
+                query,
+                api_key="",
+                model=str(loaded["manifest"].get("model") or ""),
+                provider=STUB_EMBEDDING_PROVIDER,
+            )
+            for query in queries
+        ]
+        expected = [_exact_top_rows(loaded, vector, k) for vector in query_vectors]
+
+        def _score(query: str, vector: np.ndarray) -> dict[str, Any]:
+            return semantic_search_service._score_matches(
+                loaded["metadata"],
+                loaded["embeddings"],
+                loaded["search_texts"],
+                vector,
+                index_id,
+                label,
+                limit=k,
+                min_score=0.0,
+                exclude_lexical_duplicates=False,
+                lexical_query=query,
+                search_postings=loaded.get("search_postings"),
+                metadata_texts=loaded.get("metadata_texts"),
+                metadata_postings=loaded.get("metadata_postings"),
+                source_groups=loaded.get("source_groups"),
+            )
+
+        def _overview(query: str) -> list[dict[str, Any]]:
+            semantic_search_service.clear_semantic_result_cache()
+            groups = semantic_search_service.search_semantic_overview_with_total(
+                query,
+                limit=k,
+                api_key="",
+                min_score=0.0,
+                exclude_lexical_duplicates=False,
+                parallel=parallel_overview,
+                semantic_dir=semantic_dir,
+            )[-1]
+            return [match for group in groups for match in group["matches"]]
+
+        score_latencies: list[float] = []
+        score_recalls: list[float] = []
+        for query, vector, expected_rows in zip(queries, query_vectors, expected):
+            started = time.perf_counter()
+            ranked = _score(query, vector)
+            score_latencies.append((time.perf_counter() - started) * 1000)
+            score_recalls.append(_recall_at_k(expected_rows, [int(match["row"]) for match in ranked["matches"]]))
+
+        overview_latencies: list[float] = []
+        overview_recalls: list[float] = []
+        for query, expected_rows in zip(queries, expected):
+            started = time.perf_counter()
+            matches = _overview(query)
+            overview_latencies.append((time.perf_counter() - started) * 1000)
+            overview_recalls.append(_recall_at_k(expected_rows, [int(match["row"]) for match in matches]))
+
+        score_peak = _peak_traced_bytes(lambda: _score(queries[0], query_vectors[0])) if queries else 0
+        overview_peak = _peak_traced_bytes(lambda: _overview(queries[0])) if queries else 0
+
+    return {
+        "rows": int(loaded["embeddings"].shape[0]),
+        "embeddingShards": int(getattr(loaded["embeddings"], "shard_count", 0)),
+        "scoreMatches": {
+            "recallAtK": round(float(np.mean(score_recalls)) if score_recalls else 1.0, 4),
+            "latencyMs": _latency_summary(score_latencies),
+            "peakTracedBytes": score_peak,
+        },
+        "overview": {
+            "recallAtK": round(float(np.mean(overview_recalls)) if overview_recalls else 1.0, 4),
+            "latencyMs": _latency_summary(overview_latencies),
+            "peakTracedBytes": overview_peak,
+        },
+    }
+
+
+def run_semantic_benchmark(
+    work_dir: Path,
+    *,
+    rows: int = DEFAULT_BENCHMARK_ROWS,
+    dimensions: int = DEFAULT_BENCHMARK_DIMENSIONS,
+    queries: int = DEFAULT_BENCHMARK_QUERIES,
+    k: int = DEFAULT_BENCHMARK_TOP_K,
+    seed: int = DEFAULT_BENCHMARK_SEED,
+    shard_rows: int | None = None,
+    source_rows: list[dict[str, Any]] | None = None,
+    parallel_overview: bool = False,
+    output_path: Path | None = None,
+) -> dict[str, Any]:
+    """Mede recall@k, latencia e memoria da busca semantica sobre indices construidos com o embedder stub."""
+    corpus = list(source_rows[:rows]) if source_rows is not None else build_synthetic_rows(rows, seed=seed)
+    benchmark_queries = build_benchmark_queries(corpus, queries, seed=seed)
+    top_k = max(1, int(k or DEFAULT_BENCHMARK_TOP_K))
+    modes = [(BENCHMARK_DENSE_MODE, None)]
+    if shard_rows:
+        modes.append((BENCHMARK_SHARDED_MODE, int(shard_rows)))
+
+    report: dict[str, Any] = {
+        "version": BENCHMARK_VERSION,
+        "generatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "source": "fixture" if source_rows is not None else "synthetic",
+            "rows": len(corpus),
+            "dimensions": int(dimensions),
+            "queries": len(benchmark_queries),
+            "k": top_k,
+            "seed": int(seed),
+            "shardRows": int(shard_rows) if shard_rows else None,
+            "parallelOverview": bool(parallel_overview),
+        },
+        "modes": {},
+    }
+    for mode, mode_shard_rows in modes:
+        # Cada modo tem sua propria pasta de indices para que o overview enxergue um unico indice.
+        semantic_dir = work_dir / mode
+        index_id = f"{BENCHMARK_INDEX_PREFIX}{mode}"
+        build = build_benchmark_index(semantic_dir / index_id, corpus, dimensions=dimensions, shard_rows=mode_shard_rows)
+        mode_report = _benchmark_mode(
+            semantic_dir,
+            index_id,
+            benchmark_queries,
+            k=top_k,
+            parallel_overview=parallel_overview,
+        )
+        mode_report["build"] = {"chunks": int(build["rows_after"]), "elapsedMs": build["elapsed_ms"]}
+        report["modes"][mode] = mode_report
+    report["maxRssBytes"] = _max_rss_bytes()
+
+    if output_path is not None:
+        _write_json_atomic(output_path, report)
+    return report
+
+
+def build_synthetic_long_texts(rows: int, seed: int = DEFAULT_BENCHMARK_SEED) -> list[str]:
+    # Agrupa as linhas sinteticas por blocos para gerar textos longos o bastante para serem chunkados.
+    texts = [str(row["text_plain"]) for row in build_synthetic_rows(rows, seed=seed)]
+    return [" ".join(texts[start:start + BENCHMARK_TOPIC_ROWS]) for start in range(0, len(texts), BENCHMARK_TOPIC_ROWS)]
+
+
+def _time_chunker(chunker: Callable[[str], list[str]], texts: list[str], repeats: int) -> tuple[float, list[list[str]]]:
+    best_ms = float("inf")
+    chunks: list[list[str]] = []
+    for _ in range(max(1, int(repeats))):
+        started = time.perf_counter()
+        chunks = [chunker(text) for text in texts]
+        best_ms = min(best_ms, (time.perf_counter() - started) * 1000)
+    return round(best_ms, 3), chunks
+
+
+def run_chunking_benchmark(
+    texts: list[str],
+    *,
+    repeats: int = DEFAULT_CHUNKING_REPEATS,
+    target_chars: int | None = None,
+    max_chars: int | None = None,
+    min_chars: int | None = None,
+    tokenizer: str | None = None,
+    output_path: Path | None = None,
+) -> dict[str, Any]:
+    """Compara chunk_semantic_text com chunk_semantic_text_linear sobre o mesmo corpus (melhor de N execucoes)."""
+    limits = {
+        key: int(value)
+        for key, value in (("target_chars", target_chars), ("max_chars", max_chars), ("min_chars", min_chars))
+        if value is not None
+    }
+    measure = resolve_chunk_measure(tokenizer)
+    total_chars = sum(len(text) for text in texts)
+    reference_ms, reference_chunks = _time_chunker(lambda text: chunk_semantic_text(text, **limits), texts, repeats)
+    linear_ms, linear_chunks = _time_chunker(lambda text: chunk_semantic_text_linear(text, measure=measure, **limits), texts, repeats)
+
+    def _summary(elapsed_ms: float, chunks: list[list[str]]) -> dict[str, Any]:
+        return {
+            "elapsedMs": elapsed_ms,
+            "chunks": sum(len(items) for items in chunks),
+            "charsPerSecond": round(total_chars / (elapsed_ms / 1000), 1) if elapsed_ms else None,
+        }
+
+    report = {
+        "version": BENCHMARK_VERSION,
+        "generatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {"texts": len(texts), "chars": total_chars, "repeats": max(1, int(repeats)), "tokenizer": tokenizer, **limits},
+        "reference": _summary(reference_ms, reference_chunks),
+        "linear": _summary(linear_ms, linear_chunks),
+        "speedup": round(reference_ms / linear_ms, 3) if linear_ms else None,
+        # Em caracteres os dois chunkers devem cortar igual; em tokens a divergencia e esperada.
+        "identicalTexts": sum(1 for left, right in zip(reference_chunks, linear_chunks) if left == right),
+    }
+    if output_path is not None:
+        _write_json_atomic(output_path, report)
+    return report
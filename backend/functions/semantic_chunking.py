@@ -1,6 +1,10 @@
 from __future__ import annotations
 
 import re
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import chain
 from typing import Any
 
 
@@ -9,13 +13,26 @@ DEFAULT_CHUNK_MAX_CHARS = 420
 DEFAULT_CHUNK_MIN_CHARS = 110
 SPLIT_SENTENCE_RE = re.compile(r"(?<=[\.\!\?\:\;])\s+")
 SPLIT_STRUCTURAL_RE = re.compile(r"\n{2,}|\s+\|\s+|\s+[\u2022\u00B7]\s+")
+WHITESPACE_RUN_RE = re.compile(r"[ \t]+")
+NEWLINE_RUN_RE = re.compile(r"\n{3,}")
+SPLIT_CLAUSE_RE = re.compile(r"(?<=[,\)\-])\s+")
+CHARS_CHUNK_TOKENIZER = "chars"
+APPROX_CHUNK_TOKENIZER = "approx"
+TIKTOKEN_CHUNK_TOKENIZER_PREFIX = "tiktoken:"
+APPROX_CHARS_PER_TOKEN = 4
+DEFAULT_CHUNK_BATCH_ROWS = 2000
+CHUNK_BATCHES_IN_FLIGHT_PER_WORKER = 2
+_TIKTOKEN_ENCODINGS: dict[str, Any] = {}
 
 
 def normalize_chunk_text(text: str) -> str:
     cleaned = (text or "").replace("\u00A0", " ")
     cleaned = cleaned.replace("\r", "\n")
-    cleaned = re.sub(r"[ \t]+", " ", cleaned)
-    cleaned = re.sub(r"\n{3,}", "\n\n", cleaned)
+    # Os testes de substring evitam varrer o texto com regex quando nao ha o que substituir.
+    if "\t" in cleaned or "  " in cleaned:
+        cleaned = WHITESPACE_RUN_RE.sub(" ", cleaned)
+    if "\n\n\n" in cleaned:
+        cleaned = NEWLINE_RUN_RE.sub("\n\n", cleaned)
     return cleaned.strip()
 
 
@@ -127,6 +144,170 @@ def chunk_semantic_text(
     return _merge_small_chunks(cleaned_chunks, max_chars=max_chars, min_chars=min_chars)
 
 
+def approximate_token_count(text: str) -> int:
+    return (len(text) + APPROX_CHARS_PER_TOKEN - 1) // APPROX_CHARS_PER_TOKEN
+
+
+def _tiktoken_counter(encoding_name: str) -> Callable[[str], int]:
+    encoding = _TIKTOKEN_ENCODINGS.get(encoding_name)
+    if encoding is None:
+        try:
+            import tiktoken  # type: ignore
+        except Exception as exc:  # pragma: no cover - import guard
+            raise RuntimeError("Dependency 'tiktoken' is required for tiktoken chunk sizes.") from exc
+        encoding = tiktoken.get_encoding(encoding_name)
+        _TIKTOKEN_ENCODINGS[encoding_name] = encoding
+    return lambda text: len(encoding.encode_ordinary(text))
+
+
+def resolve_chunk_measure(tokenizer: str | None) -> Callable[[str], int] | None:
+    """None mede em caracteres; "approx" e "tiktoken:<encoding>" medem em tokens."""
+    name = str(tokenizer or CHARS_CHUNK_TOKENIZER).strip().lower()
+    if name == CHARS_CHUNK_TOKENIZER:
+        return None
+    if name == APPROX_CHUNK_TOKENIZER:
+        return approximate_token_count
+    if name.startswith(TIKTOKEN_CHUNK_TOKENIZER_PREFIX):
+        return _tiktoken_counter(name[len(TIKTOKEN_CHUNK_TOKENIZER_PREFIX):] or "cl100k_base")
+    raise ValueError(f"Tokenizer de chunking desconhecido: {tokenizer}")
+
+
+def _split_pieces(text: str, pattern: re.Pattern[str]) -> list[str]:
+    pieces = pattern.split(text)
+    # Os separadores ja consomem o espaco em volta; so bordas residuais exigem strip.
+    return [piece if not (piece[0].isspace() or piece[-1].isspace()) else piece.strip() for piece in pieces if piece and not piece.isspace()]
+
+
+def _piece_sizes(pieces: list[str], measure: Callable[[str], int] | None) -> list[int]:
+    if measure is None:
+        return [len(piece) for piece in pieces]
+    return [measure(piece) for piece in pieces]
+
+
+def _pack_pieces(
+    pieces: list[str],
+    sizes: list[int],
+    limit: int,
+    gap: int,
+    out: list[tuple[list[str], int]],
+) -> None:
+    current: list[str] = []
+    current_size = 0
+    for piece, piece_size in zip(pieces, sizes):
+        if current:
+            projected = current_size + gap + piece_size
+            if projected > limit:
+                out.append((current, current_size))
+                current = [piece]
+                current_size = piece_size
+            else:
+                current.append(piece)
+                current_size = projected
+        else:
+            current = [piece]
+            current_size = piece_size
+    if current:
+        out.append((current, current_size))
+
+
+def _split_long_piece(
+    text: str,
+    max_size: int,
+    gap: int,
+    measure: Callable[[str], int] | None,
+    out: list[tuple[list[str], int]],
+) -> None:
+    clauses = _split_pieces(text, SPLIT_CLAUSE_RE)
+    if len(clauses) <= 1:
+        words = text.split()
+        _pack_pieces(words, _piece_sizes(words, measure), max_size, gap, out)
+        return
+
+    current: list[str] = []
+    current_size = 0
+    for clause, clause_size in zip(clauses, _piece_sizes(clauses, measure)):
+        if clause_size > max_size:
+            if current:
+                out.append((current, current_size))
+                current = []
+                current_size = 0
+            words = clause.split()
+            _pack_pieces(words, _piece_sizes(words, measure), max_size, gap, out)
+            continue
+        if current and current_size + gap + clause_size > max_size:
+            out.append((current, current_size))
+            current = []
+            current_size = 0
+        current_size = current_size + gap + clause_size if current else clause_size
+        current.append(clause)
+    if current:
+        out.append((current, current_size))
+
+
+def chunk_semantic_text_linear(
+    text: str,
+    *,
+    target_chars: int = DEFAULT_CHUNK_TARGET_CHARS,
+    max_chars: int = DEFAULT_CHUNK_MAX_CHARS,
+    min_chars: int = DEFAULT_CHUNK_MIN_CHARS,
+    measure: Callable[[str], int] | None = None,
+) -> list[str]:
+    """Mesmos cortes de chunk_semantic_text acumulando so tamanhos: cada chunk e montado uma unica vez.
+
+    Com measure (ex.: contador de tokens), target/max/min passam a ser contados nessa unidade.
+    """
+    normalized = normalize_chunk_text(text)
+    if not normalized:
+        return []
+    whole_size = len(normalized) if measure is None else measure(normalized)
+    if whole_size <= max_chars:
+        return [normalized]
+
+    # Em caracteres, cada juncao custa o espaco inserido; em tokens, o espaco e absorvido.
+    gap = 1 if measure is None else 0
+    chunks: list[tuple[list[str], int]] = []
+    parts = _split_pieces(normalized, SPLIT_STRUCTURAL_RE) or [normalized]
+    for part, part_size in zip(parts, _piece_sizes(parts, measure)):
+        if part_size <= max_chars:
+            chunks.append(([part], part_size))
+            continue
+
+        sentences = _split_pieces(part, SPLIT_SENTENCE_RE)
+        current: list[str] = []
+        current_size = 0
+        for sentence, sentence_size in zip(sentences, _piece_sizes(sentences, measure)):
+            if sentence_size > max_chars:
+                if current:
+                    chunks.append((current, current_size))
+                    current = []
+                    current_size = 0
+                _split_long_piece(sentence, max_chars, gap, measure, chunks)
+                continue
+            if current:
+                projected = current_size + gap + sentence_size
+                if projected > target_chars:
+                    chunks.append((current, current_size))
+                    current = [sentence]
+                    current_size = sentence_size
+                else:
+                    current.append(sentence)
+                    current_size = projected
+            else:
+                current = [sentence]
+                current_size = sentence_size
+        if current:
+            chunks.append((current, current_size))
+
+    merged: list[tuple[list[str], int]] = []
+    for pieces, chunk_size in chunks:
+        if len(chunks) > 1 and merged and chunk_size < min_chars and merged[-1][1] + gap + chunk_size <= max_chars:
+            merged[-1][0].extend(pieces)
+            merged[-1] = (merged[-1][0], merged[-1][1] + gap + chunk_size)
+            continue
+        merged.append((pieces, chunk_size))
+    return [pieces[0] if len(pieces) == 1 else " ".join(pieces) for pieces, _ in merged]
+
+
 def build_embedding_text(index_label: str, chunk_text: str, metadata: dict[str, Any] | None = None) -> str:
     metadata = metadata if isinstance(metadata, dict) else {}
     prefix_parts = [str(index_label or "").strip()]
@@ -138,15 +319,9 @@ def build_embedding_text(index_label: str, chunk_text: str, metadata: dict[str,
     return f"{prefix} | {chunk_text}".strip(" |")
 
 
-def rechunk_semantic_rows(
-    rows: list[dict[str, Any]],
-    *,
-    index_label: str,
-    target_chars: int = DEFAULT_CHUNK_TARGET_CHARS,
-    max_chars: int = DEFAULT_CHUNK_MAX_CHARS,
-    min_chars: int = DEFAULT_CHUNK_MIN_CHARS,
-) -> list[dict[str, Any]]:
-    rebuilt: list[dict[str, Any]] = []
+def _iter_rechunked_rows_serial(rows: Iterable[dict[str, Any]], options: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    index_label = options["index_label"]
+    measure = resolve_chunk_measure(options["tokenizer"])
     for row in rows:
         if not isinstance(row, dict):
             continue
@@ -156,22 +331,23 @@ def rechunk_semantic_rows(
             continue
 
         metadata = row.get("metadata") if isinstance(row.get("metadata"), dict) else {}
-        chunks = chunk_semantic_text(
+        chunks = chunk_semantic_text_linear(
             original_text,
-            target_chars=target_chars,
-            max_chars=max_chars,
-            min_chars=min_chars,
+            target_chars=options["target_chars"],
+            max_chars=options["max_chars"],
+            min_chars=options["min_chars"],
+            measure=measure,
         )
         chunk_total = len(chunks) or 1
 
         if chunk_total == 1:
-            rebuilt.append({
+            yield {
                 "row": int(row.get("row") or 0),
                 "text": str(row.get("text") or original_text).strip(),
                 "text_plain": original_text,
                 "metadata": metadata,
                 "embedding_text": build_embedding_text(index_label, original_text, metadata),
-            })
+            }
             continue
 
         for chunk_index, chunk_text in enumerate(chunks, start=1):
@@ -179,12 +355,102 @@ def rechunk_semantic_rows(
             chunk_metadata["source_row"] = int(row.get("row") or 0)
             chunk_metadata["chunk_index"] = chunk_index
             chunk_metadata["chunk_total"] = chunk_total
-            rebuilt.append({
+            yield {
                 "row": int(row.get("row") or 0),
                 "text": chunk_text,
                 "text_plain": chunk_text,
                 "metadata": chunk_metadata,
                 "embedding_text": build_embedding_text(index_label, chunk_text, chunk_metadata),
-            })
+            }
+
+
+def _rechunk_row_batch(batch: list[dict[str, Any]], options: dict[str, Any]) -> list[dict[str, Any]]:
+    return list(_iter_rechunked_rows_serial(batch, options))
+
+
+def _iter_row_batches(rows: Iterable[dict[str, Any]], batch_rows: int) -> Iterator[list[dict[str, Any]]]:
+    batch: list[dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _iter_rechunked_rows_parallel(
+    rows: Iterable[dict[str, Any]],
+    options: dict[str, Any],
+    workers: int,
+    batch_rows: int,
+) -> Iterator[dict[str, Any]]:
+    batches = _iter_row_batches(rows, batch_rows)
+    first_batch = next(batches, None)
+    if first_batch is None:
+        return
+    second_batch = next(batches, None)
+    if second_batch is None:
+        # Um unico lote nao compensa subir o pool de processos.
+        yield from _iter_rechunked_rows_serial(first_batch, options)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Lotes sao consumidos na ordem de envio, entao a saida e identica ao modo serial; a janela
+        # limitada de lotes em voo mantem o consumo da fonte preguicoso.
+        pending: deque[Future] = deque()
+        for batch in chain((first_batch, second_batch), batches):
+            pending.append(pool.submit(_rechunk_row_batch, batch, options))
+            if len(pending) >= workers * CHUNK_BATCHES_IN_FLIGHT_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
 
-    return rebuilt
+def iter_rechunked_semantic_rows(
+    rows: Iterable[dict[str, Any]],
+    *,
+    index_label: str,
+    target_chars: int = DEFAULT_CHUNK_TARGET_CHARS,
+    max_chars: int = DEFAULT_CHUNK_MAX_CHARS,
+    min_chars: int = DEFAULT_CHUNK_MIN_CHARS,
+    tokenizer: str | None = None,
+    workers: int = 1,
+    batch_rows: int = DEFAULT_CHUNK_BATCH_ROWS,
+) -> Iterator[dict[str, Any]]:
+    """Gera os chunks na ordem das linhas; com workers > 1, lotes de linhas sao chunkados em processos."""
+    options = {
+        "index_label": index_label,
+        "target_chars": target_chars,
+        "max_chars": max_chars,
+        "min_chars": min_chars,
+        "tokenizer": tokenizer,
+    }
+    # Valida o tokenizer no processo chamador, antes de distribuir lotes.
+    resolve_chunk_measure(tokenizer)
+    if int(workers or 1) <= 1:
+        return _iter_rechunked_rows_serial(rows, options)
+    return _iter_rechunked_rows_parallel(rows, options, int(workers), max(1, int(batch_rows)))
+
+
+def rechunk_semantic_rows(
+    rows: Iterable[dict[str, Any]],
+    *,
+    index_label: str,
+    target_chars: int = DEFAULT_CHUNK_TARGET_CHARS,
+    max_chars: int = DEFAULT_CHUNK_MAX_CHARS,
+    min_chars: int = DEFAULT_CHUNK_MIN_CHARS,
+    tokenizer: str | None = None,
+    workers: int = 1,
+    batch_rows: int = DEFAULT_CHUNK_BATCH_ROWS,
+) -> list[dict[str, Any]]:
+    return list(iter_rechunked_semantic_rows(
+        rows,
+        index_label=index_label,
+        target_chars=target_chars,
+        max_chars=max_chars,
+        min_chars=min_chars,
+        tokenizer=tokenizer,
+        workers=workers,
+        batch_rows=batch_rows,
+    ))
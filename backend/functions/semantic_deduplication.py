@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+
+
+DEDUPLICATION_VERSION = 1
+DEFAULT_DEDUPE_THRESHOLD = 0.985
+DEDUPE_BLOCK_ROWS = 1024
+
+
+def _canonical_mask(canonical: np.ndarray, start: int, end: int) -> np.ndarray:
+    return canonical[start:end] == np.arange(start, end)
+
+
+def find_near_duplicates(
+    embeddings: np.ndarray,
+    threshold: float = DEFAULT_DEDUPE_THRESHOLD,
+    block_rows: int = DEDUPE_BLOCK_ROWS,
+) -> np.ndarray:
+    """Retorna, para cada linha, a posicao da primeira linha canonica com cosseno >= threshold (ou ela mesma)."""
+    if embeddings.ndim != 2:
+        raise ValueError("Embeddings invalidos para deduplicacao.")
+    rows = int(embeddings.shape[0])
+    canonical = np.arange(rows, dtype=np.int64)
+    block = max(1, int(block_rows or DEDUPE_BLOCK_ROWS))
+    limit = np.float32(threshold)
+
+    for start in range(0, rows, block):
+        end = min(rows, start + block)
+        block_vectors = np.asarray(embeddings[start:end], dtype=np.float32)
+        first_hit = np.full(end - start, -1, dtype=np.int64)
+
+        # Blocos anteriores ja estao resolvidos: so as linhas canonicas entram no produto.
+        for column_start in range(0, start, block):
+            column_end = min(start, column_start + block)
+            column_positions = np.flatnonzero(_canonical_mask(canonical, column_start, column_end)) + column_start
+            pending = first_hit < 0
+            if column_positions.size == 0 or not pending.any():
+                continue
+            hits = (block_vectors @ np.asarray(embeddings[column_positions], dtype=np.float32).T) >= limit
+            matched = pending & hits.any(axis=1)
+            first_hit[matched] = column_positions[hits[matched].argmax(axis=1)]
+        matched = first_hit >= 0
+        canonical[start:end][matched] = first_hit[matched]
+
+        # Bloco diagonal: cada linha depende das decisoes das anteriores no proprio bloco.
+        diagonal_hits = np.tril((block_vectors @ block_vectors.T) >= limit, k=-1)
+        for local in np.flatnonzero(~matched & diagonal_hits.any(axis=1)):
+            candidates = np.flatnonzero(diagonal_hits[local, :local] & _canonical_mask(canonical, start, start + local))
+            if candidates.size:
+                canonical[start + local] = start + int(candidates[0])
+    return canonical
+
+
+def apply_near_duplicate_links(rows: list[dict[str, Any]], canonical: np.ndarray) -> tuple[list[dict[str, Any]], np.ndarray]:
+    """Mantem so as linhas canonicas e registra em metadata.duplicate_rows as linhas de origem descartadas."""
+    if len(rows) != int(canonical.shape[0]):
+        raise ValueError("Quantidade de linhas inconsistente com a deduplicacao.")
+    keep = canonical == np.arange(canonical.shape[0])
+    duplicate_rows: dict[int, set[int]] = {}
+    for position in np.flatnonzero(~keep):
+        target = int(canonical[position])
+        source_row = int(rows[int(position)].get("row") or 0)
+        if source_row != int(rows[target].get("row") or 0):
+            duplicate_rows.setdefault(target, set()).add(source_row)
+
+    kept_rows: list[dict[str, Any]] = []
+    for position in np.flatnonzero(keep):
+        row = rows[int(position)]
+        links = duplicate_rows.get(int(position))
+        if links:
+            metadata = row.get("metadata") if isinstance(row.get("metadata"), dict) else {}
+            row = {**row, "metadata": {**metadata, "duplicate_rows": sorted(links)}}
+        kept_rows.append(row)
+    return kept_rows, keep
+
+
+def build_deduplication_payload(threshold: float, removed_rows: int) -> dict[str, Any]:
+    return {
+        "version": DEDUPLICATION_VERSION,
+        "method": "blocked_cosine",
+        "threshold": float(threshold),
+        "removedChunks": int(removed_rows),
+    }
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import re
+from threading import Lock
+from typing import Any, Protocol
+
+import httpx
+import numpy as np
+import requests
+
+
+EMBEDDINGS_API_URL = "https://api.openai.com/v1/embeddings"
+OPENAI_EMBEDDING_PROVIDER = "openai"
+LOCAL_EMBEDDING_PROVIDER = "local"
+STUB_EMBEDDING_PROVIDER = "stub"
+DEFAULT_EMBEDDING_PROVIDER = OPENAI_EMBEDDING_PROVIDER
+EMBEDDING_PROVIDERS = (OPENAI_EMBEDDING_PROVIDER, LOCAL_EMBEDDING_PROVIDER, STUB_EMBEDDING_PROVIDER)
+DEFAULT_EMBEDDING_MODELS = {
+    OPENAI_EMBEDDING_PROVIDER: "text-embedding-3-small",
+    LOCAL_EMBEDDING_PROVIDER: "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+    STUB_EMBEDDING_PROVIDER: "stub-hash-256",
+}
+STUB_TOKEN_RE = re.compile(r"\w+")
+RATE_LIMIT_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+RATE_LIMIT_RESET_HEADERS = ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+_OPENAI_SESSION = requests.Session()
+_OPENAI_ASYNC_CLIENT: httpx.AsyncClient | None = None
+_LOCAL_MODELS: dict[str, Any] = {}
+_LOCAL_MODELS_LOCK = Lock()
+
+
+class EmbeddingProvider(Protocol):
+    name: str
+    model: str
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        ...
+
+    async def aembed(self, texts: list[str]) -> np.ndarray:
+        ...
+
+
+def normalize_embedding_provider(value: Any) -> str:
+    name = str(value or "").strip().lower() or DEFAULT_EMBEDDING_PROVIDER
+    if name not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Provedor de embeddings desconhecido: {value}")
+    return name
+
+
+def default_embedding_model(provider: str | None = None) -> str:
+    return DEFAULT_EMBEDDING_MODELS[normalize_embedding_provider(provider)]
+
+
+class EmbeddingRequestError(RuntimeError):
+    """Falha de uma chamada de embeddings; status_code None indica erro de rede/timeout."""
+
+    def __init__(self, message: str, *, status_code: int | None = None, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+def _parse_rate_limit_duration(value: str) -> float | None:
+    # Formato dos headers x-ratelimit-reset-*: "20ms", "1s", "6m0s", "1h2m3.5s".
+    units = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    parts = RATE_LIMIT_DURATION_RE.findall(str(value or "").strip())
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers: Any) -> float | None:
+    headers = headers or {}
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000.0)
+        if headers.get("retry-after") is not None:
+            return max(0.0, float(headers["retry-after"]))
+    except (TypeError, ValueError):
+        pass
+    resets = [_parse_rate_limit_duration(headers.get(name)) for name in RATE_LIMIT_RESET_HEADERS if headers.get(name)]
+    resets = [value for value in resets if value is not None]
+    return max(resets) if resets else None
+
+
+def parse_openai_embeddings_payload(payload: dict[str, Any], expected_count: int) -> np.ndarray:
+    data = payload.get("data") or []
+    if not data:
+        raise RuntimeError("Resposta de embeddings vazia.")
+
+    vectors = np.asarray([item.get("embedding") or [] for item in data], dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    if vectors.shape[0] != expected_count:
+        raise RuntimeError("Quantidade de embeddings retornada difere da quantidade de textos enviados.")
+    return vectors
+
+
+def _get_openai_async_client() -> httpx.AsyncClient:
+    global _OPENAI_ASYNC_CLIENT
+    if _OPENAI_ASYNC_CLIENT is None or _OPENAI_ASYNC_CLIENT.is_closed:
+        _OPENAI_ASYNC_CLIENT = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _OPENAI_ASYNC_CLIENT
+
+
+async def aclose_async_embeddings_client() -> None:
+    global _OPENAI_ASYNC_CLIENT
+    client = _OPENAI_ASYNC_CLIENT
+    _OPENAI_ASYNC_CLIENT = None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+class OpenAIEmbeddingProvider:
+    name = OPENAI_EMBEDDING_PROVIDER
+
+    def __init__(self, *, api_key: str, model: str | None = None, timeout: float = 60) -> None:
+        self.api_key = api_key
+        self.model = (model or "").strip() or default_embedding_model(self.name)
+        self.timeout = timeout
+
+    def _headers(self) -> dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _parse_response(self, response: Any, expected_count: int) -> np.ndarray:
+        # requests.Response e httpx.Response expoem a mesma interface usada aqui.
+        if response.status_code >= 400:
+            raise EmbeddingRequestError(
+                f"Falha ao gerar embeddings: HTTP {response.status_code} {response.text}",
+                status_code=response.status_code,
+                retry_after=parse_retry_after(response.headers),
+            )
+        return parse_openai_embeddings_payload(response.json(), expected_count)
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        try:
+            response = _OPENAI_SESSION.post(
+                EMBEDDINGS_API_URL,
+                headers=self._headers(),
+                json={
+                    "model": self.model,
+                    "input": texts,
+                },
+                timeout=self.timeout,
+            )
+        except requests.RequestException as exc:
+            raise EmbeddingRequestError(f"Falha ao gerar embeddings: {exc}") from exc
+        return self._parse_response(response, len(texts))
+
+    async def aembed(self, texts: list[str]) -> np.ndarray:
+        try:
+            response = await _get_openai_async_client().post(
+                EMBEDDINGS_API_URL,
+                headers=self._headers(),
+                json={
+                    "model": self.model,
+                    "input": texts,
+                },
+                timeout=self.timeout,
+            )
+        except httpx.HTTPError as exc:
+            raise EmbeddingRequestError(f"Falha ao gerar embeddings: {exc}") from exc
+        return self._parse_response(response, len(texts))
+
+
+def _load_local_model(model: str) -> Any:
+    with _LOCAL_MODELS_LOCK:
+        cached = _LOCAL_MODELS.get(model)
+        if cached is not None:
+            return cached
+        try:
+            from sentence_transformers import SentenceTransformer  # type: ignore
+        except Exception as exc:  # pragma: no cover - import guard
+            raise RuntimeError(
+                "Dependencia 'sentence-transformers' necessaria para embeddings locais "
+                "(opcional: pip install sentence-transformers)."
+            ) from exc
+        loaded = SentenceTransformer(model, device="cpu")
+        _LOCAL_MODELS[model] = loaded
+        return loaded
+
+
+class LocalEmbeddingProvider:
+    name = LOCAL_EMBEDDING_PROVIDER
+
+    def __init__(self, *, model: str | None = None, batch_size: int = 32) -> None:
+        self.model = (model or "").strip() or default_embedding_model(self.name)
+        self.batch_size = max(1, int(batch_size or 32))
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        encoder = _load_local_model(self.model)
+        vectors = encoder.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=False,
+            show_progress_bar=False,
+        )
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        return vectors
+
+    async def aembed(self, texts: list[str]) -> np.ndarray:
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class StubEmbeddingProvider:
+    """Embeddings deterministicos por hashing de tokens; usado em testes e benchmarks offline."""
+
+    name = STUB_EMBEDDING_PROVIDER
+
+    def __init__(self, *, model: str | None = None) -> None:
+        self.model = (model or "").strip() or default_embedding_model(self.name)
+        suffix = self.model.rsplit("-", 1)[-1]
+        self.dimensions = int(suffix) if suffix.isdigit() and int(suffix) > 0 else 256
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for position, text in enumerate(texts):
+            for token in STUB_TOKEN_RE.findall(str(text or "").lower()):
+                digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[position, digest % self.dimensions] += 1.0 if (digest >> 63) & 1 else -1.0
+        return vectors
+
+    async def aembed(self, texts: list[str]) -> np.ndarray:
+        return self.embed(texts)
+
+
+def get_embedding_provider(
+    provider: str | None = None,
+    *,
+    model: str | None = None,
+    api_key: str = "",
+) -> EmbeddingProvider:
+    name = normalize_embedding_provider(provider)
+    if name == LOCAL_EMBEDDING_PROVIDER:
+        return LocalEmbeddingProvider(model=model)
+    if name == STUB_EMBEDDING_PROVIDER:
+        return StubEmbeddingProvider(model=model)
+    return OpenAIEmbeddingProvider(api_key=api_key, model=model)
+
+
+def manifest_embedding_provider(manifest: dict[str, Any] | None) -> str:
+    if not isinstance(manifest, dict):
+        return DEFAULT_EMBEDDING_PROVIDER
+    return normalize_embedding_provider(manifest.get("embedding_provider"))
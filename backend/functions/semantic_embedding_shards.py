@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import Any
+
+import numpy as np
+
+
+EMBEDDING_SHARDS_VERSION = 1
+EMBEDDING_SHARDS_DIR = "embedding_shards"
+EMBEDDING_SHARD_PATTERN = "embeddings-*.npy"
+DEFAULT_SHARD_ROWS = 50000
+DEFAULT_SHARD_MAX_WORKERS = 4
+
+_SHARD_EXECUTOR: ThreadPoolExecutor | None = None
+_SHARD_EXECUTOR_LOCK = Lock()
+
+
+def embedding_shard_file(position: int) -> str:
+    return f"embeddings-{position:05d}.npy"
+
+
+def embedding_shard_files(index_dir: Path) -> list[Path]:
+    shards_dir = index_dir / EMBEDDING_SHARDS_DIR
+    if not shards_dir.is_dir():
+        return []
+    return sorted(shards_dir.glob(EMBEDDING_SHARD_PATTERN))
+
+
+def split_embedding_shards(embeddings: np.ndarray, shard_rows: int) -> list[np.ndarray]:
+    rows_per_shard = max(1, int(shard_rows or DEFAULT_SHARD_ROWS))
+    return [embeddings[start:start + rows_per_shard] for start in range(0, int(embeddings.shape[0]), rows_per_shard)]
+
+
+def build_embedding_shards_payload(shards: list[np.ndarray], shard_rows: int) -> dict[str, Any]:
+    return {
+        "version": EMBEDDING_SHARDS_VERSION,
+        "directory": EMBEDDING_SHARDS_DIR,
+        "shardRows": int(shard_rows),
+        "files": [
+            {"file": embedding_shard_file(position), "rows": int(shard.shape[0])}
+            for position, shard in enumerate(shards)
+        ],
+    }
+
+
+def embedding_shard_paths(index_dir: Path, manifest: dict[str, Any]) -> list[Path]:
+    shards_info = manifest.get("embedding_shards") if isinstance(manifest, dict) else None
+    if not isinstance(shards_info, dict):
+        return []
+    directory = index_dir / str(shards_info.get("directory") or EMBEDDING_SHARDS_DIR)
+    return [directory / str(item.get("file") or "") for item in (shards_info.get("files") or []) if isinstance(item, dict)]
+
+
+def has_embedding_shards(index_dir: Path, manifest: dict[str, Any] | None) -> bool:
+    if not isinstance(manifest, dict):
+        return False
+    shards_info = manifest.get("embedding_shards")
+    if not isinstance(shards_info, dict) or int(shards_info.get("version") or 0) != EMBEDDING_SHARDS_VERSION:
+        return False
+    paths = embedding_shard_paths(index_dir, manifest)
+    return bool(paths) and all(path.exists() for path in paths)
+
+
+def _get_shard_executor() -> ThreadPoolExecutor:
+    # Um pool por processo: buscas concorrentes dividem as mesmas threads em vez de criar um pool por query.
+    global _SHARD_EXECUTOR
+    with _SHARD_EXECUTOR_LOCK:
+        if _SHARD_EXECUTOR is None:
+            _SHARD_EXECUTOR = ThreadPoolExecutor(max_workers=DEFAULT_SHARD_MAX_WORKERS, thread_name_prefix="semantic-shards")
+        return _SHARD_EXECUTOR
+
+
+class ShardedEmbeddings:
+    """Matriz de embeddings dividida em shards memmap; a query e pontuada shard a shard, sem vetor de N scores."""
+
+    ndim = 2
+    # Sem produto de matriz completo: `embeddings @ query` falha em vez de montar N scores pelo protocolo de sequencia.
+    __array_ufunc__ = None
+
+    def __init__(self, shards: list[np.ndarray], max_workers: int = 1) -> None:
+        if not shards:
+            raise ValueError("Nenhum shard de embeddings informado.")
+        dimensions = {int(shard.shape[1]) for shard in shards if shard.ndim == 2}
+        if len(dimensions) != 1 or any(shard.ndim != 2 for shard in shards):
+            raise ValueError("Shards de embeddings com dimensoes inconsistentes.")
+        self._shards = shards
+        self._offsets = np.cumsum([0] + [int(shard.shape[0]) for shard in shards])
+        self.shape = (int(self._offsets[-1]), dimensions.pop())
+        self.dtype = np.result_type(*[shard.dtype for shard in shards])
+        self.max_workers = max(1, int(max_workers or 1))
+
+    @classmethod
+    def open(cls, index_dir: Path, manifest: dict[str, Any], max_workers: int = DEFAULT_SHARD_MAX_WORKERS) -> ShardedEmbeddings:
+        return cls([np.load(path, mmap_mode="r") for path in embedding_shard_paths(index_dir, manifest)], max_workers=max_workers)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def shard_count(self) -> int:
+        return len(self._shards)
+
+    def iter_shards(self) -> Iterator[tuple[int, np.ndarray]]:
+        for position, shard in enumerate(self._shards):
+            yield int(self._offsets[position]), shard
+
+    def _map_shards(self, function: Callable[[tuple[int, np.ndarray]], Any]) -> list[Any]:
+        # O matmul do numpy libera o GIL; ate max_workers tarefas do pool do modulo, cada uma com shards intercalados.
+        items = list(self.iter_shards())
+        workers = min(self.max_workers, len(items))
+        if workers <= 1:
+            return [function(item) for item in items]
+
+        def _run_group(group: list[tuple[int, np.ndarray]]) -> list[Any]:
+            return [function(item) for item in group]
+
+        executor = _get_shard_executor()
+        futures = [executor.submit(_run_group, items[worker::workers]) for worker in range(workers)]
+        results: list[Any] = [None] * len(items)
+        for worker, future in enumerate(futures):
+            results[worker::workers] = future.result()
+        return results
+
+    def map_scores(
+        self,
+        query: Any,
+        function: Callable[[int, np.ndarray], Any],
+        row_step: int = 1,
+    ) -> list[Any]:
+        """Aplica function(primeira_posicao, scores) aos scores de cada shard, em ordem de shard.
+
+        query e (d,) ou (d x V); os scores do shard sao (linhas,) ou (linhas x V). Com row_step > 1, so as
+        posicoes globais multiplas de row_step sao pontuadas.
+        """
+        matrix = np.asarray(query)
+        if matrix.ndim not in (1, 2) or matrix.shape[0] != self.shape[1]:
+            raise ValueError("Dimensao da query incompativel com os embeddings.")
+        step = max(1, int(row_step or 1))
+
+        def _score_shard(item: tuple[int, np.ndarray]) -> Any:
+            offset, shard = item
+            first = (-offset) % step
+            return function(offset + first, np.asarray(shard[first::step] @ matrix))
+
+        return self._map_shards(_score_shard)
+
+    def top_k(
+        self,
+        query: Any,
+        k: int | None,
+        min_score: float | None = None,
+        exclude: Callable[[np.ndarray], np.ndarray] | None = None,
+        reduce: Callable[[np.ndarray], np.ndarray] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray, int, int]:
+        """Top-k de embeddings @ query sem montar o vetor completo de scores.
+
+        Cada shard pontua, filtra e faz argpartition local; so os k melhores de cada shard sao unidos.
+        Com query (d x V), reduce converte os scores (linhas x V) do shard em um score por linha.
+        k None devolve todas as linhas elegiveis. Retorna posicoes e scores em ordem decrescente,
+        o total de linhas elegiveis e quantas `exclude` removeu.
+        """
+        if np.ndim(query) == 2 and reduce is None:
+            raise ValueError("Query com varias colunas exige reduce.")
+        count = None if k is None else max(0, int(k or 0))
+
+        def _top_shard(offset: int, shard_scores: np.ndarray) -> tuple[np.ndarray, np.ndarray, int, int]:
+            scores = np.asarray(reduce(shard_scores) if reduce is not None else shard_scores).reshape(-1)
+            eligible = np.isfinite(scores)
+            if min_score is not None and min_score > 0:
+                eligible &= scores >= np.float32(min_score)
+            positions = np.flatnonzero(eligible)
+            excluded = 0
+            if exclude is not None and positions.size:
+                dropped = np.asarray(exclude(positions + offset), dtype=np.bool_)
+                excluded = int(np.count_nonzero(dropped))
+                positions = positions[~dropped]
+            eligible_count = int(positions.size)
+            if count is not None and count < positions.size:
+                keep = np.argpartition(scores[positions], positions.size - count)[positions.size - count:]
+                positions = positions[keep]
+            return positions + offset, scores[positions], eligible_count, excluded
+
+        partials = self.map_scores(query, _top_shard)
+        positions = np.concatenate([item[0] for item in partials]).astype(np.int64, copy=False)
+        scores = np.concatenate([item[1] for item in partials])
+        # Ordena por score decrescente e posicao crescente; o desempate fica estavel entre shards.
+        order = np.lexsort((positions, -scores))[:count]
+        return (
+            positions[order],
+            scores[order],
+            sum(item[2] for item in partials),
+            sum(item[3] for item in partials),
+        )
+
+    def __getitem__(self, key: Any) -> np.ndarray:
+        if isinstance(key, slice):
+            raise TypeError("ShardedEmbeddings nao suporta fatias; use iter_shards.")
+        positions = np.asarray(key, dtype=np.int64)
+        flat = np.where(positions < 0, positions + self.shape[0], positions).reshape(-1)
+        if flat.size and (flat.min() < 0 or flat.max() >= self.shape[0]):
+            raise IndexError("Posicao fora dos embeddings.")
+        shard_ids = np.searchsorted(self._offsets[1:], flat, side="right")
+        rows = np.empty((flat.size, self.shape[1]), dtype=self.dtype)
+        for shard_id in np.unique(shard_ids):
+            mask = shard_ids == shard_id
+            rows[mask] = self._shards[int(shard_id)][flat[mask] - self._offsets[shard_id]]
+        return rows[0] if positions.ndim == 0 else rows.reshape(positions.shape + (self.shape[1],))
+
+
+def load_index_embeddings(index_dir: Path, manifest: dict[str, Any] | None = None, max_workers: int = DEFAULT_SHARD_MAX_WORKERS) -> Any:
+    if manifest is None:
+        manifest_path = index_dir / "manifest.json"
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else {}
+    if has_embedding_shards(index_dir, manifest):
+        return ShardedEmbeddings.open(index_dir, manifest, max_workers=max_workers)
+    embeddings_path = index_dir / "embeddings.npy"
+    if not embeddings_path.exists():
+        raise FileNotFoundError(f"Arquivo de embeddings nao encontrado: {embeddings_path}")
+    return np.load(embeddings_path, mmap_mode="r")
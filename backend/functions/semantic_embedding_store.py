@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+
+EMBEDDING_STORE_VERSION = 1
+EMBEDDING_STORE_KEYS_FILE = "chunk_embedding_keys.npy"
+EMBEDDING_STORE_VECTORS_FILE = "chunk_embeddings.npy"
+EMBEDDING_STORE_KEY_BYTES = 16
+
+
+def embedding_store_paths(index_dir: Path) -> dict[str, Path]:
+    return {
+        "keys": index_dir / EMBEDDING_STORE_KEYS_FILE,
+        "vectors": index_dir / EMBEDDING_STORE_VECTORS_FILE,
+    }
+
+
+def chunk_embedding_key(text: str, *, provider: str, model: str) -> bytes:
+    # O mesmo texto em outro modelo ou provedor gera outro vetor; ambos entram no endereco.
+    payload = "\x00".join((str(provider or ""), str(model or ""), str(text or ""))).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=EMBEDDING_STORE_KEY_BYTES).hexdigest().encode("ascii")
+
+
+class ChunkEmbeddingStore:
+    """Vetores de chunks enderecados pelo hash de (provedor, modelo, embedding_text)."""
+
+    def __init__(self, keys: np.ndarray, vectors: np.ndarray) -> None:
+        if vectors.ndim != 2 or keys.shape[0] != vectors.shape[0]:
+            raise ValueError("Store de embeddings inconsistente.")
+        self.keys = keys
+        self.vectors = vectors
+        self._positions = {bytes(key): position for position, key in enumerate(keys.tolist())}
+
+    @classmethod
+    def empty(cls) -> ChunkEmbeddingStore:
+        return cls(np.zeros((0,), dtype=f"S{EMBEDDING_STORE_KEY_BYTES * 2}"), np.zeros((0, 0), dtype=np.float32))
+
+    @classmethod
+    def open(cls, index_dir: Path) -> ChunkEmbeddingStore:
+        paths = embedding_store_paths(index_dir)
+        if not all(path.exists() for path in paths.values()):
+            return cls.empty()
+        try:
+            return cls(np.load(paths["keys"]), np.load(paths["vectors"], mmap_mode="r"))
+        except (OSError, ValueError):
+            # Store corrompido ou de outra versao: o rebuild apenas deixa de reaproveitar vetores.
+            return cls.empty()
+
+    def __len__(self) -> int:
+        return int(self.keys.shape[0])
+
+    @property
+    def dimensions(self) -> int:
+        return int(self.vectors.shape[1]) if len(self) else 0
+
+    def positions(self, keys: list[bytes]) -> np.ndarray:
+        return np.fromiter((self._positions.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+
+
+def embedding_store_selection(keys: list[bytes]) -> tuple[np.ndarray, np.ndarray]:
+    """Chaves unicas do store e a posicao da primeira linha de cada uma; os vetores nao sao copiados."""
+    unique_positions: dict[bytes, int] = {}
+    for position, key in enumerate(keys):
+        unique_positions.setdefault(key, position)
+    selected = np.fromiter(unique_positions.values(), dtype=np.int64, count=len(unique_positions))
+    return np.asarray(list(unique_positions), dtype=f"S{EMBEDDING_STORE_KEY_BYTES * 2}"), selected
+
+
+def encode_embedding_store(keys: list[bytes], vectors: np.ndarray) -> dict[str, np.ndarray]:
+    if len(keys) != int(vectors.shape[0]):
+        raise ValueError("Quantidade de chaves difere da quantidade de vetores.")
+    store_keys, selected = embedding_store_selection(keys)
+    return {
+        "keys": store_keys,
+        "vectors": np.asarray(vectors[selected], dtype=np.float16),
+    }
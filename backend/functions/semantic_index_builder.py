@@ -1,37 +1,115 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import os
+import random
+import shutil
 import tempfile
 import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
+from threading import BoundedSemaphore, Lock
 from typing import Any
 
 import numpy as np
 import openpyxl  # type: ignore
-import requests
 
 try:
     from backend.functions.semantic_chunking import (
+        CHARS_CHUNK_TOKENIZER,
         DEFAULT_CHUNK_MAX_CHARS,
         DEFAULT_CHUNK_MIN_CHARS,
         DEFAULT_CHUNK_TARGET_CHARS,
         rechunk_semantic_rows,
     )
+    from backend.functions.semantic_deduplication import apply_near_duplicate_links, build_deduplication_payload, find_near_duplicates
+    from backend.functions.semantic_embedding_providers import (
+        LOCAL_EMBEDDING_PROVIDER,
+        EmbeddingProvider,
+        EmbeddingRequestError,
+        default_embedding_model,
+        get_embedding_provider,
+        manifest_embedding_provider,
+        normalize_embedding_provider,
+    )
+    from backend.functions.semantic_embedding_store import (
+        ChunkEmbeddingStore,
+        chunk_embedding_key,
+        embedding_store_paths,
+        embedding_store_selection,
+    )
+    from backend.functions.semantic_embedding_shards import (
+        EMBEDDING_SHARDS_DIR,
+        build_embedding_shards_payload,
+        embedding_shard_file,
+        embedding_shard_files,
+        split_embedding_shards,
+    )
     from backend.functions.semantic_index_calibration import build_calibration_payload, compute_similarity_stats, recommend_min_score
+    from backend.functions.semantic_metadata_store import (
+        MetadataStoreWriter,
+        SemanticMetadataStore,
+        build_metadata_store_payload,
+        has_metadata_store,
+    )
+    from backend.functions.semantic_search_text import SearchPostingsBuilder, metadata_search_text, row_search_text, search_postings_paths
 except Exception:
     from functions.semantic_chunking import (
+        CHARS_CHUNK_TOKENIZER,
         DEFAULT_CHUNK_MAX_CHARS,
         DEFAULT_CHUNK_MIN_CHARS,
         DEFAULT_CHUNK_TARGET_CHARS,
         rechunk_semantic_rows,
     )
+    from functions.semantic_deduplication import apply_near_duplicate_links, build_deduplication_payload, find_near_duplicates
+    from functions.semantic_embedding_providers import (
+        LOCAL_EMBEDDING_PROVIDER,
+        EmbeddingProvider,
+        EmbeddingRequestError,
+        default_embedding_model,
+        get_embedding_provider,
+        manifest_embedding_provider,
+        normalize_embedding_provider,
+    )
+    from functions.semantic_embedding_store import (
+        ChunkEmbeddingStore,
+        chunk_embedding_key,
+        embedding_store_paths,
+        embedding_store_selection,
+    )
+    from functions.semantic_embedding_shards import (
+        EMBEDDING_SHARDS_DIR,
+        build_embedding_shards_payload,
+        embedding_shard_file,
+        embedding_shard_files,
+        split_embedding_shards,
+    )
     from functions.semantic_index_calibration import build_calibration_payload, compute_similarity_stats, recommend_min_score
+    from functions.semantic_metadata_store import (
+        MetadataStoreWriter,
+        SemanticMetadataStore,
+        build_metadata_store_payload,
+        has_metadata_store,
+    )
+    from functions.semantic_search_text import SearchPostingsBuilder, metadata_search_text, row_search_text, search_postings_paths
 
 
-EMBEDDINGS_API_URL = "https://api.openai.com/v1/embeddings"
 EMBED_BATCH_SIZE = 64
-_SESSION = requests.Session()
+EMBED_MAX_CONCURRENCY = 4
+EMBED_MAX_BATCH_TOKENS = 60000
+EMBED_CHARS_PER_TOKEN = 4
+EMBED_MAX_RETRIES = 6
+EMBED_RETRY_BASE_SECONDS = 1.0
+EMBED_RETRY_MAX_SECONDS = 60.0
+REBUILD_CHECKPOINT_VERSION = 1
+REBUILD_CHECKPOINT_DIR = ".rebuild_checkpoint"
+REBUILD_CHECKPOINT_FILE = "checkpoint.json"
+REBUILD_CHECKPOINT_EMBEDDINGS_FILE = "embeddings.partial.npy"
+REBUILD_CHECKPOINT_MERGED_FILE = "embeddings.merged.npy"
+EMBEDDING_WRITE_BLOCK_ROWS = 8192
 ROOT_DIR = Path(__file__).resolve().parents[2]
 
 
@@ -59,7 +137,9 @@ def _write_json_atomic(path: Path, payload: Any) -> None:
     fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f"{path.name}.", suffix=".tmp")
     os.close(fd)
     try:
-        Path(tmp_path).write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        # json.dump escreve em pedacos; metadata.json grande nao vira uma unica string em memoria.
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(payload, handle, ensure_ascii=False, indent=2)
         Path(tmp_path).replace(path)
     finally:
         tmp_file = Path(tmp_path)
@@ -67,6 +147,16 @@ def _write_json_atomic(path: Path, payload: Any) -> None:
             tmp_file.unlink(missing_ok=True)
 
 
+def _remove_stale_embedding_files(target_dir: Path, current_shards: list[Path]) -> None:
+    # So roda apos gravar o manifest novo: o layout antigo (matriz unica ou shards excedentes) deixa de ser lido.
+    keep = set(current_shards)
+    for shard_path in embedding_shard_files(target_dir):
+        if shard_path not in keep:
+            shard_path.unlink(missing_ok=True)
+    if current_shards:
+        (target_dir / "embeddings.npy").unlink(missing_ok=True)
+
+
 def _write_npy_atomic(path: Path, array: np.ndarray) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f"{path.name}.", suffix=".tmp")
@@ -81,6 +171,47 @@ def _write_npy_atomic(path: Path, array: np.ndarray) -> None:
             tmp_file.unlink(missing_ok=True)
 
 
+def _write_npy_rows_atomic(path: Path, source: Any, positions: np.ndarray, dtype: Any) -> None:
+    """Grava source[positions] em blocos; so um bloco de linhas fica em memoria por vez."""
+    if positions.size == 0:
+        _write_npy_atomic(path, np.zeros((0, int(source.shape[1])), dtype=dtype))
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f"{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        target = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=(int(positions.size), int(source.shape[1])))
+        for start in range(0, int(positions.size), EMBEDDING_WRITE_BLOCK_ROWS):
+            block = positions[start:start + EMBEDDING_WRITE_BLOCK_ROWS]
+            target[start:start + block.size] = source[block]
+        target.flush()
+        # O memmap precisa ser fechado antes do replace (no Windows o arquivo fica travado).
+        del target
+        Path(tmp_path).replace(path)
+    finally:
+        tmp_file = Path(tmp_path)
+        if tmp_file.exists():
+            tmp_file.unlink(missing_ok=True)
+
+
+class _RowSelection:
+    """Linhas selecionadas de uma matriz (em geral o memmap do checkpoint), lidas sob demanda sem copia."""
+
+    ndim = 2
+
+    def __init__(self, matrix: np.ndarray, positions: np.ndarray) -> None:
+        self._matrix = matrix
+        self._positions = positions
+        self.shape = (int(positions.size), int(matrix.shape[1]))
+        self.dtype = matrix.dtype
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, key: Any) -> np.ndarray:
+        return np.asarray(self._matrix[self._positions[key]])
+
+
 def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
     if vectors.ndim != 2:
         raise ValueError("Embeddings invalidos para indexacao semantica.")
@@ -89,41 +220,296 @@ def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
     return vectors / norms
 
 
-def _embed_batch(texts: list[str], api_key: str, model: str) -> np.ndarray:
-    response = _SESSION.post(
-        EMBEDDINGS_API_URL,
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-        json={
-            "model": model,
-            "input": texts,
-        },
-        timeout=120,
-    )
-    if not response.ok:
-        raise RuntimeError(f"Falha ao gerar embeddings: HTTP {response.status_code} {response.text}")
-    payload = response.json()
-    data = payload.get("data") or []
-    if len(data) != len(texts):
+def _embed_batch(texts: list[str], provider: EmbeddingProvider) -> np.ndarray:
+    vectors = provider.embed(texts)
+    if vectors.shape[0] != len(texts):
         raise RuntimeError("Quantidade de embeddings retornada difere da quantidade de textos.")
-    return np.asarray([item.get("embedding") or [] for item in data], dtype=np.float32)
-
-
-def _embed_rows(rows: list[dict[str, Any]], api_key: str, model: str, batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
-    texts = [str(row.get("embedding_text") or row.get("text_plain") or row.get("text") or "").strip() for row in rows]
+    return vectors
+
+
+class EmbeddingRateGate:
+    """Pausa compartilhada pelos workers: um 429 em qualquer lote segura os demais ate o reset.
+
+    Com max_in_flight, tambem limita as requisicoes simultaneas de todos os indices que compartilham o gate.
+    """
+
+    def __init__(self, max_in_flight: int | None = None) -> None:
+        self._lock = Lock()
+        self._resume_at = 0.0
+        self._slots = BoundedSemaphore(max(1, int(max_in_flight))) if max_in_flight else None
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        if self._slots is None:
+            yield
+            return
+        with self._slots:
+            yield
+
+    def wait(self) -> None:
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def defer(self, seconds: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + max(0.0, seconds))
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // EMBED_CHARS_PER_TOKEN + 1)
+
+
+def _plan_embedding_batches(texts: list[str], batch_size: int, max_batch_tokens: int) -> list[tuple[int, int]]:
+    # Fecha o lote ao atingir batch_size textos ou o orcamento estimado de tokens por requisicao.
+    size_limit = max(1, int(batch_size or EMBED_BATCH_SIZE))
+    token_limit = max(1, int(max_batch_tokens or EMBED_MAX_BATCH_TOKENS))
+    spans: list[tuple[int, int]] = []
+    start = 0
+    tokens = 0
+    for position, text in enumerate(texts):
+        cost = _estimate_tokens(text)
+        if position > start and (position - start >= size_limit or tokens + cost > token_limit):
+            spans.append((start, position))
+            start = position
+            tokens = 0
+        tokens += cost
+    if start < len(texts):
+        spans.append((start, len(texts)))
+    return spans
+
+
+def _retry_delay(attempt: int, retry_after: float | None) -> float:
+    if retry_after is not None:
+        return min(EMBED_RETRY_MAX_SECONDS, retry_after)
+    backoff = min(EMBED_RETRY_MAX_SECONDS, EMBED_RETRY_BASE_SECONDS * (2 ** attempt))
+    return backoff * (1.0 + random.random() * 0.25)
+
+
+def _embed_batch_with_retry(
+    texts: list[str],
+    provider: EmbeddingProvider,
+    gate: EmbeddingRateGate,
+    max_retries: int = EMBED_MAX_RETRIES,
+) -> np.ndarray:
+    attempt = 0
+    while True:
+        gate.wait()
+        try:
+            with gate.slot():
+                return _embed_batch(texts, provider)
+        except EmbeddingRequestError as exc:
+            if not exc.retryable or attempt >= max_retries:
+                raise
+            delay = _retry_delay(attempt, exc.retry_after)
+            if exc.status_code == 429:
+                gate.defer(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+
+def _embed_text_batches(
+    texts: list[str],
+    spans: list[tuple[int, int]],
+    provider: EmbeddingProvider,
+    max_concurrency: int,
+    on_batch: Callable[[int, np.ndarray], None],
+    skip: set[int] | frozenset[int] = frozenset(),
+    gate: EmbeddingRateGate | None = None,
+) -> None:
+    gate = gate or EmbeddingRateGate()
+    pending = [position for position in range(len(spans)) if position not in skip]
+    workers = min(max(1, int(max_concurrency or 1)), len(pending))
+    if workers <= 1:
+        for position in pending:
+            start, end = spans[position]
+            on_batch(position, _embed_batch_with_retry(texts[start:end], provider, gate))
+        return
+
+    # on_batch roda sempre na thread chamadora; um lote que esgota as tentativas cancela os pendentes.
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_embed_batch_with_retry, texts[spans[position][0]:spans[position][1]], provider, gate): position
+            for position in pending
+        }
+        try:
+            for future in as_completed(futures):
+                on_batch(futures[future], future.result())
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+class _EmbeddingCheckpoint:
+    """Lotes concluidos vao para um .npy em disco; um rebuild interrompido retoma do ultimo lote gravado."""
+
+    def __init__(self, directory: Path, fingerprint: str, rows: int, spans: list[tuple[int, int]]) -> None:
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.rows = rows
+        self.spans = spans
+        self.completed: set[int] = set()
+        self._vectors: np.ndarray | None = None
+        state_path = directory / REBUILD_CHECKPOINT_FILE
+        vectors_path = directory / REBUILD_CHECKPOINT_EMBEDDINGS_FILE
+        state = _load_json(state_path) if state_path.exists() else {}
+        if (
+            isinstance(state, dict)
+            and state.get("version") == REBUILD_CHECKPOINT_VERSION
+            and state.get("fingerprint") == fingerprint
+            and vectors_path.exists()
+        ):
+            self._vectors = np.load(vectors_path, mmap_mode="r+")
+            self.completed = {int(position) for position in state.get("completedBatches") or []}
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def store(self, position: int, vectors: np.ndarray) -> None:
+        normalized = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        if self._vectors is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._vectors = np.lib.format.open_memmap(
+                self.directory / REBUILD_CHECKPOINT_EMBEDDINGS_FILE,
+                mode="w+",
+                dtype=np.float32,
+                shape=(self.rows, int(normalized.shape[1])),
+            )
+        start, end = self.spans[position]
+        self._vectors[start:end] = normalized
+        # Os vetores precisam estar em disco antes de o lote constar como concluido.
+        self._vectors.flush()
+        self.completed.add(int(position))
+        _write_json_atomic(self.directory / REBUILD_CHECKPOINT_FILE, {
+            "version": REBUILD_CHECKPOINT_VERSION,
+            "fingerprint": self.fingerprint,
+            "rows": self.rows,
+            "batches": len(self.spans),
+            "completedBatches": sorted(self.completed),
+            "updatedAt": _utc_iso_now(),
+        })
+
+    def embeddings(self) -> np.ndarray:
+        if self._vectors is None or len(self.completed) < len(self.spans):
+            raise RuntimeError("Checkpoint de embeddings incompleto.")
+        return self._vectors
+
+
+def _embedding_checkpoint_fingerprint(texts: list[str], spans: list[tuple[int, int]], provider: str | None, model: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{normalize_embedding_provider(provider)}\x00{model}\x00{spans}".encode("utf-8"))
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def clear_rebuild_checkpoint(index_dir: Path) -> None:
+    shutil.rmtree(index_dir / REBUILD_CHECKPOINT_DIR, ignore_errors=True)
+
+
+def _row_embedding_text(row: dict[str, Any]) -> str:
+    return str(row.get("embedding_text") or row.get("text_plain") or row.get("text") or "").strip()
+
+
+def _embed_rows(
+    rows: list[dict[str, Any]],
+    api_key: str,
+    model: str,
+    batch_size: int = EMBED_BATCH_SIZE,
+    provider: str | None = None,
+    max_concurrency: int = EMBED_MAX_CONCURRENCY,
+    max_batch_tokens: int = EMBED_MAX_BATCH_TOKENS,
+    checkpoint_dir: Path | None = None,
+    rate_gate: EmbeddingRateGate | None = None,
+) -> np.ndarray:
+    texts = [_row_embedding_text(row) for row in rows]
     if not texts:
         return np.zeros((0, 0), dtype=np.float32)
 
-    batches: list[np.ndarray] = []
-    for start in range(0, len(texts), max(1, int(batch_size or EMBED_BATCH_SIZE))):
-        batch = texts[start:start + max(1, int(batch_size or EMBED_BATCH_SIZE))]
-        batches.append(_embed_batch(batch, api_key=api_key, model=model))
-    return _normalize_rows(np.vstack(batches))
+    embedder = get_embedding_provider(provider, model=model, api_key=api_key)
+    # O modelo local ja ocupa a CPU inteira; concorrencia so ajuda com provedores remotos.
+    if normalize_embedding_provider(provider) == LOCAL_EMBEDDING_PROVIDER:
+        max_concurrency = 1
+    spans = _plan_embedding_batches(texts, batch_size, max_batch_tokens)
+    if checkpoint_dir is None:
+        batches: list[np.ndarray | None] = [None] * len(spans)
+        _embed_text_batches(texts, spans, embedder, max_concurrency, batches.__setitem__, gate=rate_gate)
+        return _normalize_rows(np.vstack(batches))
+
+    # Com checkpoint, a matriz cresce num memmap em disco em vez de uma lista de lotes em memoria.
+    checkpoint = _EmbeddingCheckpoint(
+        checkpoint_dir,
+        _embedding_checkpoint_fingerprint(texts, spans, provider, model),
+        len(texts),
+        spans,
+    )
+    _embed_text_batches(texts, spans, embedder, max_concurrency, checkpoint.store, skip=checkpoint.completed, gate=rate_gate)
+    return checkpoint.embeddings()
 
 
-def _load_rows_from_xlsx(source_path: Path, manifest: dict[str, Any]) -> list[dict[str, Any]]:
+def _embed_rows_incremental(
+    rows: list[dict[str, Any]],
+    store: ChunkEmbeddingStore,
+    *,
+    api_key: str,
+    model: str,
+    provider: str,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_concurrency: int = EMBED_MAX_CONCURRENCY,
+    checkpoint_dir: Path | None = None,
+    rate_gate: EmbeddingRateGate | None = None,
+) -> tuple[np.ndarray, list[bytes], np.ndarray]:
+    embed_params = {
+        "api_key": api_key,
+        "model": model,
+        "batch_size": batch_size,
+        "provider": provider,
+        "max_concurrency": max_concurrency,
+        "checkpoint_dir": checkpoint_dir,
+        "rate_gate": rate_gate,
+    }
+    keys = [chunk_embedding_key(_row_embedding_text(row), provider=provider, model=model) for row in rows]
+    positions = store.positions(keys)
+    missing = np.flatnonzero(positions < 0)
+    if missing.size == len(rows):
+        return _embed_rows(rows, **embed_params), keys, np.zeros(len(rows), dtype=bool)
+
+    computed = (
+        _embed_rows([rows[int(position)] for position in missing], **embed_params)
+        if missing.size
+        else np.zeros((0, store.dimensions), dtype=np.float32)
+    )
+    if missing.size and computed.shape[1] != store.dimensions:
+        # Dimensao mudou sem mudar o modelo registrado: o store antigo nao serve mais.
+        return _embed_rows(rows, **embed_params), keys, np.zeros(len(rows), dtype=bool)
+
+    # Com checkpoint, a matriz final tambem fica num memmap em disco; as copias andam em blocos de linhas.
+    if checkpoint_dir is None:
+        embeddings = np.empty((len(rows), store.dimensions), dtype=np.float32)
+    else:
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        embeddings = np.lib.format.open_memmap(
+            checkpoint_dir / REBUILD_CHECKPOINT_MERGED_FILE,
+            mode="w+",
+            dtype=np.float32,
+            shape=(len(rows), store.dimensions),
+        )
+    reused = np.flatnonzero(positions >= 0)
+    for start in range(0, int(reused.size), EMBEDDING_WRITE_BLOCK_ROWS):
+        block = reused[start:start + EMBEDDING_WRITE_BLOCK_ROWS]
+        # O store guarda float16; o vetor reaproveitado volta a ter norma 1 antes de entrar na matriz.
+        embeddings[block] = _normalize_rows(np.asarray(store.vectors[positions[block]], dtype=np.float32))
+    for start in range(0, int(missing.size), EMBEDDING_WRITE_BLOCK_ROWS):
+        embeddings[missing[start:start + EMBEDDING_WRITE_BLOCK_ROWS]] = computed[start:start + EMBEDDING_WRITE_BLOCK_ROWS]
+    return embeddings, keys, positions >= 0
+
+
+def _iter_rows_from_xlsx(source_path: Path, manifest: dict[str, Any]) -> Iterator[dict[str, Any]]:
     workbook = openpyxl.load_workbook(source_path, read_only=True, data_only=True)
     try:
         sheet_name = str(manifest.get("sheet_name") or "").strip()
@@ -139,7 +525,6 @@ def _load_rows_from_xlsx(source_path: Path, manifest: dict[str, Any]) -> list[di
         metadata_columns = [str(item).strip() for item in (manifest.get("metadata_columns") or []) if str(item).strip()]
         metadata_columns_norm = {column.lower(): column for column in metadata_columns}
 
-        rows: list[dict[str, Any]] = []
         for row_index, values in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
             if not values:
                 continue
@@ -158,88 +543,195 @@ def _load_rows_from_xlsx(source_path: Path, manifest: dict[str, Any]) -> list[di
                 for source_key, target_key in metadata_columns_norm.items()
                 if row_map.get(source_key, "").strip()
             }
-            rows.append({
+            yield {
                 "row": row_index,
                 "text": text,
                 "text_plain": text,
                 "metadata": metadata,
-            })
-
-        return rows
+            }
     finally:
         workbook.close()
 
 
+def _load_rows_from_xlsx(source_path: Path, manifest: dict[str, Any]) -> list[dict[str, Any]]:
+    return list(_iter_rows_from_xlsx(source_path, manifest))
+
+
 def _load_rows_for_rebuild(
     index_dir: Path,
     manifest: dict[str, Any],
     metadata_path: Path,
     *,
     require_source_file: bool,
-) -> tuple[list[dict[str, Any]], str, str | None]:
+) -> tuple[Iterable[dict[str, Any]], str, str | None]:
     source_file = str(manifest.get("source_file") or "").strip()
     if source_file:
         source_path = _resolve_source_path(source_file)
         if source_path.exists():
-            return _load_rows_from_xlsx(source_path, manifest), "source_file", None
+            return _iter_rows_from_xlsx(source_path, manifest), "source_file", None
         if require_source_file:
             raise FileNotFoundError(f"Arquivo-fonte do indice nao encontrado: {source_path}")
 
-    metadata = _load_json(metadata_path)
-    if not isinstance(metadata, list):
-        raise ValueError(f"Metadata invalida no indice {index_dir.name}")
+    if metadata_path.exists():
+        metadata = _load_json(metadata_path)
+        if not isinstance(metadata, list):
+            raise ValueError(f"Metadata invalida no indice {index_dir.name}")
+        snapshot_name = "metadata.json"
+    else:
+        # Sem metadata.json, o snapshot vem do metadata store colunar; cada linha vira dict ao ser lida.
+        metadata = SemanticMetadataStore.open(index_dir)
+        snapshot_name = "metadata store"
 
     warning = None
     if source_file:
-        warning = f"Arquivo-fonte ausente; rebuild baseado no snapshot atual de metadata.json ({source_file})."
+        warning = f"Arquivo-fonte ausente; rebuild baseado no snapshot atual de {snapshot_name} ({source_file})."
     return metadata, "metadata_snapshot", warning
 
 
-def rebuild_semantic_index(
+def prepare_semantic_rebuild(
     index_dir: Path,
     *,
-    api_key: str,
-    model: str | None = None,
-    output_dir: Path | None = None,
-    batch_size: int = EMBED_BATCH_SIZE,
     target_chars: int = DEFAULT_CHUNK_TARGET_CHARS,
     max_chars: int = DEFAULT_CHUNK_MAX_CHARS,
     min_chars: int = DEFAULT_CHUNK_MIN_CHARS,
     require_source_file: bool = False,
+    chunk_tokenizer: str | None = None,
+    chunk_workers: int = 1,
 ) -> dict[str, Any]:
+    """Fase sem rede do rebuild (leitura do XLSX/snapshot e rechunking); pode rodar em outro processo."""
+    started = time.perf_counter()
     manifest_path = index_dir / "manifest.json"
     metadata_path = index_dir / "metadata.json"
-    if not manifest_path.exists() or not metadata_path.exists():
+    if not manifest_path.exists():
         raise FileNotFoundError(f"Indice semantico incompleto: {index_dir}")
 
     manifest = _load_json(manifest_path)
+    if not metadata_path.exists() and not has_metadata_store(index_dir, manifest):
+        raise FileNotFoundError(f"Indice semantico incompleto: {index_dir}")
     source_rows, rebuild_basis, warning = _load_rows_for_rebuild(
         index_dir,
         manifest,
         metadata_path,
         require_source_file=require_source_file,
     )
+    source_row_count = 0
 
-    resolved_model = (model or manifest.get("model") or "text-embedding-3-small").strip()
+    def _count_source_rows(rows: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        nonlocal source_row_count
+        for row in rows:
+            source_row_count += 1
+            yield row
+
+    # Linhas do XLSX fluem direto para o chunker; so a lista de chunks fica em memoria.
     index_label = str(manifest.get("index_label") or index_dir.name).strip()
     rebuilt_rows = rechunk_semantic_rows(
-        source_rows,
+        _count_source_rows(source_rows),
         index_label=index_label,
         target_chars=target_chars,
         max_chars=max_chars,
         min_chars=min_chars,
+        tokenizer=chunk_tokenizer,
+        workers=chunk_workers,
     )
     if not rebuilt_rows:
         raise ValueError(f"Nenhum chunk gerado para o indice {index_dir.name}")
+    return {
+        "manifest": manifest,
+        "source_row_count": source_row_count,
+        "rebuild_basis": rebuild_basis,
+        "warning": warning,
+        "rebuilt_rows": rebuilt_rows,
+        "prepare_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
 
-    embeddings = _embed_rows(rebuilt_rows, api_key=api_key, model=resolved_model, batch_size=batch_size)
-    embeddings_to_disk = embeddings.astype(np.float16, copy=False)
-    calibration_stats = compute_similarity_stats(embeddings)
-    recommended_min_score = recommend_min_score(calibration_stats)
+
+def rebuild_semantic_index(
+    index_dir: Path,
+    *,
+    api_key: str,
+    model: str | None = None,
+    output_dir: Path | None = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    target_chars: int = DEFAULT_CHUNK_TARGET_CHARS,
+    max_chars: int = DEFAULT_CHUNK_MAX_CHARS,
+    min_chars: int = DEFAULT_CHUNK_MIN_CHARS,
+    require_source_file: bool = False,
+    provider: str | None = None,
+    shard_rows: int | None = None,
+    dedupe_threshold: float | None = None,
+    reuse_embeddings: bool = True,
+    max_concurrency: int = EMBED_MAX_CONCURRENCY,
+    resume: bool = True,
+    prepared: dict[str, Any] | None = None,
+    rate_gate: EmbeddingRateGate | None = None,
+    chunk_tokenizer: str | None = None,
+    chunk_workers: int = 1,
+    write_metadata_json: bool = True,
+) -> dict[str, Any]:
+    if prepared is None:
+        prepared = prepare_semantic_rebuild(
+            index_dir,
+            target_chars=target_chars,
+            max_chars=max_chars,
+            min_chars=min_chars,
+            require_source_file=require_source_file,
+            chunk_tokenizer=chunk_tokenizer,
+            chunk_workers=chunk_workers,
+        )
+    manifest = prepared["manifest"]
+    source_row_count = int(prepared["source_row_count"])
+    rebuild_basis = prepared["rebuild_basis"]
+    warning = prepared["warning"]
+    rebuilt_rows = prepared["rebuilt_rows"]
+
+    previous_provider = manifest_embedding_provider(manifest)
+    resolved_provider = normalize_embedding_provider(provider or previous_provider)
+    # Trocar de provedor invalida o modelo registrado no manifest anterior.
+    manifest_model = manifest.get("model") if resolved_provider == previous_provider else None
+    resolved_model = (model or manifest_model or default_embedding_model(resolved_provider)).strip()
 
     target_dir = output_dir or index_dir
+    if not resume:
+        clear_rebuild_checkpoint(target_dir)
+
+    # Chunks cujo embedding_text nao mudou reaproveitam o vetor do rebuild anterior.
+    embedding_store = ChunkEmbeddingStore.open(index_dir) if reuse_embeddings else ChunkEmbeddingStore.empty()
+    embeddings, embedding_keys, reused_mask = _embed_rows_incremental(
+        rebuilt_rows,
+        embedding_store,
+        api_key=api_key,
+        model=resolved_model,
+        provider=resolved_provider,
+        batch_size=batch_size,
+        max_concurrency=max_concurrency,
+        checkpoint_dir=target_dir / REBUILD_CHECKPOINT_DIR if resume else None,
+        rate_gate=rate_gate,
+    )
+    reused_embeddings = int(np.count_nonzero(reused_mask))
+    embedded_tokens = sum(
+        _estimate_tokens(_row_embedding_text(row))
+        for row, reused in zip(rebuilt_rows, reused_mask.tolist())
+        if not reused
+    )
+    # Libera o memmap do store antigo antes de sobrescrever os arquivos (no Windows o replace falharia).
+    del embedding_store
+    chunk_store_keys, chunk_store_positions = embedding_store_selection(embedding_keys)
+    duplicates_removed = 0
+    kept_positions = np.arange(int(embeddings.shape[0]), dtype=np.int64)
+    kept_embeddings: Any = embeddings
+    if dedupe_threshold:
+        # Chunks quase identicos (ex.: a mesma pensata repetida em varias linhas) viram um unico vetor.
+        rebuilt_rows, keep = apply_near_duplicate_links(rebuilt_rows, find_near_duplicates(embeddings, float(dedupe_threshold)))
+        duplicates_removed = int(keep.size - np.count_nonzero(keep))
+        kept_positions = np.flatnonzero(keep)
+        # Dedupe e calibracao leem o memmap do checkpoint em blocos; a matriz deduplicada nao e copiada.
+        kept_embeddings = _RowSelection(embeddings, kept_positions)
+    calibration_stats = compute_similarity_stats(kept_embeddings)
+    recommended_min_score = recommend_min_score(calibration_stats)
+
     target_dir.mkdir(parents=True, exist_ok=True)
 
+    manifest["embedding_provider"] = resolved_provider
     manifest["model"] = resolved_model
     manifest["embedding_dtype"] = "float16"
     manifest["dimensions"] = int(embeddings.shape[1])
@@ -255,26 +747,82 @@ def rebuild_semantic_index(
         "targetChars": int(target_chars),
         "maxChars": int(max_chars),
         "minChars": int(min_chars),
-        "rebuiltFromRows": len(source_rows),
+        # Com tokenizer diferente de "chars", target/max/min estao em tokens.
+        "tokenizer": str(chunk_tokenizer or CHARS_CHUNK_TOKENIZER),
+        "rebuiltFromRows": source_row_count,
     }
 
-    stored_rows = []
-    for row in rebuilt_rows:
-        stored_row = dict(row)
-        stored_row.pop("embedding_text", None)
-        stored_rows.append(stored_row)
-
-    _write_json_atomic(target_dir / "metadata.json", stored_rows)
-    _write_npy_atomic(target_dir / "embeddings.npy", embeddings_to_disk)
+    # Os chunks viram as linhas gravadas no proprio lugar, sem uma terceira copia do corpus.
+    stored_rows = rebuilt_rows
+    for row in stored_rows:
+        row.pop("embedding_text", None)
+
+    manifest["metadata_store"] = build_metadata_store_payload()
+    if dedupe_threshold:
+        manifest["deduplication"] = build_deduplication_payload(float(dedupe_threshold), duplicates_removed)
+    else:
+        manifest.pop("deduplication", None)
+    # Cada shard e so a faixa de posicoes mantidas; os vetores sao gravados em blocos a partir do memmap.
+    embedding_shards = split_embedding_shards(kept_positions, shard_rows) if shard_rows else []
+    if embedding_shards:
+        manifest["embedding_shards"] = build_embedding_shards_payload(embedding_shards, int(shard_rows))
+    else:
+        manifest.pop("embedding_shards", None)
+
+    if write_metadata_json:
+        _write_json_atomic(target_dir / "metadata.json", stored_rows)
+    # Uma passada pelos chunks: cada linha vai direto para a arena em disco e para os postings,
+    # sem tuplas de textos de busca nem colunas montadas em memoria.
+    search_postings = {"search": SearchPostingsBuilder(), "metadata": SearchPostingsBuilder()}
+    with MetadataStoreWriter(target_dir) as metadata_writer:
+        for row in stored_rows:
+            search_text = row_search_text(row)
+            metadata_text = metadata_search_text(row.get("metadata"))
+            metadata_writer.append(row, search_text=search_text, metadata_text=metadata_text)
+            search_postings["search"].add(search_text)
+            search_postings["metadata"].add(metadata_text)
+        metadata_writer.commit()
+    # Postings gravados ao lado do store: a busca abre via memmap em vez de reindexar a cada carga.
+    for column, postings_builder in search_postings.items():
+        postings = postings_builder.encode()
+        for postings_key, postings_path in search_postings_paths(target_dir, column).items():
+            _write_npy_atomic(postings_path, postings[postings_key])
+        del postings
+    shard_paths: list[Path] = []
+    if embedding_shards:
+        shards_dir = target_dir / EMBEDDING_SHARDS_DIR
+        shards_dir.mkdir(parents=True, exist_ok=True)
+        shard_paths = [shards_dir / embedding_shard_file(position) for position in range(len(embedding_shards))]
+        for shard_path, shard_positions in zip(shard_paths, embedding_shards):
+            _write_npy_rows_atomic(shard_path, embeddings, shard_positions, np.float16)
+    else:
+        _write_npy_rows_atomic(target_dir / "embeddings.npy", embeddings, kept_positions, np.float16)
+    chunk_store_paths = embedding_store_paths(target_dir)
+    _write_npy_atomic(chunk_store_paths["keys"], chunk_store_keys)
+    # Mesmo dtype do indice: o store de reuso nao ocupa o dobro do indice que ele alimenta.
+    _write_npy_rows_atomic(chunk_store_paths["vectors"], embeddings, chunk_store_positions, np.float16)
     _write_json_atomic(target_dir / "manifest.json", manifest)
+    _remove_stale_embedding_files(target_dir, shard_paths)
+    if not write_metadata_json:
+        # Opt-out explicito: sem regravar, o metadata.json antigo ficaria defasado em relacao ao store.
+        (target_dir / "metadata.json").unlink(missing_ok=True)
+    # O indice novo ja esta gravado: o checkpoint do embedding deixa de ser necessario.
+    del embeddings, kept_embeddings
+    clear_rebuild_checkpoint(target_dir)
 
     return {
         "index_id": index_dir.name,
-        "rows_before": len(source_rows),
+        "rows_before": source_row_count,
         "rows_after": len(stored_rows),
         "model": resolved_model,
+        "embedding_provider": resolved_provider,
         "recommended_min_score": recommended_min_score,
         "output_dir": str(target_dir),
         "rebuild_basis": rebuild_basis,
+        "embedding_shards": len(embedding_shards),
+        "duplicates_removed": duplicates_removed,
+        "embeddings_reused": reused_embeddings,
+        "embeddings_computed": len(embedding_keys) - reused_embeddings,
+        "estimated_tokens": embedded_tokens,
         "warning": warning,
     }
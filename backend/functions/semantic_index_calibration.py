@@ -2,46 +2,68 @@ from __future__ import annotations
 
 import math
 import time
+from collections.abc import Iterator
 from pathlib import Path
 from typing import Any
 
 import numpy as np
 
+try:
+    from backend.functions.semantic_embedding_shards import load_index_embeddings
+except Exception:
+    from functions.semantic_embedding_shards import load_index_embeddings
+
 
 DEFAULT_MIN_SCORE = 0.25
 CALIBRATION_VERSION = 1
 CALIBRATION_MARGIN = 0.02
 CALIBRATION_SAMPLE_PAIRS = 5000
 CALIBRATION_RANDOM_SEED = 0
+CALIBRATION_METHOD_AUTO = "auto"
+CALIBRATION_METHOD_EXACT = "exact"
+CALIBRATION_METHOD_SAMPLED_SKETCH = "sampled_sketch"
+CALIBRATION_METHOD_SAMPLE = "sample"
+CALIBRATION_METHODS = (CALIBRATION_METHOD_AUTO, CALIBRATION_METHOD_EXACT, CALIBRATION_METHOD_SAMPLED_SKETCH, CALIBRATION_METHOD_SAMPLE)
+CALIBRATION_EXACT_MAX_ROWS = 5000
+CALIBRATION_SAMPLED_SKETCH_ROWS = 8192
+CALIBRATION_BLOCK_ROWS = 1024
+CALIBRATION_HISTOGRAM_BINS = 1 << 16
+CALIBRATION_QUANTILES = {"p95": 0.95, "p99": 0.99, "p999": 0.999}
+CALIBRATION_PAYLOAD_METHODS = {
+    CALIBRATION_METHOD_EXACT: "exact_all_pairs_p99_plus_margin",
+    CALIBRATION_METHOD_SAMPLED_SKETCH: "sampled_rows_pair_histogram_p99_plus_margin",
+    CALIBRATION_METHOD_SAMPLE: "random_pair_p99_plus_margin",
+}
 
 
 def load_embeddings_for_calibration(index_dir: Path) -> np.ndarray:
-    embeddings_path = index_dir / "embeddings.npy"
-    if not embeddings_path.exists():
-        raise FileNotFoundError(f"Arquivo de embeddings nao encontrado: {embeddings_path}")
-    return np.load(embeddings_path, mmap_mode="r")
+    return load_index_embeddings(index_dir)
 
 
-def compute_similarity_stats(
-    embeddings: np.ndarray,
-    sample_pairs: int = CALIBRATION_SAMPLE_PAIRS,
-    seed: int = CALIBRATION_RANDOM_SEED,
-) -> dict[str, Any]:
-    if embeddings.ndim != 2:
-        raise ValueError("Embeddings invalidos para calibracao.")
+def _empty_similarity_stats(rows: int, method: str) -> dict[str, Any]:
+    return {
+        "rows": rows,
+        "method": method,
+        "sampleRows": 0,
+        "samplePairs": 0,
+        "mean": 0.0,
+        "p95": 0.0,
+        "p99": 0.0,
+        "p999": 0.0,
+        "max": 0.0,
+    }
+
+
+def _resolve_calibration_method(method: str | None, rows: int) -> str:
+    resolved = str(method or CALIBRATION_METHOD_AUTO).strip().lower()
+    if resolved == CALIBRATION_METHOD_AUTO:
+        return CALIBRATION_METHOD_EXACT if rows <= CALIBRATION_EXACT_MAX_ROWS else CALIBRATION_METHOD_SAMPLED_SKETCH
+    if resolved not in CALIBRATION_METHODS:
+        raise ValueError(f"Metodo de calibracao desconhecido: {method}")
+    return resolved
 
-    rows = int(embeddings.shape[0])
-    if rows <= 1:
-        return {
-            "rows": rows,
-            "samplePairs": 0,
-            "mean": 0.0,
-            "p95": 0.0,
-            "p99": 0.0,
-            "p999": 0.0,
-            "max": 0.0,
-        }
 
+def _random_pair_stats(embeddings: Any, rows: int, sample_pairs: int, seed: int) -> dict[str, Any]:
     target_pairs = min(max(500, rows * 2), max(1, int(sample_pairs or CALIBRATION_SAMPLE_PAIRS)))
     rng = np.random.default_rng(seed)
     left = rng.integers(0, rows, size=target_pairs, endpoint=False)
@@ -50,19 +72,13 @@ def compute_similarity_stats(
     left = left[mask]
     right = right[mask]
     if left.size == 0:
-        return {
-            "rows": rows,
-            "samplePairs": 0,
-            "mean": 0.0,
-            "p95": 0.0,
-            "p99": 0.0,
-            "p999": 0.0,
-            "max": 0.0,
-        }
+        return _empty_similarity_stats(rows, CALIBRATION_METHOD_SAMPLE)
 
     similarities = np.sum(embeddings[left] * embeddings[right], axis=1, dtype=np.float32)
     return {
         "rows": rows,
+        "method": CALIBRATION_METHOD_SAMPLE,
+        "sampleRows": rows,
         "samplePairs": int(similarities.size),
         "mean": float(np.mean(similarities)),
         "p95": float(np.percentile(similarities, 95)),
@@ -72,6 +88,153 @@ def compute_similarity_stats(
     }
 
 
+def _iter_pair_similarity_blocks(embeddings: Any, row_ids: np.ndarray, block_rows: int) -> Iterator[np.ndarray]:
+    """Similaridades de todos os pares i < j de row_ids, bloco a bloco, sem montar a matriz N x N."""
+    total = int(row_ids.size)
+    upper_cache: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+    for left_start in range(0, total, block_rows):
+        left = np.asarray(embeddings[row_ids[left_start:left_start + block_rows]], dtype=np.float32)
+        for right_start in range(left_start, total, block_rows):
+            if right_start == left_start:
+                size = int(left.shape[0])
+                upper = upper_cache.get(size)
+                if upper is None:
+                    upper = upper_cache.setdefault(size, np.triu_indices(size, k=1))
+                yield (left @ left.T)[upper]
+                continue
+            right = np.asarray(embeddings[row_ids[right_start:right_start + block_rows]], dtype=np.float32)
+            yield (left @ right.T).reshape(-1)
+
+
+def _histogram_bins(similarities: np.ndarray) -> np.ndarray:
+    # Cosseno fica em [-1, 1]; erros de arredondamento fora da faixa caem nos bins das pontas.
+    scaled = (similarities.astype(np.float64) + 1.0) * (CALIBRATION_HISTOGRAM_BINS / 2.0)
+    return np.clip(scaled.astype(np.int64), 0, CALIBRATION_HISTOGRAM_BINS - 1)
+
+
+def _pair_histogram(embeddings: Any, row_ids: np.ndarray, block_rows: int) -> dict[str, Any]:
+    counts = np.zeros(CALIBRATION_HISTOGRAM_BINS, dtype=np.int64)
+    total = 0.0
+    maximum = -np.inf
+    for block in _iter_pair_similarity_blocks(embeddings, row_ids, block_rows):
+        if not block.size:
+            continue
+        counts += np.bincount(_histogram_bins(block), minlength=CALIBRATION_HISTOGRAM_BINS)
+        total += float(np.sum(block, dtype=np.float64))
+        maximum = max(maximum, float(block.max()))
+    pairs = int(counts.sum())
+    return {"counts": counts, "pairs": pairs, "mean": total / pairs if pairs else 0.0, "max": maximum if pairs else 0.0}
+
+
+def _quantile_ranks(pairs: int, quantile: float) -> tuple[int, int, float]:
+    # Mesma interpolacao linear de np.percentile entre as estatisticas de ordem vizinhas.
+    position = (pairs - 1) * quantile
+    lower = int(math.floor(position))
+    return lower, min(lower + 1, pairs - 1), position - lower
+
+
+def _sketch_value(counts: np.ndarray, cumulative: np.ndarray, rank: int) -> float:
+    position = int(np.searchsorted(cumulative, rank, side="right"))
+    before = int(cumulative[position - 1]) if position else 0
+    width = 2.0 / CALIBRATION_HISTOGRAM_BINS
+    # Dentro do bin, os valores sao supostos uniformes; o erro fica limitado a largura do bin.
+    return -1.0 + width * (position + (rank - before + 0.5) / max(1, int(counts[position])))
+
+
+def _exact_values(
+    embeddings: Any,
+    row_ids: np.ndarray,
+    block_rows: int,
+    counts: np.ndarray,
+    cumulative: np.ndarray,
+    ranks: list[int],
+) -> dict[int, float] | None:
+    wanted_bins = {int(np.searchsorted(cumulative, rank, side="right")) for rank in ranks}
+    wanted = np.fromiter(sorted(wanted_bins), dtype=np.int64)
+    collected: list[np.ndarray] = []
+    # Segunda passada: guarda apenas os valores dos bins que contem as estatisticas de ordem pedidas.
+    for block in _iter_pair_similarity_blocks(embeddings, row_ids, block_rows):
+        bins = _histogram_bins(block)
+        mask = np.isin(bins, wanted)
+        if np.any(mask):
+            collected.append(np.stack([bins[mask].astype(np.float64), block[mask].astype(np.float64)], axis=1))
+    values = np.concatenate(collected) if collected else np.zeros((0, 2), dtype=np.float64)
+
+    resolved: dict[int, float] = {}
+    for bin_id in wanted.tolist():
+        bin_values = np.sort(values[values[:, 0] == bin_id, 1])
+        if bin_values.size != int(counts[bin_id]):
+            # Produto recalculado caiu em outro bin (nao deveria acontecer); o chamador usa o sketch.
+            return None
+        before = int(cumulative[bin_id - 1]) if bin_id else 0
+        for rank in ranks:
+            if int(np.searchsorted(cumulative, rank, side="right")) == bin_id:
+                resolved[rank] = float(bin_values[rank - before])
+    return resolved
+
+
+def _blocked_pair_stats(embeddings: Any, rows: int, method: str, seed: int, block_rows: int) -> dict[str, Any]:
+    if method == CALIBRATION_METHOD_EXACT or rows <= CALIBRATION_SAMPLED_SKETCH_ROWS:
+        row_ids = np.arange(rows, dtype=np.int64)
+    else:
+        # Acima do limite, o histograma cobre apenas os pares de uma amostra fixa de linhas, nao todos os pares.
+        row_ids = np.sort(np.random.default_rng(seed).choice(rows, size=CALIBRATION_SAMPLED_SKETCH_ROWS, replace=False))
+    histogram = _pair_histogram(embeddings, row_ids, block_rows)
+    pairs = histogram["pairs"]
+    if not pairs:
+        return _empty_similarity_stats(rows, method)
+
+    counts = histogram["counts"]
+    cumulative = np.cumsum(counts)
+    quantile_ranks = {key: _quantile_ranks(pairs, quantile) for key, quantile in CALIBRATION_QUANTILES.items()}
+    exact = None
+    if method == CALIBRATION_METHOD_EXACT:
+        ranks = sorted({rank for lower, upper, _ in quantile_ranks.values() for rank in (lower, upper)})
+        exact = _exact_values(embeddings, row_ids, block_rows, counts, cumulative, ranks)
+
+    def _value(rank: int) -> float:
+        return exact[rank] if exact is not None else _sketch_value(counts, cumulative, rank)
+
+    stats: dict[str, Any] = {
+        "rows": rows,
+        "method": CALIBRATION_METHOD_EXACT if exact is not None else CALIBRATION_METHOD_SAMPLED_SKETCH,
+        "sampleRows": int(row_ids.size),
+        "samplePairs": pairs,
+        "mean": float(histogram["mean"]),
+        "max": float(histogram["max"]),
+    }
+    for key, (lower, upper, fraction) in quantile_ranks.items():
+        lower_value = _value(lower)
+        stats[key] = float(lower_value + (_value(upper) - lower_value) * fraction)
+    return stats
+
+
+def compute_similarity_stats(
+    embeddings: np.ndarray,
+    sample_pairs: int = CALIBRATION_SAMPLE_PAIRS,
+    seed: int = CALIBRATION_RANDOM_SEED,
+    method: str = CALIBRATION_METHOD_AUTO,
+    block_rows: int = CALIBRATION_BLOCK_ROWS,
+) -> dict[str, Any]:
+    """Distribuicao de similaridade entre pares de linhas do indice.
+
+    "exact" percorre todos os pares em blocos (duas passadas, percentis identicos a np.percentile);
+    "sampled_sketch" acumula um histograma fino sobre os pares de uma amostra de CALIBRATION_SAMPLED_SKETCH_ROWS
+    linhas (todos os pares apenas quando o indice cabe na amostra);
+    "sample" mantem a amostragem de pares aleatorios; "auto" escolhe exact ou sampled_sketch pelo tamanho.
+    """
+    if embeddings.ndim != 2:
+        raise ValueError("Embeddings invalidos para calibracao.")
+
+    rows = int(embeddings.shape[0])
+    resolved_method = _resolve_calibration_method(method, rows)
+    if rows <= 1:
+        return _empty_similarity_stats(rows, resolved_method)
+    if resolved_method == CALIBRATION_METHOD_SAMPLE:
+        return _random_pair_stats(embeddings, rows, sample_pairs, seed)
+    return _blocked_pair_stats(embeddings, rows, resolved_method, seed, max(1, int(block_rows or CALIBRATION_BLOCK_ROWS)))
+
+
 def recommend_min_score(stats: dict[str, Any], margin: float = CALIBRATION_MARGIN) -> float:
     base = float(stats.get("p99") or 0.0) + max(0.0, float(margin or 0.0))
     # Bias upward slightly to avoid admitting the noisy tail for each base.
@@ -88,9 +251,10 @@ def build_calibration_payload(
 ) -> dict[str, Any]:
     return {
         "version": CALIBRATION_VERSION,
-        "method": "random_pair_p99_plus_margin",
+        "method": CALIBRATION_PAYLOAD_METHODS.get(str(stats.get("method") or ""), CALIBRATION_PAYLOAD_METHODS[CALIBRATION_METHOD_SAMPLE]),
         "margin": float(margin),
         "seed": int(seed),
+        "sampleRows": int(stats.get("sampleRows") or 0),
         "samplePairs": int(stats.get("samplePairs") or 0),
         "rows": int(stats.get("rows") or 0),
         "meanSimilarity": float(stats.get("mean") or 0.0),
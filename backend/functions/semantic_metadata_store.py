@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+
+METADATA_STORE_VERSION = 2
+METADATA_STORE_READABLE_VERSIONS = (1, 2)
+METADATA_INTS_FILE = "metadata_ints.npy"
+METADATA_OFFSETS_FILE = "metadata_offsets.npy"
+METADATA_ARENA_FILE = "metadata_arena.npy"
+METADATA_INT_COLUMNS = ("row", "source_row", "chunk_index", "chunk_total", "text_plain_same")
+# Stores da versao 1 nao tinham a flag text_plain_same: ali, text_plain vazio significava "igual a text".
+METADATA_V1_INT_COLUMNS = METADATA_INT_COLUMNS[:4]
+METADATA_STRING_COLUMNS = ("text", "text_plain", "metadata", "book", "search_text", "metadata_text")
+METADATA_WRITE_BLOCK_ROWS = 4096
+METADATA_COPY_BLOCK_BYTES = 16 * 1024 * 1024
+
+
+def metadata_store_paths(index_dir: Path) -> dict[str, Path]:
+    return {
+        "ints": index_dir / METADATA_INTS_FILE,
+        "offsets": index_dir / METADATA_OFFSETS_FILE,
+        "arena": index_dir / METADATA_ARENA_FILE,
+    }
+
+
+def has_metadata_store(index_dir: Path, manifest: dict[str, Any] | None = None) -> bool:
+    if isinstance(manifest, dict):
+        store_info = manifest.get("metadata_store")
+        if not isinstance(store_info, dict) or int(store_info.get("version") or 0) not in METADATA_STORE_READABLE_VERSIONS:
+            return False
+    return all(path.exists() for path in metadata_store_paths(index_dir).values())
+
+
+def build_metadata_store_payload() -> dict[str, Any]:
+    return {
+        "version": METADATA_STORE_VERSION,
+        "intColumns": list(METADATA_INT_COLUMNS),
+        "stringColumns": list(METADATA_STRING_COLUMNS),
+    }
+
+
+def _safe_int(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _encode_row(row: Any, search_text: str, metadata_text: str) -> tuple[tuple[int, ...], tuple[str, ...]]:
+    row = row if isinstance(row, dict) else {}
+    metadata = row.get("metadata") if isinstance(row.get("metadata"), dict) else {}
+    text = str(row.get("text") or "")
+    text_plain = str(row.get("text_plain") or "")
+    text_plain_same = text_plain == text
+    ints = (
+        _safe_int(row.get("row")),
+        _safe_int(metadata.get("source_row")),
+        _safe_int(metadata.get("chunk_index")),
+        _safe_int(metadata.get("chunk_total")),
+        int(text_plain_same),
+    )
+    strings = (
+        text,
+        # Com a flag text_plain_same, o texto nao e duplicado na arena; text_plain vazio continua vazio.
+        "" if text_plain_same else text_plain,
+        json.dumps(metadata, ensure_ascii=False, separators=(",", ":")) if metadata else "",
+        str(row.get("book") or ""),
+        str(search_text or ""),
+        str(metadata_text or ""),
+    )
+    return ints, strings
+
+
+def encode_metadata_store(
+    rows: list[dict[str, Any]],
+    *,
+    search_texts: tuple[str, ...] | list[str],
+    metadata_texts: tuple[str, ...] | list[str],
+) -> dict[str, np.ndarray]:
+    if len(search_texts) != len(rows) or len(metadata_texts) != len(rows):
+        raise ValueError("Colunas de busca inconsistentes com a quantidade de linhas.")
+
+    row_count = len(rows)
+    ints = np.zeros((row_count, len(METADATA_INT_COLUMNS)), dtype=np.int32)
+    offsets = np.zeros((len(METADATA_STRING_COLUMNS), row_count + 1), dtype=np.int64)
+    columns: list[list[bytes]] = [[] for _ in METADATA_STRING_COLUMNS]
+    for position, row in enumerate(rows):
+        row_ints, strings = _encode_row(row, search_texts[position], metadata_texts[position])
+        ints[position] = row_ints
+        for column_position, value in enumerate(strings):
+            columns[column_position].append(value.encode("utf-8"))
+
+    cursor = 0
+    for column_position, values in enumerate(columns):
+        offsets[column_position, 0] = cursor
+        lengths = np.fromiter((len(value) for value in values), dtype=np.int64, count=row_count)
+        offsets[column_position, 1:] = cursor + np.cumsum(lengths)
+        cursor = int(offsets[column_position, -1])
+
+    arena = (
+        np.frombuffer(b"".join(value for values in columns for value in values), dtype=np.uint8)
+        if cursor
+        else np.zeros((0,), dtype=np.uint8)
+    )
+    return {
+        "ints": ints,
+        "offsets": offsets,
+        "arena": arena,
+    }
+
+
+def _replace_npy_from_raw(path: Path, dtype: Any, shape: tuple[int, ...], fill: Any) -> None:
+    # Grava o .npy final num temporario do mesmo diretorio e troca de forma atomica.
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f"{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        if int(np.prod(shape)) == 0:
+            with open(tmp_path, "wb") as handle:
+                np.save(handle, np.zeros(shape, dtype=dtype))
+        else:
+            target = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+            fill(target)
+            target.flush()
+            # O memmap precisa ser fechado antes do replace (no Windows o arquivo fica travado).
+            del target
+        Path(tmp_path).replace(path)
+    finally:
+        tmp_file = Path(tmp_path)
+        if tmp_file.exists():
+            tmp_file.unlink(missing_ok=True)
+
+
+class MetadataStoreWriter:
+    """Grava o metadata store linha a linha, sem montar colunas nem arena em memoria.
+
+    Cada coluna de texto vai para um arquivo temporario proprio (bytes e offsets em blocos de linhas);
+    commit() concatena as colunas na arena final e troca os tres .npy de forma atomica.
+    """
+
+    def __init__(self, index_dir: Path, block_rows: int = METADATA_WRITE_BLOCK_ROWS) -> None:
+        index_dir.mkdir(parents=True, exist_ok=True)
+        self._index_dir = index_dir
+        self._block_rows = max(1, int(block_rows or METADATA_WRITE_BLOCK_ROWS))
+        self._spool = Path(tempfile.mkdtemp(dir=str(index_dir), prefix=".metadata_store."))
+        self._arena_files = [open(self._spool / f"arena-{position}.bin", "wb") for position in range(len(METADATA_STRING_COLUMNS))]
+        self._offset_files = [open(self._spool / f"offsets-{position}.bin", "wb") for position in range(len(METADATA_STRING_COLUMNS))]
+        self._ints_file = open(self._spool / "ints.bin", "wb")
+        self._cursors = [0] * len(METADATA_STRING_COLUMNS)
+        self._pending_ints: list[tuple[int, ...]] = []
+        self._pending_offsets: list[list[int]] = [[] for _ in METADATA_STRING_COLUMNS]
+        self.rows = 0
+
+    def __enter__(self) -> MetadataStoreWriter:
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.close()
+
+    def append(self, row: Any, *, search_text: str, metadata_text: str) -> None:
+        row_ints, strings = _encode_row(row, search_text, metadata_text)
+        self._pending_ints.append(row_ints)
+        for column_position, value in enumerate(strings):
+            encoded = value.encode("utf-8")
+            if encoded:
+                self._arena_files[column_position].write(encoded)
+                self._cursors[column_position] += len(encoded)
+            self._pending_offsets[column_position].append(self._cursors[column_position])
+        self.rows += 1
+        if len(self._pending_ints) >= self._block_rows:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending_ints:
+            return
+        np.asarray(self._pending_ints, dtype=np.int32).tofile(self._ints_file)
+        for column_position, pending in enumerate(self._pending_offsets):
+            np.asarray(pending, dtype=np.int64).tofile(self._offset_files[column_position])
+            pending.clear()
+        self._pending_ints.clear()
+
+    def commit(self) -> None:
+        self._flush()
+        for handle in (*self._arena_files, *self._offset_files, self._ints_file):
+            handle.close()
+        paths = metadata_store_paths(self._index_dir)
+        column_count = len(METADATA_STRING_COLUMNS)
+        bases = np.concatenate(([0], np.cumsum(self._cursors))).astype(np.int64)
+
+        def _fill_ints(target: np.ndarray) -> None:
+            source = np.memmap(self._spool / "ints.bin", dtype=np.int32, mode="r", shape=target.shape)
+            for start in range(0, self.rows, self._block_rows):
+                target[start:start + self._block_rows] = source[start:start + self._block_rows]
+            del source
+
+        def _fill_offsets(target: np.ndarray) -> None:
+            target[:, 0] = bases[:-1]
+            if not self.rows:
+                return
+            for column_position in range(column_count):
+                relative = np.memmap(self._spool / f"offsets-{column_position}.bin", dtype=np.int64, mode="r", shape=(self.rows,))
+                for start in range(0, self.rows, self._block_rows):
+                    end = min(self.rows, start + self._block_rows)
+                    target[column_position, start + 1:end + 1] = bases[column_position] + relative[start:end]
+                del relative
+
+        def _fill_arena(target: np.ndarray) -> None:
+            for column_position in range(column_count):
+                cursor = int(bases[column_position])
+                with open(self._spool / f"arena-{column_position}.bin", "rb") as handle:
+                    while True:
+                        block = handle.read(METADATA_COPY_BLOCK_BYTES)
+                        if not block:
+                            break
+                        target[cursor:cursor + len(block)] = np.frombuffer(block, dtype=np.uint8)
+                        cursor += len(block)
+
+        _replace_npy_from_raw(paths["ints"], np.int32, (self.rows, len(METADATA_INT_COLUMNS)), _fill_ints)
+        _replace_npy_from_raw(paths["offsets"], np.int64, (column_count, self.rows + 1), _fill_offsets)
+        _replace_npy_from_raw(paths["arena"], np.uint8, (int(bases[-1]),), _fill_arena)
+        self.close()
+
+    def close(self) -> None:
+        for handle in (*self._arena_files, *self._offset_files, self._ints_file):
+            if not handle.closed:
+                handle.close()
+        shutil.rmtree(self._spool, ignore_errors=True)
+
+
+class ArenaStringColumn(Sequence):
+    """Coluna de texto do metadata store; cada valor e decodificado da arena so quando acessado."""
+
+    def __init__(self, offsets: np.ndarray, arena: np.ndarray) -> None:
+        self._offsets = offsets
+        self._arena = arena
+
+    def __len__(self) -> int:
+        return max(0, int(self._offsets.shape[0]) - 1)
+
+    def __getitem__(self, position: int) -> str:  # type: ignore[override]
+        if isinstance(position, slice):
+            raise TypeError("ArenaStringColumn nao suporta fatias.")
+        resolved = int(position)
+        if resolved < 0:
+            resolved += len(self)
+        if resolved < 0 or resolved >= len(self):
+            raise IndexError("Posicao fora da coluna.")
+        start = int(self._offsets[resolved])
+        end = int(self._offsets[resolved + 1])
+        if end <= start:
+            return ""
+        return bytes(self._arena[start:end]).decode("utf-8")
+
+
+class SemanticMetadataStore(Sequence):
+    """Metadata colunar de um indice semantico; cada linha so vira dict quando acessada."""
+
+    def __init__(self, ints: np.ndarray, offsets: np.ndarray, arena: np.ndarray) -> None:
+        if ints.ndim != 2 or ints.shape[1] not in (len(METADATA_V1_INT_COLUMNS), len(METADATA_INT_COLUMNS)):
+            raise ValueError("Colunas inteiras invalidas no metadata store.")
+        if offsets.ndim != 2 or offsets.shape != (len(METADATA_STRING_COLUMNS), ints.shape[0] + 1):
+            raise ValueError("Offsets invalidos no metadata store.")
+        self._ints = ints
+        self._offsets = offsets
+        self._arena = arena
+
+    @classmethod
+    def open(cls, index_dir: Path) -> SemanticMetadataStore:
+        paths = metadata_store_paths(index_dir)
+        return cls(
+            np.load(paths["ints"], mmap_mode="r"),
+            np.load(paths["offsets"], mmap_mode="r"),
+            np.load(paths["arena"], mmap_mode="r"),
+        )
+
+    def __len__(self) -> int:
+        return int(self._ints.shape[0])
+
+    def _resolve_position(self, position: int) -> int:
+        resolved = int(position)
+        if resolved < 0:
+            resolved += len(self)
+        if resolved < 0 or resolved >= len(self):
+            raise IndexError("Posicao fora do metadata store.")
+        return resolved
+
+    def _string(self, column_position: int, position: int) -> str:
+        start = int(self._offsets[column_position, position])
+        end = int(self._offsets[column_position, position + 1])
+        if end <= start:
+            return ""
+        return bytes(self._arena[start:end]).decode("utf-8")
+
+    def __getitem__(self, position: int) -> dict[str, Any]:  # type: ignore[override]
+        if isinstance(position, slice):
+            raise TypeError("SemanticMetadataStore nao suporta fatias.")
+        resolved = self._resolve_position(position)
+        text = self._string(0, resolved)
+        text_plain = self._string(1, resolved)
+        if self._ints.shape[1] > len(METADATA_V1_INT_COLUMNS):
+            text_plain = text if self._ints[resolved, 4] else text_plain
+        else:
+            text_plain = text_plain or text
+        metadata_json = self._string(2, resolved)
+        row: dict[str, Any] = {
+            "row": int(self._ints[resolved, 0]),
+            "text": text,
+            "text_plain": text_plain,
+            "metadata": json.loads(metadata_json) if metadata_json else {},
+        }
+        book = self._string(3, resolved)
+        if book:
+            row["book"] = book
+        return row
+
+    @property
+    def row_numbers(self) -> np.ndarray:
+        return self._ints[:, 0]
+
+    def int_column(self, name: str) -> np.ndarray:
+        return self._ints[:, METADATA_INT_COLUMNS.index(name)]
+
+    def string_view(self, name: str) -> ArenaStringColumn:
+        return ArenaStringColumn(self._offsets[METADATA_STRING_COLUMNS.index(name)], self._arena)
+
+    def string_column(self, name: str) -> tuple[str, ...]:
+        column_position = METADATA_STRING_COLUMNS.index(name)
+        column_offsets = np.asarray(self._offsets[column_position])
+        if column_offsets.size <= 1:
+            return ()
+        start = int(column_offsets[0])
+        end = int(column_offsets[-1])
+        blob = bytes(self._arena[start:end])
+        relative = (column_offsets - start).tolist()
+        return tuple(
+            blob[relative[position]:relative[position + 1]].decode("utf-8")
+            for position in range(len(relative) - 1)
+        )
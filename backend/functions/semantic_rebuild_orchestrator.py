@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any
+
+try:
+    from backend.functions.semantic_index_builder import (
+        EMBED_MAX_CONCURRENCY,
+        EmbeddingRateGate,
+        _utc_iso_now,
+        _write_json_atomic,
+        prepare_semantic_rebuild,
+        rebuild_semantic_index,
+    )
+except Exception:
+    from functions.semantic_index_builder import (
+        EMBED_MAX_CONCURRENCY,
+        EmbeddingRateGate,
+        _utc_iso_now,
+        _write_json_atomic,
+        prepare_semantic_rebuild,
+        rebuild_semantic_index,
+    )
+
+
+REBUILD_REPORT_VERSION = 1
+DEFAULT_PARALLEL_INDEXES = 3
+PREPARE_OPTION_KEYS = ("target_chars", "max_chars", "min_chars", "require_source_file", "chunk_tokenizer", "chunk_workers")
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def _build_index_entry(index_dir: Path, prepared: dict[str, Any], result: dict[str, Any], build_ms: float) -> dict[str, Any]:
+    return {
+        "indexId": index_dir.name,
+        "status": "ok",
+        "rowsBefore": int(result["rows_before"]),
+        "chunks": int(result["rows_after"]),
+        "embeddedChunks": int(result["embeddings_computed"]),
+        "reusedChunks": int(result["embeddings_reused"]),
+        "duplicatesRemoved": int(result["duplicates_removed"]),
+        "estimatedTokens": int(result["estimated_tokens"]),
+        "recommendedMinScore": float(result["recommended_min_score"]),
+        "prepareMs": float(prepared.get("prepare_ms") or 0.0),
+        "buildMs": build_ms,
+        "elapsedMs": round(float(prepared.get("prepare_ms") or 0.0) + build_ms, 3),
+        "warning": result.get("warning"),
+    }
+
+
+def _error_entry(index_dir: Path, stage: str, exc: BaseException) -> dict[str, Any]:
+    return {"indexId": index_dir.name, "status": "error", "stage": stage, "error": str(exc)}
+
+
+def rebuild_semantic_indexes(
+    index_dirs: list[Path],
+    *,
+    api_key: str,
+    max_parallel_indexes: int = DEFAULT_PARALLEL_INDEXES,
+    prepare_workers: int | None = None,
+    max_in_flight: int | None = None,
+    report_path: Path | None = None,
+    progress_callback: Any | None = None,
+    **rebuild_options: Any,
+) -> dict[str, Any]:
+    """Reconstroi varios indices em paralelo e consolida um relatorio por indice.
+
+    Leitura do XLSX e rechunking rodam num pool de processos; embeddings e gravacao rodam em threads,
+    com um unico EmbeddingRateGate compartilhado limitando as requisicoes em voo de todos os indices.
+    """
+    started = time.perf_counter()
+    parallel_indexes = max(1, int(max_parallel_indexes or 1))
+    per_index_concurrency = max(1, int(rebuild_options.pop("max_concurrency", EMBED_MAX_CONCURRENCY) or 1))
+    gate = EmbeddingRateGate(max_in_flight or per_index_concurrency * parallel_indexes)
+    prepare_options = {key: rebuild_options[key] for key in PREPARE_OPTION_KEYS if key in rebuild_options}
+    entries: dict[str, dict[str, Any]] = {}
+
+    def _record(entry: dict[str, Any]) -> None:
+        entries[entry["indexId"]] = entry
+        if progress_callback:
+            progress_callback(entry)
+
+    def _build(index_dir: Path, prepared: dict[str, Any]) -> dict[str, Any]:
+        build_started = time.perf_counter()
+        result = rebuild_semantic_index(
+            index_dir,
+            api_key=api_key,
+            prepared=prepared,
+            rate_gate=gate,
+            max_concurrency=per_index_concurrency,
+            **rebuild_options,
+        )
+        return _build_index_entry(index_dir, prepared, result, _elapsed_ms(build_started))
+
+    with ProcessPoolExecutor(max_workers=prepare_workers) as process_pool, ThreadPoolExecutor(max_workers=parallel_indexes) as thread_pool:
+        prepare_futures = {
+            process_pool.submit(prepare_semantic_rebuild, index_dir, **prepare_options): index_dir
+            for index_dir in index_dirs
+        }
+        build_futures: dict[Future, Path] = {}
+        # Cada indice entra na fila de embeddings assim que seu rechunking termina.
+        for future in as_completed(prepare_futures):
+            index_dir = prepare_futures[future]
+            try:
+                prepared = future.result()
+            except Exception as exc:
+                _record(_error_entry(index_dir, "prepare", exc))
+                continue
+            build_futures[thread_pool.submit(_build, index_dir, prepared)] = index_dir
+        for future in as_completed(build_futures):
+            index_dir = build_futures[future]
+            try:
+                _record(future.result())
+            except Exception as exc:
+                _record(_error_entry(index_dir, "build", exc))
+
+    ordered = [entries[index_dir.name] for index_dir in index_dirs if index_dir.name in entries]
+    succeeded = [entry for entry in ordered if entry["status"] == "ok"]
+    report = {
+        "version": REBUILD_REPORT_VERSION,
+        "generatedAt": _utc_iso_now(),
+        "elapsedMs": _elapsed_ms(started),
+        "parallelIndexes": parallel_indexes,
+        "maxInFlight": max_in_flight or per_index_concurrency * parallel_indexes,
+        "totals": {
+            "indexes": len(ordered),
+            "failed": len(ordered) - len(succeeded),
+            "rowsBefore": sum(entry["rowsBefore"] for entry in succeeded),
+            "chunks": sum(entry["chunks"] for entry in succeeded),
+            "embeddedChunks": sum(entry["embeddedChunks"] for entry in succeeded),
+            "estimatedTokens": sum(entry["estimatedTokens"] for entry in succeeded),
+        },
+        "indexes": ordered,
+    }
+    if report_path is not None:
+        _write_json_atomic(report_path, report)
+    return report
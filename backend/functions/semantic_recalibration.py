@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any
+
+try:
+    from backend.functions.semantic_index_builder import _write_json_atomic
+    from backend.functions.semantic_index_calibration import (
+        CALIBRATION_MARGIN,
+        CALIBRATION_METHOD_AUTO,
+        CALIBRATION_RANDOM_SEED,
+        CALIBRATION_SAMPLE_PAIRS,
+        build_calibration_payload,
+        compute_similarity_stats,
+        load_embeddings_for_calibration,
+        recommend_min_score,
+    )
+except Exception:
+    from functions.semantic_index_builder import _write_json_atomic
+    from functions.semantic_index_calibration import (
+        CALIBRATION_MARGIN,
+        CALIBRATION_METHOD_AUTO,
+        CALIBRATION_RANDOM_SEED,
+        CALIBRATION_SAMPLE_PAIRS,
+        build_calibration_payload,
+        compute_similarity_stats,
+        load_embeddings_for_calibration,
+        recommend_min_score,
+    )
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def recalibrate_semantic_manifest(index_dir: Path, method: str = CALIBRATION_METHOD_AUTO) -> dict[str, Any]:
+    """Recalcula recommended_min_score de um indice e regrava o manifest de forma atomica."""
+    started = time.perf_counter()
+    manifest_path = index_dir / "manifest.json"
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Manifest nao encontrado: {manifest_path}")
+
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    previous = manifest.get("recommended_min_score")
+    previous_calibration = manifest.get("score_calibration") if isinstance(manifest.get("score_calibration"), dict) else {}
+    embeddings = load_embeddings_for_calibration(index_dir)
+    stats = compute_similarity_stats(
+        embeddings,
+        sample_pairs=CALIBRATION_SAMPLE_PAIRS,
+        seed=CALIBRATION_RANDOM_SEED,
+        method=method,
+    )
+    # Solta o memmap antes de regravar arquivos na pasta do indice.
+    del embeddings
+    recommended = recommend_min_score(stats, margin=CALIBRATION_MARGIN)
+    manifest["recommended_min_score"] = recommended
+    manifest["score_calibration"] = build_calibration_payload(
+        stats,
+        margin=CALIBRATION_MARGIN,
+        seed=CALIBRATION_RANDOM_SEED,
+    )
+    _write_json_atomic(manifest_path, manifest)
+    return {
+        "indexId": index_dir.name,
+        "status": "ok",
+        "previousMinScore": None if previous is None else float(previous),
+        "recommendedMinScore": float(recommended),
+        "previousP99": None if not previous_calibration else float(previous_calibration.get("p99Similarity") or 0.0),
+        "p99": float(stats["p99"]),
+        "rows": int(stats["rows"]),
+        "method": str(stats.get("method") or method),
+        "elapsedMs": _elapsed_ms(started),
+    }
+
+
+def recalibrate_semantic_manifests(
+    index_dirs: list[Path],
+    *,
+    workers: int = 1,
+    method: str = CALIBRATION_METHOD_AUTO,
+    progress_callback: Any | None = None,
+) -> dict[str, Any]:
+    """Recalibra varios indices; com workers > 1, cada indice roda num processo separado."""
+    started = time.perf_counter()
+    entries: dict[str, dict[str, Any]] = {}
+
+    def _record(entry: dict[str, Any]) -> None:
+        entries[entry["indexId"]] = entry
+        if progress_callback:
+            progress_callback(entry)
+
+    def _error_entry(index_dir: Path, exc: BaseException) -> dict[str, Any]:
+        return {"indexId": index_dir.name, "status": "error", "error": str(exc)}
+
+    if max(1, int(workers or 1)) <= 1 or len(index_dirs) <= 1:
+        for index_dir in index_dirs:
+            try:
+                _record(recalibrate_semantic_manifest(index_dir, method))
+            except Exception as exc:
+                _record(_error_entry(index_dir, exc))
+    else:
+        with ProcessPoolExecutor(max_workers=min(int(workers), len(index_dirs))) as pool:
+            futures = {pool.submit(recalibrate_semantic_manifest, index_dir, method): index_dir for index_dir in index_dirs}
+            for future in as_completed(futures):
+                try:
+                    _record(future.result())
+                except Exception as exc:
+                    _record(_error_entry(futures[future], exc))
+
+    ordered = [entries[index_dir.name] for index_dir in index_dirs if index_dir.name in entries]
+    return {
+        "elapsedMs": _elapsed_ms(started),
+        "workers": max(1, int(workers or 1)),
+        "failed": sum(1 for entry in ordered if entry["status"] != "ok"),
+        "indexes": ordered,
+    }
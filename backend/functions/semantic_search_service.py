@@ -1,30 +1,96 @@
 from __future__ import annotations
 
+import asyncio
+import copy
+import heapq
 import json
 import re
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from threading import Lock
+from threading import Event, Lock
 from typing import Any
 
 import numpy as np
-import requests
 
 try:
+    from backend.functions.semantic_embedding_providers import (
+        DEFAULT_EMBEDDING_PROVIDER,
+        OPENAI_EMBEDDING_PROVIDER,
+        aclose_async_embeddings_client,
+        default_embedding_model,
+        get_embedding_provider,
+        manifest_embedding_provider,
+        normalize_embedding_provider,
+    )
+    from backend.functions.semantic_embedding_shards import ShardedEmbeddings, embedding_shard_files, has_embedding_shards
     from backend.functions.semantic_index_calibration import DEFAULT_MIN_SCORE
+    from backend.functions.semantic_metadata_store import SemanticMetadataStore, has_metadata_store, metadata_store_paths
     from backend.functions.semantic_query_context_service import resolve_semantic_query_context
     from backend.functions.semantic_query_expansion import build_semantic_query_variants
+    from backend.functions.semantic_search_text import (
+        SEARCH_POSTINGS_COLUMNS,
+        SEARCH_TOKEN_RE,
+        SearchPostings,
+        has_search_postings,
+        metadata_search_texts,
+        normalize_match_text,
+        row_search_text,
+        search_postings_paths,
+    )
 except Exception:
+    from functions.semantic_embedding_providers import (
+        DEFAULT_EMBEDDING_PROVIDER,
+        OPENAI_EMBEDDING_PROVIDER,
+        aclose_async_embeddings_client,
+        default_embedding_model,
+        get_embedding_provider,
+        manifest_embedding_provider,
+        normalize_embedding_provider,
+    )
+    from functions.semantic_embedding_shards import ShardedEmbeddings, embedding_shard_files, has_embedding_shards
     from functions.semantic_index_calibration import DEFAULT_MIN_SCORE
+    from functions.semantic_metadata_store import SemanticMetadataStore, has_metadata_store, metadata_store_paths
     from functions.semantic_query_context_service import resolve_semantic_query_context
     from functions.semantic_query_expansion import build_semantic_query_variants
+    from functions.semantic_search_text import (
+        SEARCH_POSTINGS_COLUMNS,
+        SEARCH_TOKEN_RE,
+        SearchPostings,
+        has_search_postings,
+        metadata_search_texts,
+        normalize_match_text,
+        row_search_text,
+        search_postings_paths,
+    )
 
 
 SEMANTIC_DIR = Path(__file__).resolve().parents[1] / "Files" / "Semantic"
-EMBEDDINGS_API_URL = "https://api.openai.com/v1/embeddings"
-_EMBEDDINGS_SESSION = requests.Session()
 _SEMANTIC_INDEX_CACHE: dict[str, dict[str, Any]] = {}
 _SEMANTIC_INDEX_CACHE_LOCK = Lock()
+SEMANTIC_RESULT_CACHE_MAX_ENTRIES = 256
+SEMANTIC_RESULT_CACHE_TTL_SECONDS = 600.0
+_SEMANTIC_RESULT_CACHE: OrderedDict[tuple[Any, ...], tuple[float, tuple[Any, ...]]] = OrderedDict()
+_SEMANTIC_RESULT_CACHE_LOCK = Lock()
+_EMPTY_POSTINGS = np.zeros((0,), dtype=np.int32)
+SEMANTIC_OVERVIEW_MAX_WORKERS = 4
+SEMANTIC_SHARD_MAX_WORKERS = 4
+AVERAGE_QUERY_SCORING = "average"
+MAX_QUERY_SCORING = "max"
+WEIGHTED_MAX_QUERY_SCORING = "weighted_max"
+QUERY_SCORING_MODES = (AVERAGE_QUERY_SCORING, MAX_QUERY_SCORING, WEIGHTED_MAX_QUERY_SCORING)
+QUERY_SCORING_OFFSET_PERCENTILE = 99.0
+QUERY_SCORING_OFFSET_SAMPLE_ROWS = 65536
+STATIC_SCORE_CUTOFF = "static"
+ZSCORE_SCORE_CUTOFF = "zscore"
+KNEE_SCORE_CUTOFF = "knee"
+SCORE_CUTOFF_MODES = (STATIC_SCORE_CUTOFF, ZSCORE_SCORE_CUTOFF, KNEE_SCORE_CUTOFF)
+ADAPTIVE_CUTOFF_ZSCORE = 3.0
+ADAPTIVE_CUTOFF_TOP_N = 256
 RERANK_CANDIDATE_MULTIPLIER = 4
+# Frase e ordem dos termos sao lacos por candidato (str.find em C); o teto limita esse custo por busca.
 RERANK_CANDIDATE_CAP = 40
 RERANK_SEMANTIC_WEIGHT = 0.82
 RERANK_ALIGNMENT_WEIGHT = 0.18
@@ -61,8 +127,9 @@ def _normalize_index_id(value: str) -> str:
     return (value or "").strip().lower()
 
 
-def _index_dir(index_id: str) -> Path:
-    path = SEMANTIC_DIR / _normalize_index_id(index_id)
+def _index_dir(index_id: str, semantic_dir: Path | None = None) -> Path:
+    # semantic_dir explicito (benchmark, testes) evita trocar SEMANTIC_DIR do processo inteiro.
+    path = (semantic_dir or SEMANTIC_DIR) / _normalize_index_id(index_id)
     if not path.exists():
         raise FileNotFoundError(f"Indice semantico nao encontrado: {index_id}")
     return path
@@ -88,15 +155,6 @@ def _file_signature(path: Path) -> tuple[int, int]:
     return stat.st_mtime_ns, stat.st_size
 
 
-def _normalize_match_text(text: str) -> str:
-    try:
-        from backend.functions.lexical_search_service import _normalize_for_match, _sanitize_search_text, _strip_markdown_simple
-    except Exception:
-        from functions.lexical_search_service import _normalize_for_match, _sanitize_search_text, _strip_markdown_simple
-
-    return _normalize_for_match(_strip_markdown_simple(_sanitize_search_text(text or "")))
-
-
 def _build_lexical_duplicate_filter(raw_query: str) -> Any | None:
     sanitized_query = (raw_query or "").strip()
     if not sanitized_query:
@@ -120,14 +178,58 @@ def _build_lexical_duplicate_filter(raw_query: str) -> Any | None:
     return _is_duplicate
 
 
-def _row_search_text(row: Any) -> str:
-    if not isinstance(row, dict):
-        return ""
-    return _normalize_match_text(str(row.get("text_plain") or row.get("text") or ""))
+def _build_search_postings(search_texts: Sequence[str]) -> SearchPostings:
+    return SearchPostings.build(search_texts)
+
+
+def _postings_candidate_mask(
+    search_postings: SearchPostings,
+    required_literals: list[str],
+    row_count: int,
+) -> np.ndarray | None:
+    # Literais do prefiltro casam por substring; cada palavra precisa aparecer dentro de algum token da linha.
+    candidate_mask: np.ndarray | None = None
+    for literal in required_literals:
+        for word in SEARCH_TOKEN_RE.findall(literal):
+            word_mask = search_postings.substring_mask(word, row_count)
+            candidate_mask = word_mask.copy() if candidate_mask is None else candidate_mask & word_mask
+            if not candidate_mask.any():
+                return candidate_mask
+    return candidate_mask
+
+
+def _lexical_duplicate_predicate(
+    raw_query: str,
+    search_texts: Sequence[str],
+    row_count: int,
+    search_postings: SearchPostings | None = None,
+) -> Callable[[np.ndarray], np.ndarray] | None:
+    lexical_filter = _build_lexical_duplicate_filter(raw_query)
+    if lexical_filter is None:
+        return None
+
+    try:
+        from backend.functions.lexical_search_service import _extract_prefilter_literals
+    except Exception:
+        from functions.lexical_search_service import _extract_prefilter_literals
+
+    postings_mask: np.ndarray | None = None
+    literals = _extract_prefilter_literals(raw_query)
+    if search_postings is not None and literals is not None and literals[0]:
+        postings_mask = _postings_candidate_mask(search_postings, literals[0], row_count)
+
+    def _is_duplicate(positions: np.ndarray) -> np.ndarray:
+        duplicates = np.zeros(positions.shape, dtype=np.bool_)
+        candidates = np.arange(positions.size) if postings_mask is None else np.flatnonzero(postings_mask[positions])
+        for local_position in candidates:
+            duplicates[local_position] = lexical_filter(search_texts[int(positions[local_position])])
+        return duplicates
+
+    return _is_duplicate
 
 
 def _extract_rerank_terms(raw_query: str) -> tuple[str, tuple[str, ...]]:
-    normalized_query = _normalize_match_text(raw_query)
+    normalized_query = normalize_match_text(raw_query)
     if not normalized_query:
         return "", ()
 
@@ -139,41 +241,24 @@ def _extract_rerank_terms(raw_query: str) -> tuple[str, tuple[str, ...]]:
     return normalized_query, query_terms
 
 
-def _collect_metadata_text(value: Any, collector: list[str], depth: int = 0) -> None:
-    if value is None or depth > 2 or len(collector) >= 16:
-        return
-
-    if isinstance(value, dict):
-        for nested in value.values():
-            _collect_metadata_text(nested, collector, depth + 1)
-        return
-
-    if isinstance(value, (list, tuple, set)):
-        for nested in value:
-            _collect_metadata_text(nested, collector, depth + 1)
-        return
-
-    text = _normalize_match_text(str(value))
-    if text:
-        collector.append(text)
-
-
-def _metadata_search_text(metadata: Any) -> str:
-    collector: list[str] = []
-    _collect_metadata_text(metadata, collector)
-    return " ".join(collector[:16]).strip()
-
-
-def _term_coverage_ratio(query_terms: tuple[str, ...], normalized_text: str) -> float:
-    if not query_terms or not normalized_text:
-        return 0.0
-
-    text_tokens = set(re.findall(r"\w+", normalized_text))
-    if not text_tokens:
-        return 0.0
-
-    hits = sum(1 for term in query_terms if term in text_tokens)
-    return hits / len(query_terms)
+def _term_coverage_batch(
+    query_terms: tuple[str, ...],
+    positions: np.ndarray,
+    texts: Sequence[str],
+    postings: SearchPostings | None,
+) -> np.ndarray:
+    if not query_terms or positions.size == 0:
+        return np.zeros((positions.size,), dtype=np.float32)
+
+    if postings is not None:
+        hits = np.vstack([
+            np.isin(positions, postings.get(term, _EMPTY_POSTINGS), assume_unique=True)
+            for term in query_terms
+        ])
+    else:
+        token_sets = [set(SEARCH_TOKEN_RE.findall(texts[int(position)])) for position in positions]
+        hits = np.asarray([[term in tokens for tokens in token_sets] for term in query_terms], dtype=np.bool_)
+    return hits.mean(axis=0, dtype=np.float32)
 
 
 def _ordered_term_ratio(query_terms: tuple[str, ...], normalized_text: str) -> float:
@@ -192,46 +277,110 @@ def _ordered_term_ratio(query_terms: tuple[str, ...], normalized_text: str) -> f
     return hits / len(query_terms)
 
 
-def _phrase_hit(normalized_query: str, normalized_text: str) -> float:
-    if not normalized_query or not normalized_text:
-        return 0.0
-    return 1.0 if normalized_query in normalized_text else 0.0
-
-
-def _alignment_score(normalized_query: str, query_terms: tuple[str, ...], search_text: str, metadata: Any) -> float:
-    if not normalized_query and not query_terms:
-        return 0.0
-
-    metadata_text = _metadata_search_text(metadata)
-    text_coverage = _term_coverage_ratio(query_terms, search_text)
-    text_order = _ordered_term_ratio(query_terms, search_text)
-    text_phrase = _phrase_hit(normalized_query, search_text)
-    metadata_coverage = _term_coverage_ratio(query_terms, metadata_text)
-    metadata_phrase = _phrase_hit(normalized_query, metadata_text)
+def _alignment_scores(
+    normalized_query: str,
+    query_terms: tuple[str, ...],
+    positions: np.ndarray,
+    search_texts: Sequence[str],
+    metadata_texts: Sequence[str],
+    search_postings: SearchPostings | None = None,
+    metadata_postings: SearchPostings | None = None,
+) -> np.ndarray:
+    if (not normalized_query and not query_terms) or positions.size == 0:
+        return np.zeros((positions.size,), dtype=np.float32)
+
+    candidate_texts = [search_texts[int(position)] for position in positions]
+    candidate_metadata_texts = [metadata_texts[int(position)] for position in positions]
+    text_coverage = _term_coverage_batch(query_terms, positions, search_texts, search_postings)
+    metadata_coverage = _term_coverage_batch(query_terms, positions, metadata_texts, metadata_postings)
+    text_order = np.fromiter(
+        (_ordered_term_ratio(query_terms, text) for text in candidate_texts),
+        dtype=np.float32,
+        count=positions.size,
+    )
+    text_phrase = np.fromiter(
+        (bool(normalized_query) and normalized_query in text for text in candidate_texts),
+        dtype=np.float32,
+        count=positions.size,
+    )
+    metadata_phrase = np.fromiter(
+        (bool(normalized_query) and normalized_query in text for text in candidate_metadata_texts),
+        dtype=np.float32,
+        count=positions.size,
+    )
 
-    return min(
+    return np.minimum(
         1.0,
         (0.44 * text_coverage)
         + (0.18 * text_order)
         + (0.24 * text_phrase)
         + (0.10 * metadata_coverage)
         + (0.04 * metadata_phrase),
-    )
+    ).astype(np.float32, copy=False)
 
 
-def _load_semantic_index(index_id: str) -> dict[str, Any]:
-    base_dir = _index_dir(index_id)
+def _source_group_ids(metadata: Sequence[dict[str, Any]]) -> np.ndarray:
+    # Chunks do mesmo paragrafo compartilham "row"; o id de grupo e a posicao da linha de origem distinta.
+    stored_row_numbers = getattr(metadata, "row_numbers", None)
+    if stored_row_numbers is not None:
+        row_numbers = np.asarray(stored_row_numbers, dtype=np.int64)
+    else:
+        row_numbers = np.fromiter(
+            (int((row or {}).get("row") or 0) for row in metadata),
+            dtype=np.int64,
+            count=len(metadata),
+        )
+    _, group_ids = np.unique(row_numbers, return_inverse=True)
+    return group_ids.astype(np.int32, copy=False).reshape(-1)
+
+
+def _collapse_by_source(
+    eligible_positions: np.ndarray,
+    eligible_scores: np.ndarray,
+    source_groups: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Segment-max: ordena por grupo e score decrescente; o primeiro de cada segmento e o melhor chunk.
+    eligible_groups = source_groups[eligible_positions]
+    order = np.lexsort((eligible_positions, -eligible_scores, eligible_groups))
+    sorted_groups = eligible_groups[order]
+    segment_starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    segment_sizes = np.diff(np.r_[segment_starts, sorted_groups.size])
+    representatives = eligible_positions[order[segment_starts]]
+    position_order = np.argsort(representatives, kind="stable")
+    return representatives[position_order], segment_sizes[position_order]
+
+
+def _open_search_postings(base_dir: Path, column: str, texts: Sequence[str]) -> SearchPostings:
+    # Indices sem postings gravados pelo rebuild montam o indice so na primeira consulta que o usa.
+    if has_search_postings(base_dir, column):
+        return SearchPostings.open(base_dir, column)
+    return SearchPostings.deferred(texts)
+
+
+def _load_semantic_index(index_id: str, semantic_dir: Path | None = None) -> dict[str, Any]:
+    base_dir = _index_dir(index_id, semantic_dir)
     manifest_path = base_dir / "manifest.json"
     metadata_path = base_dir / "metadata.json"
     embeddings_path = base_dir / "embeddings.npy"
+    store_paths = metadata_store_paths(base_dir)
+    store_exists = all(path.exists() for path in store_paths.values())
+    shard_paths = embedding_shard_files(base_dir)
 
-    if not manifest_path.exists() or not metadata_path.exists() or not embeddings_path.exists():
+    if not manifest_path.exists() or not (embeddings_path.exists() or shard_paths) or not (store_exists or metadata_path.exists()):
         raise FileNotFoundError(f"Arquivos do indice semantico incompletos: {base_dir}")
 
     signature = {
         "manifest": _file_signature(manifest_path),
-        "metadata": _file_signature(metadata_path),
-        "embeddings": _file_signature(embeddings_path),
+        "metadata": _file_signature(metadata_path) if metadata_path.exists() else None,
+        "embeddings": _file_signature(embeddings_path) if embeddings_path.exists() else None,
+        "embedding_shards": tuple(_file_signature(path) for path in shard_paths) if shard_paths else None,
+        "metadata_store": tuple(_file_signature(path) for path in store_paths.values()) if store_exists else None,
+        "search_postings": tuple(
+            _file_signature(path)
+            for column in SEARCH_POSTINGS_COLUMNS
+            if has_search_postings(base_dir, column)
+            for path in search_postings_paths(base_dir, column).values()
+        ),
     }
     normalized_index_id = _normalize_index_id(index_id)
 
@@ -241,11 +390,28 @@ def _load_semantic_index(index_id: str) -> dict[str, Any]:
             return cached["payload"]
 
     manifest = _load_json(manifest_path)
-    metadata = _load_json(metadata_path)
-    embeddings = np.load(embeddings_path, mmap_mode="r")
+    # Indices fatiados nunca precisam da matriz inteira residente: o scoring percorre shard a shard.
+    if has_embedding_shards(base_dir, manifest):
+        embeddings = ShardedEmbeddings.open(base_dir, manifest, max_workers=SEMANTIC_SHARD_MAX_WORKERS)
+    elif embeddings_path.exists():
+        embeddings = np.load(embeddings_path, mmap_mode="r")
+    else:
+        raise FileNotFoundError(f"Arquivos do indice semantico incompletos: {base_dir}")
+
+    if store_exists and has_metadata_store(base_dir, manifest):
+        # Textos de busca ficam na arena (memmap) e so sao decodificados nas linhas consultadas.
+        metadata = SemanticMetadataStore.open(base_dir)
+        search_texts = metadata.string_view("search_text")
+        metadata_texts = metadata.string_view("metadata_text")
+    else:
+        if not metadata_path.exists():
+            raise FileNotFoundError(f"Arquivos do indice semantico incompletos: {base_dir}")
+        metadata = _load_json(metadata_path)
+        if not isinstance(metadata, list):
+            raise ValueError(f"Metadata invalida para o indice {index_id}")
+        search_texts = tuple(row_search_text(row) for row in metadata)
+        metadata_texts = metadata_search_texts(metadata)
 
-    if not isinstance(metadata, list):
-        raise ValueError(f"Metadata invalida para o indice {index_id}")
     if len(metadata) != int(getattr(embeddings, "shape", [0])[0]):
         raise ValueError(f"Quantidade de embeddings inconsistente no indice {index_id}")
 
@@ -253,8 +419,13 @@ def _load_semantic_index(index_id: str) -> dict[str, Any]:
         "manifest": manifest,
         "metadata": metadata,
         "embeddings": embeddings,
-        "search_texts": tuple(_row_search_text(row) for row in metadata),
+        "search_texts": search_texts,
+        "search_postings": _open_search_postings(base_dir, "search", search_texts),
+        "metadata_texts": metadata_texts,
+        "metadata_postings": _open_search_postings(base_dir, "metadata", metadata_texts),
+        "source_groups": _source_group_ids(metadata),
         "recommended_min_score": _resolve_recommended_min_score(manifest, normalized_index_id),
+        "signature": tuple(sorted(signature.items())),
     }
 
     with _SEMANTIC_INDEX_CACHE_LOCK:
@@ -266,12 +437,128 @@ def _load_semantic_index(index_id: str) -> dict[str, Any]:
     return payload
 
 
-def list_semantic_indexes() -> list[dict[str, Any]]:
-    if not SEMANTIC_DIR.exists():
+def _semantic_result_cache_key(
+    index_id: str,
+    signature: Any,
+    query: str,
+    limit: int,
+    min_score: float | None,
+    exclude_lexical_duplicates: bool,
+    use_rag_context: bool,
+    vector_store_ids: list[str] | None,
+    ignore_base_calibration: bool,
+    query_scoring: str = AVERAGE_QUERY_SCORING,
+    collapse_chunks: bool = False,
+    score_cutoff: str = STATIC_SCORE_CUTOFF,
+) -> tuple[Any, ...] | None:
+    # Sem assinatura (indice montado fora de _load_semantic_index) nao ha como invalidar; nao cacheia.
+    if not signature:
+        return None
+    return (
+        index_id,
+        signature,
+        str(query or "").strip(),
+        int(limit or 0),
+        None if min_score is None else float(min_score),
+        bool(exclude_lexical_duplicates),
+        bool(use_rag_context),
+        tuple(vector_store_ids or ()) if use_rag_context else (),
+        bool(ignore_base_calibration),
+        query_scoring,
+        bool(collapse_chunks),
+        score_cutoff,
+    )
+
+
+def _get_cached_semantic_result(key: tuple[Any, ...] | None) -> tuple[Any, ...] | None:
+    if key is None:
+        return None
+    now = time.monotonic()
+    with _SEMANTIC_RESULT_CACHE_LOCK:
+        cached = _SEMANTIC_RESULT_CACHE.get(key)
+        if cached is None:
+            return None
+        stored_at, result = cached
+        if now - stored_at > SEMANTIC_RESULT_CACHE_TTL_SECONDS:
+            _SEMANTIC_RESULT_CACHE.pop(key, None)
+            return None
+        _SEMANTIC_RESULT_CACHE.move_to_end(key)
+    # Copia para que o chamador possa mutar matches sem corromper o cache.
+    return copy.deepcopy(result)
+
+
+def _store_semantic_result(key: tuple[Any, ...] | None, result: tuple[Any, ...]) -> None:
+    if key is None:
+        return
+    stored = copy.deepcopy(result)
+    with _SEMANTIC_RESULT_CACHE_LOCK:
+        # Entradas da mesma base com assinatura antiga nunca mais serao lidas; descarta ja.
+        stale_keys = [cached_key for cached_key in _SEMANTIC_RESULT_CACHE if cached_key[0] == key[0] and cached_key[1] != key[1]]
+        for stale_key in stale_keys:
+            _SEMANTIC_RESULT_CACHE.pop(stale_key, None)
+        _SEMANTIC_RESULT_CACHE[key] = (time.monotonic(), stored)
+        _SEMANTIC_RESULT_CACHE.move_to_end(key)
+        while len(_SEMANTIC_RESULT_CACHE) > SEMANTIC_RESULT_CACHE_MAX_ENTRIES:
+            _SEMANTIC_RESULT_CACHE.popitem(last=False)
+
+
+def clear_semantic_result_cache() -> None:
+    with _SEMANTIC_RESULT_CACHE_LOCK:
+        _SEMANTIC_RESULT_CACHE.clear()
+
+
+def _add_stage_timing(timings: dict[str, Any] | None, stage: str, started: float) -> None:
+    if timings is None:
+        return
+    stages = timings.setdefault("stagesMs", {})
+    # Acumula: no overview a mesma etapa roda uma vez por base.
+    stages[stage] = round(float(stages.get(stage) or 0.0) + (time.perf_counter() - started) * 1000.0, 3)
+
+
+def _mark_cache_hit(timings: dict[str, Any] | None, cache_name: str, hit: bool) -> None:
+    # A primeira observacao vale: no caminho async o indice e a query ja foram resolvidos antes.
+    if timings is not None:
+        timings.setdefault("cache", {}).setdefault(cache_name, bool(hit))
+
+
+def _merge_stage_timings(
+    timings: dict[str, Any] | None,
+    source: dict[str, Any] | None,
+    *,
+    include_cache: bool = True,
+) -> None:
+    if timings is None or not source:
+        return
+    stages = timings.setdefault("stagesMs", {})
+    for stage, elapsed_ms in (source.get("stagesMs") or {}).items():
+        if stage != "total":
+            stages[stage] = round(float(stages.get(stage) or 0.0) + float(elapsed_ms), 3)
+    if include_cache:
+        for cache_name, hit in (source.get("cache") or {}).items():
+            _mark_cache_hit(timings, cache_name, hit)
+
+
+def _load_semantic_index_timed(
+    index_id: str,
+    timings: dict[str, Any] | None,
+    semantic_dir: Path | None = None,
+) -> dict[str, Any]:
+    with _SEMANTIC_INDEX_CACHE_LOCK:
+        cached_payload = (_SEMANTIC_INDEX_CACHE.get(index_id) or {}).get("payload")
+    started = time.perf_counter()
+    loaded = _load_semantic_index(index_id, semantic_dir=semantic_dir)
+    _add_stage_timing(timings, "indexLoad", started)
+    _mark_cache_hit(timings, "index", cached_payload is not None and loaded is cached_payload)
+    return loaded
+
+
+def list_semantic_indexes(semantic_dir: Path | None = None) -> list[dict[str, Any]]:
+    root = semantic_dir or SEMANTIC_DIR
+    if not root.exists():
         return []
 
     indexes: list[dict[str, Any]] = []
-    for item in sorted(SEMANTIC_DIR.iterdir(), key=lambda path: path.name.lower()):
+    for item in sorted(root.iterdir(), key=lambda path: path.name.lower()):
         if not item.is_dir():
             continue
         manifest_path = item / "manifest.json"
@@ -284,6 +571,7 @@ def list_semantic_indexes() -> list[dict[str, Any]]:
             "sourceFile": str(manifest.get("source_file") or "").strip(),
             "sourceRows": int(manifest.get("source_rows") or 0),
             "model": str(manifest.get("model") or "").strip(),
+            "embeddingProvider": manifest_embedding_provider(manifest),
             "dimensions": int(manifest.get("dimensions") or 0),
             "embeddingDtype": str(manifest.get("embedding_dtype") or "").strip(),
             "suggestedMinScore": _resolve_recommended_min_score(manifest, item.name),
@@ -291,6 +579,53 @@ def list_semantic_indexes() -> list[dict[str, Any]]:
     return indexes
 
 
+def semantic_search_requires_openai_key(index_ids: Sequence[str] | None = None, *, use_rag_context: bool = False) -> bool:
+    # O contexto RAG sempre chama a API OpenAI; embeddings da query so quando algum indice envolvido usa o provedor openai.
+    if use_rag_context:
+        return True
+    if index_ids is None:
+        return any(index_meta["embeddingProvider"] == OPENAI_EMBEDDING_PROVIDER for index_meta in list_semantic_indexes())
+    for index_id in index_ids:
+        manifest_path = SEMANTIC_DIR / _normalize_index_id(index_id) / "manifest.json"
+        if manifest_path.exists() and manifest_embedding_provider(_load_json(manifest_path)) == OPENAI_EMBEDDING_PROVIDER:
+            return True
+    return False
+
+
+def _empty_rag_context(source_query: str, vector_store_ids: list[str] | None) -> dict[str, Any]:
+    return {
+        "usedRagContext": False,
+        "sourceQuery": source_query,
+        "vectorStoreIds": [value for value in (vector_store_ids or []) if str(value or "").strip()],
+        "keyTerms": [],
+        "definitions": [],
+        "relatedTerms": [],
+        "disambiguatedQuery": "",
+        "references": [],
+    }
+
+
+def _resolve_rag_context(
+    query: str,
+    *,
+    api_key: str,
+    use_rag_context: bool,
+    vector_store_ids: list[str] | None,
+) -> dict[str, Any]:
+    rag_context = _empty_rag_context(query, vector_store_ids)
+    if not use_rag_context:
+        return rag_context
+    try:
+        return resolve_semantic_query_context(
+            query,
+            api_key=api_key,
+            vector_store_ids=vector_store_ids,
+        )
+    except Exception as exc:
+        rag_context["error"] = str(exc)
+        return rag_context
+
+
 def _build_contextual_query_variants(raw_query: str, semantic_context: dict[str, Any] | None) -> list[tuple[str, float]]:
     variants = build_semantic_query_variants(raw_query)
     if not semantic_context:
@@ -315,7 +650,7 @@ def _build_contextual_query_variants(raw_query: str, semantic_context: dict[str,
     deduped: list[tuple[str, float]] = []
     seen: set[str] = set()
     for text, weight in contextual_variants:
-        normalized_text = _normalize_match_text(text)
+        normalized_text = normalize_match_text(text)
         if not normalized_text or normalized_text in seen:
             continue
         seen.add(normalized_text)
@@ -323,48 +658,32 @@ def _build_contextual_query_variants(raw_query: str, semantic_context: dict[str,
     return deduped[:6]
 
 
-def _get_semantic_query_vector(
-    raw_query: str,
-    *,
-    api_key: str,
-    model: str,
-    cache: dict[str, np.ndarray] | None = None,
-    semantic_context: dict[str, Any] | None = None,
-) -> np.ndarray:
-    model_name = (model or "").strip() or "text-embedding-3-small"
-    query_variants = _build_contextual_query_variants(raw_query, semantic_context)
-    cache_key = model_name if not query_variants else f"{model_name}::{'||'.join(text for text, _ in query_variants)}"
-    if cache is not None and cache_key in cache:
-        return cache[cache_key]
+def _resolve_embedding_model(model: str, provider: str | None = None) -> str:
+    return (model or "").strip() or default_embedding_model(provider)
 
-    inputs = [text for text, _ in query_variants] or [raw_query]
 
-    response = _EMBEDDINGS_SESSION.post(
-        EMBEDDINGS_API_URL,
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-        json={
-            "model": model_name,
-            "input": inputs,
-        },
-        timeout=60,
-    )
-    if not response.ok:
-        raise RuntimeError(f"Falha ao gerar embedding da query: HTTP {response.status_code} {response.text}")
+def _query_vector_cache_key(
+    model_name: str,
+    query_variants: list[tuple[str, float]],
+    provider: str | None = None,
+) -> str:
+    provider_name = normalize_embedding_provider(provider)
+    model_key = model_name if provider_name == DEFAULT_EMBEDDING_PROVIDER else f"{provider_name}:{model_name}"
+    return model_key if not query_variants else f"{model_key}::{'||'.join(text for text, _ in query_variants)}"
 
-    payload = response.json()
-    data = payload.get("data") or []
-    if not data:
-        raise RuntimeError("Resposta de embeddings vazia.")
 
-    vectors = np.asarray([item.get("embedding") or [] for item in data], dtype=np.float32)
-    if vectors.ndim == 1:
-        vectors = vectors.reshape(1, -1)
-    if vectors.shape[0] != len(inputs):
-        raise RuntimeError("Quantidade de embeddings retornada difere da quantidade de queries enviadas.")
+def _embedding_spec(provider: str | None, model: str) -> tuple[str, str]:
+    provider_name = normalize_embedding_provider(provider)
+    return provider_name, _resolve_embedding_model(model, provider_name)
 
+
+def _embedding_provider_params(provider: str | None) -> dict[str, str]:
+    # Indices OpenAI mantem a chamada original; so os demais provedores recebem o parametro extra.
+    provider_name = normalize_embedding_provider(provider)
+    return {} if provider_name == DEFAULT_EMBEDDING_PROVIDER else {"provider": provider_name}
+
+
+def _combine_query_vectors(vectors: np.ndarray, query_variants: list[tuple[str, float]]) -> np.ndarray:
     norms = np.linalg.norm(vectors, axis=1, keepdims=True)
     norms = np.where(norms > 0, norms, 1.0)
     normalized_vectors = vectors / norms
@@ -374,113 +693,690 @@ def _get_semantic_query_vector(
     final_norm = np.linalg.norm(vector)
     if final_norm > 0:
         vector = vector / final_norm
+    return vector
+
+
+def _normalize_query_scoring(value: Any) -> str:
+    mode = str(value or AVERAGE_QUERY_SCORING).strip().lower()
+    if mode not in QUERY_SCORING_MODES:
+        raise ValueError(f"Modo de scoring da query invalido: {value}.")
+    return mode
+
+
+def _normalize_score_cutoff(value: Any) -> str:
+    mode = str(value or STATIC_SCORE_CUTOFF).strip().lower()
+    if mode not in SCORE_CUTOFF_MODES:
+        raise ValueError(f"Modo de corte de score invalido: {value}.")
+    return mode
+
+
+def _score_summary(scores: np.ndarray) -> tuple[int, float, float, np.ndarray]:
+    # Resumo combinavel da distribuicao: contagem, media, soma dos desvios ao quadrado e top-N.
+    finite = scores if bool(np.isfinite(scores).all()) else scores[np.isfinite(scores)]
+    if not finite.size:
+        return 0, 0.0, 0.0, np.zeros((0,), dtype=np.float64)
+    mean = float(np.mean(finite, dtype=np.float64))
+    top_n = min(int(finite.size), ADAPTIVE_CUTOFF_TOP_N)
+    # np.partition isola o top-N em O(N); so esse bloco pequeno segue adiante.
+    top = np.partition(finite, finite.size - top_n)[finite.size - top_n:].astype(np.float64)
+    return int(finite.size), mean, float(np.var(finite, dtype=np.float64)) * finite.size, top
+
+
+def _merge_score_summaries(summaries: Sequence[tuple[int, float, float, np.ndarray]]) -> tuple[int, float, float, np.ndarray]:
+    count, mean, squared = 0, 0.0, 0.0
+    for part_count, part_mean, part_squared, _ in summaries:
+        if not part_count:
+            continue
+        # Combinacao de Chan para media e variancia de shards.
+        total = count + part_count
+        delta = part_mean - mean
+        mean += delta * part_count / total
+        squared += part_squared + delta * delta * count * part_count / total
+        count = total
+    tops = [summary[3] for summary in summaries if summary[3].size]
+    top = np.concatenate(tops) if tops else np.zeros((0,), dtype=np.float64)
+    if top.size > ADAPTIVE_CUTOFF_TOP_N:
+        top = np.partition(top, top.size - ADAPTIVE_CUTOFF_TOP_N)[top.size - ADAPTIVE_CUTOFF_TOP_N:]
+    return count, mean, squared, top
+
+
+def _adaptive_cutoff(summary: tuple[int, float, float, np.ndarray], mode: str) -> float:
+    count, mean, squared, top = summary
+    if count < 3:
+        return 0.0
+    if mode == ZSCORE_SCORE_CUTOFF:
+        return float(mean + ADAPTIVE_CUTOFF_ZSCORE * np.sqrt(squared / count))
+
+    top_n = int(top.size)
+    top = np.sort(top)[::-1]
+    span = top[0] - top[-1]
+    if span <= 0:
+        return 0.0
+    normalized = (top - top[-1]) / span
+    chord = 1.0 - np.linspace(0.0, 1.0, top_n)
+    knee = int(np.argmax(chord - normalized))
+    if knee == 0 or chord[knee] <= normalized[knee]:
+        return 0.0
+    # O joelho cai no inicio do platô; o corte recua para a maior queda entre o topo e o joelho.
+    drops = top[:knee] - top[1:knee + 1]
+    return float(top[int(np.argmax(drops))])
+
+
+def _adaptive_min_score(scores: np.ndarray, mode: str) -> float:
+    """Corte derivado da distribuicao de scores da propria query, em O(N).
+
+    "zscore" corta abaixo de media + ADAPTIVE_CUTOFF_ZSCORE desvios; "knee" localiza o joelho da curva
+    dos ADAPTIVE_CUTOFF_TOP_N melhores scores (ponto mais distante da corda) e corta na maior queda antes dele.
+    """
+    return _adaptive_cutoff(_score_summary(scores), mode)
+
+
+def _query_matrix_cache_key(
+    model_name: str,
+    query_variants: list[tuple[str, float]],
+    provider: str | None = None,
+) -> str:
+    return f"{_query_vector_cache_key(model_name, query_variants, provider)}::multi"
+
+
+def _variant_query_matrix(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms = np.where(norms > 0, norms, 1.0)
+    # Colunas sao as variantes normalizadas: (d x V), pronto para embeddings @ matriz.
+    return np.ascontiguousarray((vectors / norms).T, dtype=np.float32)
+
+
+def _variant_weights(query_variants: list[tuple[str, float]], count: int) -> np.ndarray:
+    if not query_variants:
+        return np.ones((count,), dtype=np.float32)
+    return np.asarray([weight for _, weight in query_variants], dtype=np.float32)
+
+
+def _aggregate_variant_scores(variant_scores: np.ndarray, weights: np.ndarray, mode: str) -> np.ndarray:
+    if variant_scores.ndim == 1:
+        variant_scores = variant_scores.reshape(-1, 1)
+    if mode == WEIGHTED_MAX_QUERY_SCORING:
+        max_weight = float(weights.max()) if weights.size else 0.0
+        if max_weight > 0:
+            variant_scores = variant_scores * (weights / max_weight)
+    return variant_scores.max(axis=1)
+
+
+def _variant_threshold_offset(
+    variant_scores: np.ndarray,
+    query_matrix: np.ndarray,
+    weights: np.ndarray,
+    aggregated_scores: np.ndarray,
+) -> float:
+    # recommended_min_score foi calibrado na escala do vetor medio; o maximo entre variantes infla a cauda.
+    # O deslocamento e a diferenca de p99 entre os scores agregados e os do vetor medio da mesma query.
+    if variant_scores.ndim != 2 or variant_scores.shape[0] == 0 or variant_scores.shape[1] <= 1:
+        return 0.0
+    step = max(1, variant_scores.shape[0] // QUERY_SCORING_OFFSET_SAMPLE_ROWS)
+    sampled_variants = np.asarray(variant_scores[::step], dtype=np.float32)
+    weight_vector = np.asarray(weights, dtype=np.float32)
+    if weight_vector.size != sampled_variants.shape[1] or float(weight_vector.sum()) <= 0:
+        weight_vector = np.ones((sampled_variants.shape[1],), dtype=np.float32)
+    weight_vector = weight_vector / weight_vector.sum()
+    # Score do vetor medio sem outro produto: (E @ Q) @ w dividido pela norma de Q @ w.
+    combined_norm = float(np.linalg.norm(np.asarray(query_matrix, dtype=np.float32) @ weight_vector))
+    if combined_norm <= 0:
+        return 0.0
+    average_scores = (sampled_variants @ weight_vector) / np.float32(combined_norm)
+    sampled_aggregated = np.asarray(aggregated_scores[::step], dtype=np.float32)
+    return float(
+        np.percentile(sampled_aggregated, QUERY_SCORING_OFFSET_PERCENTILE)
+        - np.percentile(average_scores, QUERY_SCORING_OFFSET_PERCENTILE)
+    )
+
+
+def _multi_vector_scores(
+    embeddings: np.ndarray,
+    query_matrix: np.ndarray,
+    weights: np.ndarray,
+    mode: str,
+) -> tuple[np.ndarray, float]:
+    # Um unico produto (N x d) @ (d x V); cada linha fica com o melhor score entre as variantes.
+    variant_scores = np.asarray(embeddings @ query_matrix, dtype=np.float32)
+    aggregated_scores = _aggregate_variant_scores(variant_scores, weights, mode)
+    return aggregated_scores, _variant_threshold_offset(variant_scores, query_matrix, weights, aggregated_scores)
+
+
+def _variant_scoring(
+    embeddings: Any,
+    query_matrix: np.ndarray,
+    weights: np.ndarray,
+    mode: str,
+) -> tuple[np.ndarray | None, float, Callable[[np.ndarray], np.ndarray] | None]:
+    """Scores agregados e deslocamento do limiar; com shards, devolve o reduce aplicado shard a shard."""
+    if not isinstance(embeddings, ShardedEmbeddings):
+        scores, threshold_offset = _multi_vector_scores(embeddings, query_matrix, weights, mode)
+        return scores, threshold_offset, None
+
+    def _reduce(variant_scores: np.ndarray) -> np.ndarray:
+        return _aggregate_variant_scores(np.asarray(variant_scores, dtype=np.float32), weights, mode)
+
+    threshold_offset = 0.0
+    if query_matrix.shape[1] > 1:
+        # O deslocamento so precisa das linhas amostradas; cada shard pontua apenas as suas.
+        step = max(1, embeddings.shape[0] // QUERY_SCORING_OFFSET_SAMPLE_ROWS)
+        sampled = np.concatenate(embeddings.map_scores(
+            query_matrix,
+            lambda _, variant_scores: np.asarray(variant_scores, dtype=np.float32).reshape(-1, query_matrix.shape[1]),
+            row_step=step,
+        ))
+        threshold_offset = _variant_threshold_offset(sampled, query_matrix, weights, _reduce(sampled))
+    return None, threshold_offset, _reduce
+
+
+def _calibrated_min_score(recommended_min_score: float, threshold_offset: float) -> float:
+    return max(0.0, min(1.0, float(recommended_min_score) + float(threshold_offset)))
+
+
+def _get_semantic_query_matrix(
+    raw_query: str,
+    *,
+    api_key: str,
+    model: str,
+    cache: dict[str, np.ndarray] | None = None,
+    semantic_context: dict[str, Any] | None = None,
+    provider: str | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    provider_name = normalize_embedding_provider(provider)
+    model_name = _resolve_embedding_model(model, provider_name)
+    query_variants = _build_contextual_query_variants(raw_query, semantic_context)
+    cache_key = _query_matrix_cache_key(model_name, query_variants, provider_name)
+    if cache is not None and cache_key in cache:
+        query_matrix = cache[cache_key]
+    else:
+        inputs = [text for text, _ in query_variants] or [raw_query]
+        embedder = get_embedding_provider(provider_name, model=model_name, api_key=api_key)
+        query_matrix = _variant_query_matrix(embedder.embed(inputs))
+        if cache is not None:
+            cache[cache_key] = query_matrix
+    return query_matrix, _variant_weights(query_variants, query_matrix.shape[1])
+
+
+def _resolve_query_scores(
+    raw_query: str,
+    embeddings: np.ndarray,
+    query_vector_params: dict[str, Any],
+    query_scoring: str,
+    timings: dict[str, Any] | None = None,
+) -> tuple[np.ndarray, np.ndarray | None, float, Callable[[np.ndarray], np.ndarray] | None]:
+    # Com shards nos modos max, devolve a matriz de variantes e o reduce no lugar dos scores.
+    query_cache = query_vector_params.get("cache")
+    cached_entries = len(query_cache) if query_cache is not None else None
+    started = time.perf_counter()
+    if query_scoring == AVERAGE_QUERY_SCORING:
+        query_vector = _get_semantic_query_vector(raw_query, **query_vector_params)
+        query_matrix = None
+    else:
+        query_matrix, weights = _get_semantic_query_matrix(raw_query, **query_vector_params)
+        query_vector = query_matrix[:, 0]
+    _add_stage_timing(timings, "queryEmbedding", started)
+    _mark_cache_hit(timings, "queryVector", cached_entries is not None and len(query_cache) == cached_entries)
+    if query_matrix is None:
+        return query_vector, None, 0.0, None
+    started = time.perf_counter()
+    query_scores, threshold_offset, score_reduce = _variant_scoring(embeddings, query_matrix, weights, query_scoring)
+    _add_stage_timing(timings, "matmul", started)
+    return (query_vector if score_reduce is None else query_matrix), query_scores, threshold_offset, score_reduce
+
+
+def _get_semantic_query_vector(
+    raw_query: str,
+    *,
+    api_key: str,
+    model: str,
+    cache: dict[str, np.ndarray] | None = None,
+    semantic_context: dict[str, Any] | None = None,
+    provider: str | None = None,
+) -> np.ndarray:
+    provider_name = normalize_embedding_provider(provider)
+    model_name = _resolve_embedding_model(model, provider_name)
+    query_variants = _build_contextual_query_variants(raw_query, semantic_context)
+    cache_key = _query_vector_cache_key(model_name, query_variants, provider_name)
+    if cache is not None and cache_key in cache:
+        return cache[cache_key]
+
+    inputs = [text for text, _ in query_variants] or [raw_query]
+    embedder = get_embedding_provider(provider_name, model=model_name, api_key=api_key)
+    vector = _combine_query_vectors(embedder.embed(inputs), query_variants)
 
     if cache is not None:
         cache[cache_key] = vector
     return vector
 
 
-def _score_matches(
-    metadata: list[dict[str, Any]],
+async def _aembed_query_texts(texts: list[str], *, api_key: str, model: str, provider: str | None = None) -> np.ndarray:
+    embedder = get_embedding_provider(normalize_embedding_provider(provider), model=model, api_key=api_key)
+    return await embedder.aembed(texts)
+
+
+async def _resolve_query_context_and_vectors_async(
+    raw_query: str,
+    *,
+    api_key: str,
+    models: list[str],
+    use_rag_context: bool,
+    vector_store_ids: list[str] | None,
+    providers: list[str] | None = None,
+    timings: dict[str, Any] | None = None,
+) -> tuple[dict[str, Any], dict[str, np.ndarray], dict[tuple[str, str], Exception]]:
+    provider_names = [normalize_embedding_provider(provider) for provider in (providers or [None] * len(models))]
+    embedding_specs = list(dict.fromkeys(
+        _embedding_spec(provider_name, model)
+        for provider_name, model in zip(provider_names, models)
+    ))
+    base_variants = _build_contextual_query_variants(raw_query, None)
+    base_texts = [text for text, _ in base_variants] or [raw_query]
+
+    async def _timed(stage: str, awaitable: Any) -> Any:
+        # RAG e embedding sao cronometrados cada um no seu await; como correm juntos, a soma passa do tempo de parede.
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            _add_stage_timing(timings, stage, started)
+
+    # A chamada RAG (LLM) roda em paralelo com o embedding das variantes base da query.
+    rag_task = asyncio.create_task(_timed("ragContext", asyncio.to_thread(
+        _resolve_rag_context,
+        raw_query,
+        api_key=api_key,
+        use_rag_context=use_rag_context,
+        vector_store_ids=vector_store_ids,
+    )))
+    base_tasks = [
+        asyncio.create_task(_aembed_query_texts(
+            base_texts,
+            api_key=api_key,
+            model=model_name,
+            **_embedding_provider_params(provider_name),
+        ))
+        for provider_name, model_name in embedding_specs
+    ]
+    try:
+        # Um provedor que falha nao derruba os demais; as bases dele viram erro por base no scoring.
+        base_vectors = await _timed("queryEmbedding", asyncio.gather(*base_tasks, return_exceptions=True))
+        rag_context = await rag_task
+    except BaseException:
+        for task in (rag_task, *base_tasks):
+            task.cancel()
+        raise
+
+    embedding_errors: dict[tuple[str, str], Exception] = {}
+    embedded_by_spec: dict[tuple[str, str], dict[str, np.ndarray]] = {}
+    for spec, vectors in zip(embedding_specs, base_vectors):
+        if isinstance(vectors, BaseException):
+            if not isinstance(vectors, Exception):
+                raise vectors
+            embedding_errors[spec] = vectors
+        else:
+            embedded_by_spec[spec] = dict(zip(base_texts, vectors))
+
+    query_variants = _build_contextual_query_variants(raw_query, rag_context if rag_context.get("usedRagContext") else None)
+    variant_texts = [text for text, _ in query_variants] or [raw_query]
+    missing_texts = [text for text in variant_texts if text not in base_texts]
+    if missing_texts and embedded_by_spec:
+        pending_specs = list(embedded_by_spec)
+        extra_vectors = await _timed("queryEmbedding", asyncio.gather(*[
+            _aembed_query_texts(
+                missing_texts,
+                api_key=api_key,
+                model=model_name,
+                **_embedding_provider_params(provider_name),
+            )
+            for provider_name, model_name in pending_specs
+        ], return_exceptions=True))
+        for spec, vectors in zip(pending_specs, extra_vectors):
+            if isinstance(vectors, BaseException):
+                if not isinstance(vectors, Exception):
+                    raise vectors
+                embedding_errors[spec] = vectors
+                del embedded_by_spec[spec]
+            else:
+                embedded_by_spec[spec].update(zip(missing_texts, vectors))
+
+    query_cache: dict[str, np.ndarray] = {}
+    for (provider_name, model_name), embedded in embedded_by_spec.items():
+        vectors = np.vstack([embedded[text] for text in variant_texts])
+        query_cache[_query_vector_cache_key(model_name, query_variants, provider_name)] = _combine_query_vectors(vectors, query_variants)
+        query_cache[_query_matrix_cache_key(model_name, query_variants, provider_name)] = _variant_query_matrix(vectors)
+    return rag_context, query_cache, embedding_errors
+
+
+def _rerank_candidate_count(limit: int, total_found: int) -> int:
+    top_count = min(max(1, int(limit or 1)), total_found)
+    return min(
+        total_found,
+        max(
+            top_count,
+            min(RERANK_CANDIDATE_CAP, max(top_count, top_count * RERANK_CANDIDATE_MULTIPLIER)),
+        ),
+    )
+
+
+def _rank_eligible_candidates(
+    metadata: Sequence[dict[str, Any]],
+    search_texts: Sequence[str],
+    eligible_positions: np.ndarray,
+    eligible_scores: np.ndarray,
+    row_count: int,
+    limit: int,
+    min_score: float,
+    exclude_lexical_duplicates: bool,
+    lexical_query: str,
+    search_postings: SearchPostings | None,
+    collapse_chunks: bool,
+    source_groups: np.ndarray | None,
+    timings: dict[str, Any] | None,
+) -> tuple[np.ndarray, np.ndarray, int, int, float, np.ndarray | None]:
+    # Etapa comum aos caminhos denso e sharded: recebe so as linhas acima do minimo, em ordem de posicao.
+    lexical_filtered_count = 0
+    started = time.perf_counter()
+    is_duplicate = (
+        _lexical_duplicate_predicate(lexical_query, search_texts, row_count, search_postings)
+        if exclude_lexical_duplicates and eligible_positions.size
+        else None
+    )
+    if is_duplicate is not None:
+        # Apenas linhas acima do score minimo importam; o predicado booleano roda so sobre elas.
+        lexical_mask = np.asarray(is_duplicate(eligible_positions), dtype=np.bool_)
+        lexical_filtered_count = int(np.count_nonzero(lexical_mask))
+        eligible_positions = eligible_positions[~lexical_mask]
+        eligible_scores = eligible_scores[~lexical_mask]
+    _add_stage_timing(timings, "lexicalFilter", started)
+
+    group_sizes: np.ndarray | None = None
+    if collapse_chunks and eligible_positions.size:
+        if source_groups is None:
+            source_groups = _source_group_ids(metadata)
+        representatives, group_sizes = _collapse_by_source(eligible_positions, eligible_scores, source_groups)
+        eligible_scores = eligible_scores[np.searchsorted(eligible_positions, representatives)]
+        eligible_positions = representatives
+    total_found = int(eligible_positions.size)
+    if total_found <= 0:
+        empty_hits = None if group_sizes is None else np.zeros((0,), dtype=np.int32)
+        return eligible_positions, np.zeros((0,), dtype=np.float32), 0, lexical_filtered_count, min_score, empty_hits
+
+    candidate_count = _rerank_candidate_count(limit, total_found)
+    if candidate_count >= total_found:
+        ranked_local = np.argsort(eligible_scores)[::-1]
+    else:
+        top_local_positions = np.argpartition(eligible_scores, -candidate_count)[-candidate_count:]
+        ranked_local = top_local_positions[np.argsort(eligible_scores[top_local_positions])[::-1]]
+    ranked_positions = eligible_positions[ranked_local]
+    semantic_scores = eligible_scores[ranked_local].astype(np.float32, copy=False)
+    # sibling_hits fica alinhado aos candidatos, nao as N linhas do indice.
+    sibling_hits = None if group_sizes is None else (group_sizes[ranked_local] - 1).astype(np.int32)
+    return ranked_positions, semantic_scores, total_found, lexical_filtered_count, min_score, sibling_hits
+
+
+def _rank_dense_candidates(
+    metadata: Sequence[dict[str, Any]],
     embeddings: np.ndarray,
-    search_texts: tuple[str, ...],
+    search_texts: Sequence[str],
     query_vector: np.ndarray,
-    index_id: str,
-    index_label: str,
     limit: int,
     min_score: float,
     exclude_lexical_duplicates: bool,
     lexical_query: str,
-) -> dict[str, Any]:
-    if embeddings.ndim != 2:
-        raise ValueError(f"Embeddings invalidos no indice {index_id}")
-
-    scores = embeddings @ query_vector
+    search_postings: SearchPostings | None,
+    scores: np.ndarray | None,
+    collapse_chunks: bool,
+    score_cutoff: str,
+    source_groups: np.ndarray | None,
+    timings: dict[str, Any] | None,
+) -> tuple[np.ndarray, np.ndarray, int, int, float, np.ndarray | None]:
+    # Buscas em lote passam a coluna ja calculada do produto embeddings @ Q.
+    if scores is None:
+        started = time.perf_counter()
+        scores = embeddings @ query_vector
+        _add_stage_timing(timings, "matmul", started)
     if scores.ndim != 1:
         scores = np.asarray(scores).reshape(-1)
 
+    if score_cutoff != STATIC_SCORE_CUTOFF:
+        # O corte adaptativo so endurece o minimo calibrado da base, nunca o afrouxa.
+        started = time.perf_counter()
+        min_score = max(float(min_score), _adaptive_min_score(scores, score_cutoff))
+        _add_stage_timing(timings, "scoreCutoff", started)
+
     eligible_mask = np.isfinite(scores)
     if min_score > 0:
         eligible_mask &= scores >= np.float32(min_score)
+    eligible_positions = np.flatnonzero(eligible_mask)
+    return _rank_eligible_candidates(
+        metadata,
+        search_texts,
+        eligible_positions,
+        scores[eligible_positions],
+        int(scores.shape[0]),
+        limit,
+        min_score,
+        exclude_lexical_duplicates,
+        lexical_query,
+        search_postings,
+        collapse_chunks,
+        source_groups,
+        timings,
+    )
 
-    lexical_filtered_count = 0
-    lexical_filter = _build_lexical_duplicate_filter(lexical_query) if exclude_lexical_duplicates else None
-    if lexical_filter is not None:
-        lexical_mask = np.fromiter(
-            (lexical_filter(search_text) for search_text in search_texts),
-            dtype=np.bool_,
-            count=len(search_texts),
+
+def _rank_sharded_candidates(
+    metadata: Sequence[dict[str, Any]],
+    embeddings: ShardedEmbeddings,
+    search_texts: Sequence[str],
+    query: np.ndarray,
+    limit: int,
+    min_score: float,
+    exclude_lexical_duplicates: bool,
+    lexical_query: str,
+    search_postings: SearchPostings | None,
+    collapse_chunks: bool,
+    score_cutoff: str,
+    source_groups: np.ndarray | None,
+    score_reduce: Callable[[np.ndarray], np.ndarray] | None,
+    timings: dict[str, Any] | None,
+) -> tuple[np.ndarray, np.ndarray, int, int, float, np.ndarray | None]:
+    # Cada shard pontua e filtra localmente; o vetor de N scores (ou a matriz N x V) nunca e montado.
+    if score_cutoff == STATIC_SCORE_CUTOFF and not collapse_chunks:
+        started = time.perf_counter()
+        is_duplicate = (
+            _lexical_duplicate_predicate(lexical_query, search_texts, embeddings.shape[0], search_postings)
+            if exclude_lexical_duplicates
+            else None
         )
-        lexical_filtered_count = int(np.count_nonzero(eligible_mask & lexical_mask))
-        eligible_mask &= ~lexical_mask
+        ranked_positions, semantic_scores, eligible_count, lexical_filtered_count = embeddings.top_k(
+            query,
+            _rerank_candidate_count(limit, embeddings.shape[0]),
+            min_score=min_score,
+            exclude=is_duplicate,
+            reduce=score_reduce,
+        )
+        _add_stage_timing(timings, "matmul", started)
+        semantic_scores = semantic_scores.astype(np.float32, copy=False)
+        return ranked_positions, semantic_scores, eligible_count, lexical_filtered_count, min_score, None
+
+    # Corte adaptativo e colapso por fonte: cada shard devolve o resumo da distribuicao e as linhas acima
+    # do minimo estatico; o corte final e o colapso rodam sobre essas linhas.
+    adaptive = score_cutoff != STATIC_SCORE_CUTOFF
+    static_min_score = float(min_score)
+
+    def _shard_eligible(offset: int, shard_scores: np.ndarray) -> tuple[Any, np.ndarray, np.ndarray]:
+        scores = np.asarray(score_reduce(shard_scores) if score_reduce is not None else shard_scores).reshape(-1)
+        eligible = np.isfinite(scores)
+        if static_min_score > 0:
+            eligible &= scores >= np.float32(static_min_score)
+        positions = np.flatnonzero(eligible)
+        return (_score_summary(scores) if adaptive else None), positions + offset, scores[positions]
+
+    started = time.perf_counter()
+    partials = embeddings.map_scores(query, _shard_eligible)
+    eligible_positions = np.concatenate([item[1] for item in partials]).astype(np.int64, copy=False)
+    eligible_scores = np.concatenate([item[2] for item in partials])
+    _add_stage_timing(timings, "matmul", started)
+    if adaptive:
+        started = time.perf_counter()
+        min_score = max(static_min_score, _adaptive_cutoff(_merge_score_summaries([item[0] for item in partials]), score_cutoff))
+        if min_score > static_min_score:
+            keep = eligible_scores >= np.float32(min_score)
+            eligible_positions = eligible_positions[keep]
+            eligible_scores = eligible_scores[keep]
+        _add_stage_timing(timings, "scoreCutoff", started)
+    return _rank_eligible_candidates(
+        metadata,
+        search_texts,
+        eligible_positions,
+        eligible_scores,
+        embeddings.shape[0],
+        limit,
+        min_score,
+        exclude_lexical_duplicates,
+        lexical_query,
+        search_postings,
+        collapse_chunks,
+        source_groups,
+        timings,
+    )
 
-    eligible_positions = np.flatnonzero(eligible_mask)
-    total_found = int(eligible_positions.size)
+
+def _score_matches(
+    metadata: Sequence[dict[str, Any]],
+    embeddings: np.ndarray,
+    search_texts: Sequence[str],
+    query_vector: np.ndarray,
+    index_id: str,
+    index_label: str,
+    limit: int,
+    min_score: float,
+    exclude_lexical_duplicates: bool,
+    lexical_query: str,
+    search_postings: SearchPostings | None = None,
+    metadata_texts: Sequence[str] | None = None,
+    metadata_postings: SearchPostings | None = None,
+    scores: np.ndarray | None = None,
+    collapse_chunks: bool = False,
+    score_cutoff: str = STATIC_SCORE_CUTOFF,
+    source_groups: np.ndarray | None = None,
+    timings: dict[str, Any] | None = None,
+    score_reduce: Callable[[np.ndarray], np.ndarray] | None = None,
+) -> dict[str, Any]:
+    # Com score_reduce, query_vector e a matriz de variantes (d x V) e cada shard agrega os proprios scores.
+    if embeddings.ndim != 2:
+        raise ValueError(f"Embeddings invalidos no indice {index_id}")
+
+    if scores is None and isinstance(embeddings, ShardedEmbeddings):
+        ranked = _rank_sharded_candidates(
+            metadata,
+            embeddings,
+            search_texts,
+            query_vector,
+            limit,
+            min_score,
+            exclude_lexical_duplicates,
+            lexical_query,
+            search_postings,
+            collapse_chunks,
+            score_cutoff,
+            source_groups,
+            score_reduce,
+            timings,
+        )
+    else:
+        ranked = _rank_dense_candidates(
+            metadata,
+            embeddings,
+            search_texts,
+            query_vector,
+            limit,
+            min_score,
+            exclude_lexical_duplicates,
+            lexical_query,
+            search_postings,
+            scores,
+            collapse_chunks,
+            score_cutoff,
+            source_groups,
+            timings,
+        )
+    ranked_positions, semantic_scores, total_found, lexical_filtered_count, min_score, sibling_hits = ranked
     if total_found <= 0:
         return {
             "total_found": 0,
             "lexical_filtered_count": lexical_filtered_count,
+            "applied_min_score": float(min_score),
             "matches": [],
         }
 
+    started = time.perf_counter()
     top_count = min(max(1, int(limit or 1)), total_found)
-    candidate_count = min(
-        total_found,
-        max(
-            top_count,
-            min(RERANK_CANDIDATE_CAP, max(top_count, top_count * RERANK_CANDIDATE_MULTIPLIER)),
-        ),
+    normalized_query, query_terms = _extract_rerank_terms(lexical_query)
+    if metadata_texts is None:
+        metadata_texts = metadata_search_texts(metadata)
+        metadata_postings = None
+    alignment_scores = _alignment_scores(
+        normalized_query,
+        query_terms,
+        ranked_positions,
+        search_texts,
+        metadata_texts,
+        search_postings=search_postings,
+        metadata_postings=metadata_postings,
     )
-    eligible_scores = scores[eligible_positions]
-    if candidate_count >= total_found:
-        ranked_positions = eligible_positions[np.argsort(eligible_scores)[::-1]]
+    final_scores = np.minimum(
+        1.0,
+        (RERANK_SEMANTIC_WEIGHT * semantic_scores) + (RERANK_ALIGNMENT_WEIGHT * alignment_scores),
+    )
+    stored_row_numbers = getattr(metadata, "row_numbers", None)
+    if stored_row_numbers is not None:
+        row_numbers = np.asarray(stored_row_numbers[ranked_positions], dtype=np.int64)
     else:
-        top_local_positions = np.argpartition(eligible_scores, -candidate_count)[-candidate_count:]
-        ranked_positions = eligible_positions[top_local_positions[np.argsort(eligible_scores[top_local_positions])[::-1]]]
+        row_numbers = np.fromiter(
+            (int(metadata[int(position)].get("row") or 0) for position in ranked_positions),
+            dtype=np.int64,
+            count=ranked_positions.size,
+        )
+    # lexsort ordena pela ultima chave primeiro: score final, score semantico e linha crescente.
+    order = np.lexsort((row_numbers, -semantic_scores, -final_scores))[:top_count]
 
-    normalized_query, query_terms = _extract_rerank_terms(lexical_query)
     matches: list[dict[str, Any]] = []
-    for position in ranked_positions:
-        row = metadata[int(position)]
-        semantic_score = float(scores[int(position)])
+    for local_position in order:
+        position = int(ranked_positions[local_position])
+        row = metadata[position]
         match_metadata = row.get("metadata") if isinstance(row, dict) else {}
-        alignment_score = _alignment_score(
-            normalized_query,
-            query_terms,
-            search_texts[int(position)],
-            match_metadata,
-        )
-        final_score = min(
-            1.0,
-            (RERANK_SEMANTIC_WEIGHT * semantic_score) + (RERANK_ALIGNMENT_WEIGHT * alignment_score),
-        )
-        matches.append({
+        match = {
             "book": str(row.get("book") or index_id).strip().upper(),
             "index_id": index_id,
             "index_label": index_label,
             "row": int(row.get("row") or 0),
             "text": str(row.get("text") or row.get("text_plain") or "").strip(),
             "metadata": match_metadata if isinstance(match_metadata, dict) else {},
-            "score": final_score,
-            "semantic_score": semantic_score,
-            "alignment_score": alignment_score,
-        })
+            "score": float(final_scores[local_position]),
+            "semantic_score": float(semantic_scores[local_position]),
+            "alignment_score": float(alignment_scores[local_position]),
+        }
+        if sibling_hits is not None:
+            match["sibling_hits"] = int(sibling_hits[local_position])
+        matches.append(match)
+    _add_stage_timing(timings, "rerank", started)
 
-    matches.sort(
-        key=lambda item: (
-            float(item.get("score") or 0.0),
-            float(item.get("semantic_score") or 0.0),
-            -int(item.get("row") or 0),
-        ),
-        reverse=True,
-    )
     return {
         "total_found": total_found,
         "lexical_filtered_count": lexical_filtered_count,
-        "matches": matches[:top_count],
+        "applied_min_score": float(min_score),
+        "matches": matches,
     }
 
 
+def _raise_if_cancelled(cancel_event: Event | None) -> None:
+    # A thread de scoring nao pode ser interrompida de fora; o evento encerra a busca entre etapas.
+    if cancel_event is not None and cancel_event.is_set():
+        raise CancelledError("Busca semantica cancelada.")
+
+
 def search_semantic_index(
     index_id: str,
     query: str,
@@ -491,41 +1387,72 @@ def search_semantic_index(
     use_rag_context: bool = False,
     vector_store_ids: list[str] | None = None,
     ignore_base_calibration: bool = False,
+    rag_context: dict[str, Any] | None = None,
+    query_cache: dict[str, np.ndarray] | None = None,
+    query_scoring: str = AVERAGE_QUERY_SCORING,
+    collapse_chunks: bool = False,
+    score_cutoff: str = STATIC_SCORE_CUTOFF,
+    timings: dict[str, Any] | None = None,
+    cancel_event: Event | None = None,
 ) -> tuple[int, int, float, float, dict[str, Any], list[dict[str, Any]]]:
+    search_started = time.perf_counter()
     normalized_index_id = _normalize_index_id(index_id)
-    loaded = _load_semantic_index(normalized_index_id)
+    query_scoring = _normalize_query_scoring(query_scoring)
+    score_cutoff = _normalize_score_cutoff(score_cutoff)
+    loaded = _load_semantic_index_timed(normalized_index_id, timings)
+    _raise_if_cancelled(cancel_event)
+    result_cache_key = _semantic_result_cache_key(
+        normalized_index_id,
+        loaded.get("signature"),
+        query,
+        limit,
+        min_score,
+        exclude_lexical_duplicates,
+        use_rag_context,
+        vector_store_ids,
+        ignore_base_calibration,
+        query_scoring,
+        collapse_chunks,
+        score_cutoff,
+    )
+    cached_result = _get_cached_semantic_result(result_cache_key)
+    _mark_cache_hit(timings, "result", cached_result is not None)
+    if cached_result is not None:
+        _add_stage_timing(timings, "total", search_started)
+        return cached_result
     manifest = loaded["manifest"]
     model = str(manifest.get("model") or "").strip()
     index_label = str(manifest.get("index_label") or normalized_index_id).strip()
-    rag_context = {
-        "usedRagContext": False,
-        "sourceQuery": query,
-        "vectorStoreIds": [value for value in (vector_store_ids or []) if str(value or "").strip()],
-        "keyTerms": [],
-        "definitions": [],
-        "relatedTerms": [],
-        "disambiguatedQuery": "",
-        "references": [],
+    if rag_context is None:
+        started = time.perf_counter()
+        rag_context = _resolve_rag_context(
+            query,
+            api_key=api_key,
+            use_rag_context=use_rag_context,
+            vector_store_ids=vector_store_ids,
+        )
+        _add_stage_timing(timings, "ragContext", started)
+    _raise_if_cancelled(cancel_event)
+    query_vector_params = {
+        "api_key": api_key,
+        "model": model,
+        "semantic_context": rag_context if rag_context.get("usedRagContext") else None,
+        **_embedding_provider_params(manifest_embedding_provider(manifest)),
     }
-    if use_rag_context:
-        try:
-            rag_context = resolve_semantic_query_context(
-                query,
-                api_key=api_key,
-                vector_store_ids=vector_store_ids,
-            )
-        except Exception as exc:
-            rag_context["error"] = str(exc)
-    query_vector = _get_semantic_query_vector(
-        query,
-        api_key=api_key,
-        model=model,
-        semantic_context=rag_context if rag_context.get("usedRagContext") else None,
+    if query_cache is not None:
+        query_vector_params["cache"] = query_cache
+    query_vector, query_scores, threshold_offset, score_reduce = _resolve_query_scores(
+        query, loaded["embeddings"], query_vector_params, query_scoring, timings,
     )
+    _raise_if_cancelled(cancel_event)
     requested_min_score = None if min_score is None else max(0.0, float(min_score))
     recommended_min_score = float(loaded.get("recommended_min_score") or DEFAULT_MIN_SCORE)
     should_ignore_base_calibration = ignore_base_calibration or requested_min_score is not None
-    effective_min_score = requested_min_score if should_ignore_base_calibration and requested_min_score is not None else recommended_min_score
+    effective_min_score = (
+        requested_min_score
+        if should_ignore_base_calibration and requested_min_score is not None
+        else _calibrated_min_score(recommended_min_score, threshold_offset)
+    )
     ranked = _score_matches(
         loaded["metadata"],
         loaded["embeddings"],
@@ -537,15 +1464,167 @@ def search_semantic_index(
         min_score=effective_min_score,
         exclude_lexical_duplicates=exclude_lexical_duplicates,
         lexical_query=query,
+        search_postings=loaded.get("search_postings"),
+        metadata_texts=loaded.get("metadata_texts"),
+        metadata_postings=loaded.get("metadata_postings"),
+        scores=query_scores,
+        score_reduce=score_reduce,
+        collapse_chunks=collapse_chunks,
+        score_cutoff=score_cutoff,
+        source_groups=loaded.get("source_groups"),
+        timings=timings,
     )
-    return (
+    _raise_if_cancelled(cancel_event)
+    result = (
         ranked["total_found"],
         ranked["lexical_filtered_count"],
         recommended_min_score,
-        effective_min_score,
+        ranked["applied_min_score"],
         rag_context,
         ranked["matches"],
     )
+    _store_semantic_result(result_cache_key, result)
+    _add_stage_timing(timings, "total", search_started)
+    return result
+
+
+def search_semantic_index_batch(
+    index_id: str,
+    queries: list[str],
+    limit: int,
+    api_key: str,
+    min_score: float | None = None,
+    exclude_lexical_duplicates: bool = True,
+    ignore_base_calibration: bool = False,
+    query_scoring: str = AVERAGE_QUERY_SCORING,
+    collapse_chunks: bool = False,
+    score_cutoff: str = STATIC_SCORE_CUTOFF,
+) -> tuple[float, float, list[dict[str, Any]]]:
+    normalized_index_id = _normalize_index_id(index_id)
+    query_scoring = _normalize_query_scoring(query_scoring)
+    score_cutoff = _normalize_score_cutoff(score_cutoff)
+    loaded = _load_semantic_index(normalized_index_id)
+    manifest = loaded["manifest"]
+    provider_name = manifest_embedding_provider(manifest)
+    model_name = _resolve_embedding_model(str(manifest.get("model") or "").strip(), provider_name)
+    index_label = str(manifest.get("index_label") or normalized_index_id).strip()
+    requested_min_score = None if min_score is None else max(0.0, float(min_score))
+    recommended_min_score = float(loaded.get("recommended_min_score") or DEFAULT_MIN_SCORE)
+    should_ignore_base_calibration = ignore_base_calibration or requested_min_score is not None
+    uses_requested_min_score = should_ignore_base_calibration and requested_min_score is not None
+    effective_min_score = requested_min_score if uses_requested_min_score else recommended_min_score
+
+    results: list[dict[str, Any] | None] = [None] * len(queries)
+    pending: list[tuple[int, str, tuple[Any, ...] | None, list[tuple[str, float]]]] = []
+    for position, raw_query in enumerate(queries):
+        query = str(raw_query or "").strip()
+        result_cache_key = _semantic_result_cache_key(
+            normalized_index_id,
+            loaded.get("signature"),
+            query,
+            limit,
+            min_score,
+            exclude_lexical_duplicates,
+            False,
+            None,
+            ignore_base_calibration,
+            query_scoring,
+            collapse_chunks,
+            score_cutoff,
+        )
+        cached_result = _get_cached_semantic_result(result_cache_key)
+        if cached_result is not None:
+            results[position] = {
+                "query": query,
+                "total_found": cached_result[0],
+                "lexical_filtered_count": cached_result[1],
+                "applied_min_score": cached_result[3],
+                "matches": cached_result[5],
+            }
+            continue
+        pending.append((position, query, result_cache_key, build_semantic_query_variants(query)))
+
+    if pending:
+        # Uma unica chamada de embeddings para todas as variantes de todas as queries pendentes.
+        variant_texts = list(dict.fromkeys(
+            text
+            for _, query, _, query_variants in pending
+            for text in ([text for text, _ in query_variants] or [query])
+        ))
+        embedder = get_embedding_provider(provider_name, model=model_name, api_key=api_key)
+        embedded = dict(zip(variant_texts, embedder.embed(variant_texts)))
+        # Cada query contribui uma coluna (media) ou uma coluna por variante (modos max).
+        query_blocks: list[np.ndarray] = []
+        for _, query, _, query_variants in pending:
+            vectors = np.vstack([embedded[text] for text in ([text for text, _ in query_variants] or [query])])
+            if query_scoring == AVERAGE_QUERY_SCORING:
+                query_blocks.append(_combine_query_vectors(vectors, query_variants).reshape(-1, 1))
+            else:
+                query_blocks.append(_variant_query_matrix(vectors))
+        query_matrix = np.hstack(query_blocks)
+        column_offsets = np.cumsum([0] + [block.shape[1] for block in query_blocks])
+        # Um unico produto matriz-matriz (N x d) @ (d x Q) em vez de Q produtos matriz-vetor.
+        # Com shards, cada query passa pelo top-k por shard: a matriz N x Q nunca e montada.
+        sharded = isinstance(loaded["embeddings"], ShardedEmbeddings)
+        score_matrix = None if sharded else np.asarray(loaded["embeddings"] @ query_matrix, dtype=np.float32)
+        for column, (position, query, result_cache_key, query_variants) in enumerate(pending):
+            start, end = int(column_offsets[column]), int(column_offsets[column + 1])
+            query_operand = query_matrix[:, start]
+            query_scores = None
+            threshold_offset = 0.0
+            score_reduce = None
+            if query_scoring == AVERAGE_QUERY_SCORING:
+                if score_matrix is not None:
+                    query_scores = np.ascontiguousarray(score_matrix[:, start])
+            else:
+                variant_weights = _variant_weights(query_variants, end - start)
+                if score_matrix is None:
+                    query_operand = query_matrix[:, start:end]
+                    query_scores, threshold_offset, score_reduce = _variant_scoring(
+                        loaded["embeddings"], query_operand, variant_weights, query_scoring,
+                    )
+                else:
+                    query_scores = _aggregate_variant_scores(score_matrix[:, start:end], variant_weights, query_scoring)
+                    threshold_offset = _variant_threshold_offset(
+                        score_matrix[:, start:end],
+                        query_matrix[:, start:end],
+                        variant_weights,
+                        query_scores,
+                    )
+            ranked = _score_matches(
+                loaded["metadata"],
+                loaded["embeddings"],
+                loaded["search_texts"],
+                query_operand,
+                normalized_index_id,
+                index_label,
+                limit=limit,
+                min_score=effective_min_score if uses_requested_min_score else _calibrated_min_score(recommended_min_score, threshold_offset),
+                exclude_lexical_duplicates=exclude_lexical_duplicates,
+                lexical_query=query,
+                search_postings=loaded.get("search_postings"),
+                metadata_texts=loaded.get("metadata_texts"),
+                metadata_postings=loaded.get("metadata_postings"),
+                scores=query_scores,
+                score_reduce=score_reduce,
+                collapse_chunks=collapse_chunks,
+                score_cutoff=score_cutoff,
+                source_groups=loaded.get("source_groups"),
+            )
+            _store_semantic_result(
+                result_cache_key,
+                (
+                    ranked["total_found"],
+                    ranked["lexical_filtered_count"],
+                    recommended_min_score,
+                    ranked["applied_min_score"],
+                    _empty_rag_context(query, None),
+                    ranked["matches"],
+                ),
+            )
+            results[position] = {"query": query, **ranked}
+
+    return recommended_min_score, effective_min_score, [result for result in results if result is not None]
 
 
 def search_semantic_overview_with_total(
@@ -558,139 +1637,245 @@ def search_semantic_overview_with_total(
     use_rag_context: bool = False,
     vector_store_ids: list[str] | None = None,
     ignore_base_calibration: bool = False,
+    parallel: bool = False,
+    max_workers: int | None = None,
+    rag_context: dict[str, Any] | None = None,
+    query_cache: dict[str, np.ndarray] | None = None,
+    cancel_event: Event | None = None,
+    query_scoring: str = AVERAGE_QUERY_SCORING,
+    collapse_chunks: bool = False,
+    score_cutoff: str = STATIC_SCORE_CUTOFF,
+    timings: dict[str, Any] | None = None,
+    embedding_errors: dict[tuple[str, str], Exception] | None = None,
+    semantic_dir: Path | None = None,
 ) -> tuple[int, int, int, float, float, dict[str, Any], list[dict[str, Any]]]:
-    indexes = list_semantic_indexes()
+    overview_started = time.perf_counter()
+    query_scoring = _normalize_query_scoring(query_scoring)
+    score_cutoff = _normalize_score_cutoff(score_cutoff)
+    indexes = list_semantic_indexes(semantic_dir)
     if not indexes:
-        return 0, 0, 0, DEFAULT_MIN_SCORE, DEFAULT_MIN_SCORE, {
-            "usedRagContext": False,
-            "sourceQuery": term,
-            "vectorStoreIds": [value for value in (vector_store_ids or []) if str(value or "").strip()],
-            "keyTerms": [],
-            "definitions": [],
-            "relatedTerms": [],
-            "disambiguatedQuery": "",
-            "references": [],
-        }, []
-
-    query_cache: dict[str, np.ndarray] = {}
-    collected: list[dict[str, Any]] = []
+        return 0, 0, 0, DEFAULT_MIN_SCORE, DEFAULT_MIN_SCORE, _empty_rag_context(term, vector_store_ids), []
+
+    if query_cache is None:
+        query_cache = {}
+    query_cache_lock = Lock()
+    # No modo paralelo, index_started sai das threads do pool; o lock serializa as chamadas ao callback.
+    progress_lock = Lock()
+    top_heap: list[tuple[float, int, int, dict[str, Any]]] = []
+    heap_size = max(0, int(limit or 0))
+    top_score: float | None = None
     total_found = 0
     total_lexical_filtered = 0
+    processed_indexes = 0
     total_indexes = len(indexes)
     group_totals: dict[str, int] = {}
     min_recommended_used: float | None = None
     max_recommended_used: float | None = None
-    rag_context = {
-        "usedRagContext": False,
-        "sourceQuery": term,
-        "vectorStoreIds": [value for value in (vector_store_ids or []) if str(value or "").strip()],
-        "keyTerms": [],
-        "definitions": [],
-        "relatedTerms": [],
-        "disambiguatedQuery": "",
-        "references": [],
-    }
-    if use_rag_context:
-        try:
-            rag_context = resolve_semantic_query_context(
-                term,
-                api_key=api_key,
-                vector_store_ids=vector_store_ids,
+    if rag_context is None:
+        started = time.perf_counter()
+        rag_context = _resolve_rag_context(
+            term,
+            api_key=api_key,
+            use_rag_context=use_rag_context,
+            vector_store_ids=vector_store_ids,
+        )
+        _add_stage_timing(timings, "ragContext", started)
+    requested_min_score = None if min_score is None else max(0.0, float(min_score))
+    should_ignore_base_calibration = ignore_base_calibration or requested_min_score is not None
+
+    def _emit_progress(update: dict[str, Any]) -> None:
+        if progress_callback:
+            with progress_lock:
+                progress_callback(update)
+
+    def _score_index(position: int, index_id: str, index_label: str) -> dict[str, Any] | None:
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        _emit_progress({
+            "currentIndexPosition": position,
+            "totalIndexes": total_indexes,
+            "currentIndexId": index_id,
+            "currentIndexLabel": index_label,
+            "message": f"Processando base {index_label}.",
+            "event": {
+                "stage": "index_started",
+                "indexId": index_id,
+                "indexLabel": index_label,
+                "position": position,
+                "totalIndexes": total_indexes,
+            },
+        })
+
+        index_timings: dict[str, Any] = {}
+        index_started = time.perf_counter()
+        loaded = _load_semantic_index_timed(index_id, index_timings, semantic_dir)
+        manifest = loaded["manifest"]
+        if embedding_errors:
+            # Provedor que ja falhou no embedding async: a base vira erro sem repetir a chamada.
+            embedding_error = embedding_errors.get(
+                _embedding_spec(manifest_embedding_provider(manifest), str(manifest.get("model") or "").strip())
             )
-        except Exception as exc:
-            rag_context["error"] = str(exc)
+            if embedding_error is not None:
+                raise embedding_error
+        recommended_min_score = float(loaded.get("recommended_min_score") or DEFAULT_MIN_SCORE)
+        query_vector_params = {
+            "api_key": api_key,
+            "model": str(manifest.get("model") or "").strip(),
+            "cache": query_cache,
+            **_embedding_provider_params(manifest_embedding_provider(manifest)),
+        }
+        if rag_context.get("usedRagContext"):
+            query_vector_params["semantic_context"] = rag_context
+        # Serializa o embedding da query para que bases com o mesmo modelo reaproveitem o cache.
+        query_matrix = None
+        with query_cache_lock:
+            cached_entries = len(query_cache)
+            started = time.perf_counter()
+            if query_scoring == AVERAGE_QUERY_SCORING:
+                query_vector = _get_semantic_query_vector(term, **query_vector_params)
+            else:
+                query_matrix, query_weights = _get_semantic_query_matrix(term, **query_vector_params)
+                query_vector = query_matrix[:, 0]
+            _add_stage_timing(index_timings, "queryEmbedding", started)
+            _mark_cache_hit(index_timings, "queryVector", len(query_cache) == cached_entries)
+        query_scores = None
+        threshold_offset = 0.0
+        score_reduce = None
+        if query_matrix is not None:
+            started = time.perf_counter()
+            query_scores, threshold_offset, score_reduce = _variant_scoring(loaded["embeddings"], query_matrix, query_weights, query_scoring)
+            if score_reduce is not None:
+                query_vector = query_matrix
+            _add_stage_timing(index_timings, "matmul", started)
+        ranked = _score_matches(
+            loaded["metadata"],
+            loaded["embeddings"],
+            loaded["search_texts"],
+            query_vector,
+            index_id,
+            index_label,
+            limit=limit,
+            min_score=(
+                requested_min_score
+                if should_ignore_base_calibration and requested_min_score is not None
+                else _calibrated_min_score(recommended_min_score, threshold_offset)
+            ),
+            exclude_lexical_duplicates=exclude_lexical_duplicates,
+            lexical_query=term,
+            search_postings=loaded.get("search_postings"),
+            metadata_texts=loaded.get("metadata_texts"),
+            metadata_postings=loaded.get("metadata_postings"),
+            scores=query_scores,
+            score_reduce=score_reduce,
+            collapse_chunks=collapse_chunks,
+            score_cutoff=score_cutoff,
+            source_groups=loaded.get("source_groups"),
+            timings=index_timings,
+        )
+        _add_stage_timing(index_timings, "total", index_started)
+        return {
+            "recommended_min_score": recommended_min_score,
+            "ranked": ranked,
+            "timings": index_timings,
+        }
+
+    def _merge_index_result(position: int, index_id: str, index_label: str, result: dict[str, Any] | None) -> None:
+        nonlocal top_score, total_found, total_lexical_filtered, processed_indexes, min_recommended_used, max_recommended_used
+        if result is None:
+            return
+        recommended_min_score = float(result["recommended_min_score"])
+        min_recommended_used = recommended_min_score if min_recommended_used is None else min(min_recommended_used, recommended_min_score)
+        max_recommended_used = recommended_min_score if max_recommended_used is None else max(max_recommended_used, recommended_min_score)
+        ranked = result["ranked"]
+        index_total_found = int(ranked["total_found"])
+        index_lexical_filtered = int(ranked["lexical_filtered_count"])
+        total_found += index_total_found
+        total_lexical_filtered += index_lexical_filtered
+        processed_indexes += 1
+        group_totals[index_id] = index_total_found
+        index_timings = result.get("timings") or {}
+        if timings is not None:
+            # Soma por etapa entre as bases; em modo paralelo pode exceder o tempo total de parede.
+            _merge_stage_timings(timings, index_timings, include_cache=False)
+            timings.setdefault("indexes", {})[index_id] = index_timings
+        # Heap minimo limitado a `limit`; em empate vence a base anterior e o melhor rank local.
+        for rank, match in enumerate(ranked["matches"]):
+            if heap_size <= 0:
+                break
+            entry = (float(match["score"]), -position, -rank, match)
+            if len(top_heap) < heap_size:
+                heapq.heappush(top_heap, entry)
+            elif entry[:3] > top_heap[0][:3]:
+                heapq.heapreplace(top_heap, entry)
+            else:
+                continue
+            top_score = entry[0] if top_score is None else max(top_score, entry[0])
+
+        _emit_progress({
+            "processedIndexes": processed_indexes,
+            "currentMatches": index_total_found,
+            "totalMatchesAccumulated": total_found,
+            "topScore": top_score,
+            "message": f"Processando base {index_label}.",
+            "event": {
+                "stage": "index_completed" if index_total_found > 0 else "index_skipped",
+                "indexId": index_id,
+                "indexLabel": index_label,
+                "position": position,
+                "totalIndexes": total_indexes,
+                "matchesFound": index_total_found,
+                "totalMatchesAccumulated": total_found,
+                "topScore": top_score,
+                "timings": index_timings,
+                "note": f"{index_lexical_filtered} duplicados lexicos filtrados." if index_lexical_filtered > 0 else None,
+            },
+        })
+
+    def _report_index_error(position: int, index_id: str, index_label: str, exc: Exception) -> None:
+        nonlocal processed_indexes
+        processed_indexes += 1
+        _emit_progress({
+            "processedIndexes": processed_indexes,
+            "message": f"Falha ao processar base {index_label}.",
+            "event": {
+                "stage": "error",
+                "indexId": index_id,
+                "indexLabel": index_label,
+                "position": position,
+                "totalIndexes": total_indexes,
+                "note": str(exc),
+            },
+        })
 
+    planned_indexes: list[tuple[int, str, str]] = []
     for position, index_meta in enumerate(indexes, start=1):
         index_id = _normalize_index_id(str(index_meta.get("id") or ""))
-        index_label = str(index_meta.get("label") or index_id).strip()
-        try:
-            if progress_callback:
-                progress_callback({
-                    "currentIndexPosition": position,
-                    "totalIndexes": total_indexes,
-                    "currentIndexId": index_id,
-                    "currentIndexLabel": index_label,
-                    "message": f"Processando base {index_label}.",
-                    "event": {
-                        "stage": "index_started",
-                        "indexId": index_id,
-                        "indexLabel": index_label,
-                        "position": position,
-                        "totalIndexes": total_indexes,
-                    },
-                })
-
-            loaded = _load_semantic_index(index_id)
-            manifest = loaded["manifest"]
-            recommended_min_score = float(loaded.get("recommended_min_score") or DEFAULT_MIN_SCORE)
-            min_recommended_used = recommended_min_score if min_recommended_used is None else min(min_recommended_used, recommended_min_score)
-            max_recommended_used = recommended_min_score if max_recommended_used is None else max(max_recommended_used, recommended_min_score)
-            query_vector_params = {
-                "api_key": api_key,
-                "model": str(manifest.get("model") or "").strip(),
-                "cache": query_cache,
+        planned_indexes.append((position, index_id, str(index_meta.get("label") or index_id).strip()))
+
+    if parallel and total_indexes > 1:
+        worker_count = max(1, min(int(max_workers or SEMANTIC_OVERVIEW_MAX_WORKERS), total_indexes))
+        with ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="semantic-overview") as executor:
+            futures = {
+                executor.submit(_score_index, position, index_id, index_label): (position, index_id, index_label)
+                for position, index_id, index_label in planned_indexes
             }
-            if rag_context.get("usedRagContext"):
-                query_vector_params["semantic_context"] = rag_context
-            query_vector = _get_semantic_query_vector(term, **query_vector_params)
-            requested_min_score = None if min_score is None else max(0.0, float(min_score))
-            should_ignore_base_calibration = ignore_base_calibration or requested_min_score is not None
-            ranked = _score_matches(
-                loaded["metadata"],
-                loaded["embeddings"],
-                loaded["search_texts"],
-                query_vector,
-                index_id,
-                index_label,
-                limit=limit,
-                min_score=requested_min_score if should_ignore_base_calibration and requested_min_score is not None else recommended_min_score,
-                exclude_lexical_duplicates=exclude_lexical_duplicates,
-                lexical_query=term,
-            )
-            index_total_found = int(ranked["total_found"])
-            index_lexical_filtered = int(ranked["lexical_filtered_count"])
-            top_matches = ranked["matches"]
-            total_found += index_total_found
-            total_lexical_filtered += index_lexical_filtered
-            group_totals[index_id] = index_total_found
-            collected.extend(top_matches)
-            collected.sort(key=lambda item: item["score"], reverse=True)
-            collected = collected[:limit]
-
-            if progress_callback:
-                progress_callback({
-                    "processedIndexes": position,
-                    "currentMatches": index_total_found,
-                    "totalMatchesAccumulated": total_found,
-                    "topScore": collected[0]["score"] if collected else None,
-                    "message": f"Processando base {index_label}.",
-                    "event": {
-                        "stage": "index_completed" if index_total_found > 0 else "index_skipped",
-                        "indexId": index_id,
-                        "indexLabel": index_label,
-                        "position": position,
-                        "totalIndexes": total_indexes,
-                        "matchesFound": index_total_found,
-                        "totalMatchesAccumulated": total_found,
-                        "topScore": collected[0]["score"] if collected else None,
-                        "note": f"{index_lexical_filtered} duplicados lexicos filtrados." if index_lexical_filtered > 0 else None,
-                    },
-                })
-        except Exception as exc:
-            if progress_callback:
-                progress_callback({
-                    "processedIndexes": position,
-                    "message": f"Falha ao processar base {index_label}.",
-                    "event": {
-                        "stage": "error",
-                        "indexId": index_id,
-                        "indexLabel": index_label,
-                        "position": position,
-                        "totalIndexes": total_indexes,
-                        "note": str(exc),
-                    },
-                })
-            continue
+            for future in as_completed(futures):
+                position, index_id, index_label = futures[future]
+                try:
+                    _merge_index_result(position, index_id, index_label, future.result())
+                except Exception as exc:
+                    _report_index_error(position, index_id, index_label, exc)
+    else:
+        for position, index_id, index_label in planned_indexes:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            try:
+                _merge_index_result(position, index_id, index_label, _score_index(position, index_id, index_label))
+            except Exception as exc:
+                _report_index_error(position, index_id, index_label, exc)
+
+    collected = [entry[3] for entry in sorted(top_heap, key=lambda entry: entry[:3], reverse=True)]
+    _add_stage_timing(timings, "total", overview_started)
 
     if not collected:
         return (
@@ -729,3 +1914,156 @@ def search_semantic_overview_with_total(
         rag_context,
         groups,
     )
+
+
+async def search_semantic_index_async(
+    index_id: str,
+    query: str,
+    limit: int,
+    api_key: str,
+    min_score: float | None = None,
+    exclude_lexical_duplicates: bool = True,
+    use_rag_context: bool = False,
+    vector_store_ids: list[str] | None = None,
+    ignore_base_calibration: bool = False,
+    query_scoring: str = AVERAGE_QUERY_SCORING,
+    collapse_chunks: bool = False,
+    score_cutoff: str = STATIC_SCORE_CUTOFF,
+    timings: dict[str, Any] | None = None,
+) -> tuple[int, int, float, float, dict[str, Any], list[dict[str, Any]]]:
+    search_started = time.perf_counter()
+    normalized_index_id = _normalize_index_id(index_id)
+    query_scoring = _normalize_query_scoring(query_scoring)
+    score_cutoff = _normalize_score_cutoff(score_cutoff)
+    loaded = await asyncio.to_thread(_load_semantic_index_timed, normalized_index_id, timings)
+    # Resultado em cache dispensa RAG e embeddings da query.
+    cached_result = _get_cached_semantic_result(
+        _semantic_result_cache_key(
+            normalized_index_id,
+            loaded.get("signature"),
+            query,
+            limit,
+            min_score,
+            exclude_lexical_duplicates,
+            use_rag_context,
+            vector_store_ids,
+            ignore_base_calibration,
+            query_scoring,
+            collapse_chunks,
+            score_cutoff,
+        )
+    )
+    _mark_cache_hit(timings, "result", cached_result is not None)
+    if cached_result is not None:
+        _add_stage_timing(timings, "total", search_started)
+        return cached_result
+    rag_context, query_cache, embedding_errors = await _resolve_query_context_and_vectors_async(
+        query,
+        api_key=api_key,
+        models=[str(loaded["manifest"].get("model") or "").strip()],
+        use_rag_context=use_rag_context,
+        vector_store_ids=vector_store_ids,
+        providers=[manifest_embedding_provider(loaded["manifest"])],
+        timings=timings,
+    )
+    if embedding_errors:
+        # Com uma unica base nao ha o que aproveitar: a falha do provedor e a falha da busca.
+        raise next(iter(embedding_errors.values()))
+    scoring_timings: dict[str, Any] | None = {} if timings is not None else None
+    cancel_event = Event()
+    try:
+        result = await asyncio.to_thread(
+            search_semantic_index,
+            normalized_index_id,
+            query,
+            limit,
+            api_key,
+            min_score=min_score,
+            exclude_lexical_duplicates=exclude_lexical_duplicates,
+            use_rag_context=use_rag_context,
+            vector_store_ids=vector_store_ids,
+            ignore_base_calibration=ignore_base_calibration,
+            rag_context=rag_context,
+            query_cache=query_cache,
+            query_scoring=query_scoring,
+            collapse_chunks=collapse_chunks,
+            score_cutoff=score_cutoff,
+            timings=scoring_timings,
+            cancel_event=cancel_event,
+        )
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
+    # O total inclui a preparacao async; do search sincrono aproveita so as etapas internas.
+    _merge_stage_timings(timings, scoring_timings)
+    _add_stage_timing(timings, "total", search_started)
+    return result
+
+
+async def search_semantic_overview_async(
+    term: str,
+    limit: int,
+    api_key: str,
+    progress_callback: Any | None = None,
+    min_score: float | None = None,
+    exclude_lexical_duplicates: bool = True,
+    use_rag_context: bool = False,
+    vector_store_ids: list[str] | None = None,
+    ignore_base_calibration: bool = False,
+    parallel: bool = False,
+    max_workers: int | None = None,
+    query_scoring: str = AVERAGE_QUERY_SCORING,
+    collapse_chunks: bool = False,
+    score_cutoff: str = STATIC_SCORE_CUTOFF,
+    timings: dict[str, Any] | None = None,
+) -> tuple[int, int, int, float, float, dict[str, Any], list[dict[str, Any]]]:
+    overview_started = time.perf_counter()
+    query_scoring = _normalize_query_scoring(query_scoring)
+    score_cutoff = _normalize_score_cutoff(score_cutoff)
+    indexes = await asyncio.to_thread(list_semantic_indexes)
+    if not indexes:
+        return 0, 0, 0, DEFAULT_MIN_SCORE, DEFAULT_MIN_SCORE, _empty_rag_context(term, vector_store_ids), []
+
+    rag_context, query_cache, embedding_errors = await _resolve_query_context_and_vectors_async(
+        term,
+        api_key=api_key,
+        models=[str(index_meta.get("model") or "").strip() for index_meta in indexes],
+        use_rag_context=use_rag_context,
+        vector_store_ids=vector_store_ids,
+        providers=[str(index_meta.get("embeddingProvider") or "") for index_meta in indexes],
+        timings=timings,
+    )
+    scoring_timings: dict[str, Any] | None = {} if timings is not None else None
+    # O scoring roda numa thread que nao pode ser interrompida; o evento encerra as bases restantes.
+    cancel_event = Event()
+    try:
+        result = await asyncio.to_thread(
+            search_semantic_overview_with_total,
+            term,
+            limit,
+            api_key,
+            progress_callback=progress_callback,
+            min_score=min_score,
+            exclude_lexical_duplicates=exclude_lexical_duplicates,
+            use_rag_context=use_rag_context,
+            vector_store_ids=vector_store_ids,
+            ignore_base_calibration=ignore_base_calibration,
+            parallel=parallel,
+            max_workers=max_workers,
+            rag_context=rag_context,
+            query_cache=query_cache,
+            embedding_errors=embedding_errors,
+            cancel_event=cancel_event,
+            query_scoring=query_scoring,
+            collapse_chunks=collapse_chunks,
+            score_cutoff=score_cutoff,
+            timings=scoring_timings,
+        )
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
+    _merge_stage_timings(timings, scoring_timings, include_cache=False)
+    if timings is not None and scoring_timings:
+        timings["indexes"] = scoring_timings.get("indexes") or {}
+    _add_stage_timing(timings, "total", overview_started)
+    return result
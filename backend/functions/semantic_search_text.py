@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import re
+from array import array
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from pathlib import Path
+from threading import Lock
+from typing import Any
+
+import numpy as np
+
+
+SEARCH_TOKEN_RE = re.compile(r"\w+")
+SEARCH_POSTINGS_COLUMNS = ("search", "metadata")
+SEARCH_POSTINGS_FILES = {
+    "vocab": "postings_vocab.npy",
+    "terms": "postings_terms.npy",
+    "offsets": "postings_offsets.npy",
+    "positions": "postings_positions.npy",
+}
+SEARCH_POSTINGS_TERM_SEPARATOR = b"\n"
+SEARCH_POSTINGS_SUBSTRING_CACHE_ENTRIES = 64
+
+
+def normalize_match_text(text: str) -> str:
+    try:
+        from backend.functions.lexical_search_service import _normalize_for_match, _sanitize_search_text, _strip_markdown_simple
+    except Exception:
+        from functions.lexical_search_service import _normalize_for_match, _sanitize_search_text, _strip_markdown_simple
+
+    return _normalize_for_match(_strip_markdown_simple(_sanitize_search_text(text or "")))
+
+
+def row_search_text(row: Any) -> str:
+    if not isinstance(row, dict):
+        return ""
+    return normalize_match_text(str(row.get("text_plain") or row.get("text") or ""))
+
+
+def _collect_metadata_text(value: Any, collector: list[str], depth: int = 0) -> None:
+    if value is None or depth > 2 or len(collector) >= 16:
+        return
+
+    if isinstance(value, dict):
+        for nested in value.values():
+            _collect_metadata_text(nested, collector, depth + 1)
+        return
+
+    if isinstance(value, (list, tuple, set)):
+        for nested in value:
+            _collect_metadata_text(nested, collector, depth + 1)
+        return
+
+    text = normalize_match_text(str(value))
+    if text:
+        collector.append(text)
+
+
+def metadata_search_text(metadata: Any) -> str:
+    collector: list[str] = []
+    _collect_metadata_text(metadata, collector)
+    return " ".join(collector[:16]).strip()
+
+
+def metadata_search_texts(metadata: Sequence[dict[str, Any]]) -> tuple[str, ...]:
+    return tuple(
+        metadata_search_text(row.get("metadata") if isinstance(row, dict) else None)
+        for row in metadata
+    )
+
+
+def search_postings_paths(index_dir: Path, column: str) -> dict[str, Path]:
+    if column not in SEARCH_POSTINGS_COLUMNS:
+        raise ValueError(f"Coluna de postings desconhecida: {column}")
+    return {key: index_dir / f"{column}_{file_name}" for key, file_name in SEARCH_POSTINGS_FILES.items()}
+
+
+def has_search_postings(index_dir: Path, column: str) -> bool:
+    return all(path.exists() for path in search_postings_paths(index_dir, column).values())
+
+
+class SearchPostingsBuilder:
+    """Acumula postings linha a linha; as posicoes ficam em array('i') compacto, nao em listas de ints."""
+
+    def __init__(self) -> None:
+        self._postings: dict[str, array] = {}
+        self.rows = 0
+
+    def add(self, text: str) -> None:
+        position = self.rows
+        for token in set(SEARCH_TOKEN_RE.findall(text or "")):
+            positions = self._postings.get(token)
+            if positions is None:
+                positions = self._postings[token] = array("i")
+            positions.append(position)
+        self.rows += 1
+
+    def encode(self) -> dict[str, np.ndarray]:
+        # Vocabulario ordenado pelos bytes UTF-8; cada termo termina no separador para permitir busca por substring.
+        encoded_terms = sorted((token.encode("utf-8"), positions) for token, positions in self._postings.items())
+        term_lengths = np.fromiter((len(term) + 1 for term, _ in encoded_terms), dtype=np.int64, count=len(encoded_terms))
+        posting_lengths = np.fromiter((len(positions) for _, positions in encoded_terms), dtype=np.int64, count=len(encoded_terms))
+        vocab = SEARCH_POSTINGS_TERM_SEPARATOR.join(term for term, _ in encoded_terms)
+        vocab += SEARCH_POSTINGS_TERM_SEPARATOR if encoded_terms else b""
+        positions = (
+            np.concatenate([np.frombuffer(term_positions, dtype=np.int32) for _, term_positions in encoded_terms])
+            if encoded_terms
+            else np.zeros((0,), dtype=np.int32)
+        )
+        return {
+            "vocab": np.frombuffer(vocab, dtype=np.uint8).copy(),
+            "terms": np.concatenate(([0], np.cumsum(term_lengths))).astype(np.int64, copy=False),
+            "offsets": np.concatenate(([0], np.cumsum(posting_lengths))).astype(np.int64, copy=False),
+            "positions": positions.astype(np.int32, copy=False),
+        }
+
+
+def encode_search_postings(texts: Iterable[str]) -> dict[str, np.ndarray]:
+    builder = SearchPostingsBuilder()
+    for text in texts:
+        builder.add(text)
+    return builder.encode()
+
+
+class SearchPostings:
+    """Postings token -> posicoes das linhas; abre via memmap ou monta sob demanda no primeiro acesso."""
+
+    def __init__(self, arrays: dict[str, np.ndarray] | None = None, *, loader: Callable[[], dict[str, np.ndarray]] | None = None) -> None:
+        if arrays is None and loader is None:
+            raise ValueError("SearchPostings exige arrays ou loader.")
+        self._arrays = arrays
+        self._loader = loader
+        self._lock = Lock()
+        self._substring_cache: OrderedDict[tuple[str, int], np.ndarray] = OrderedDict()
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> SearchPostings:
+        return cls(encode_search_postings(texts))
+
+    @classmethod
+    def deferred(cls, texts: Sequence[str]) -> SearchPostings:
+        return cls(loader=lambda: encode_search_postings(texts))
+
+    @classmethod
+    def open(cls, index_dir: Path, column: str) -> SearchPostings:
+        paths = search_postings_paths(index_dir, column)
+        return cls({key: np.load(path, mmap_mode="r") for key, path in paths.items()})
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        if self._arrays is None:
+            with self._lock:
+                if self._arrays is None:
+                    self._arrays = self._loader()
+        return self._arrays
+
+    def __len__(self) -> int:
+        return int(self.arrays()["terms"].shape[0]) - 1
+
+    def _term(self, term_id: int) -> bytes:
+        arrays = self.arrays()
+        start = int(arrays["terms"][term_id])
+        end = int(arrays["terms"][term_id + 1]) - 1
+        return bytes(arrays["vocab"][start:end])
+
+    def _term_positions(self, term_id: int) -> np.ndarray:
+        offsets = self.arrays()["offsets"]
+        return self.arrays()["positions"][int(offsets[term_id]):int(offsets[term_id + 1])]
+
+    def _term_id(self, term: str) -> int:
+        key = str(term or "").encode("utf-8")
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < len(self) and self._term(low) == key else -1
+
+    def get(self, term: str, default: np.ndarray | None = None) -> np.ndarray | None:
+        term_id = self._term_id(term)
+        return default if term_id < 0 else self._term_positions(term_id)
+
+    def __contains__(self, term: object) -> bool:
+        return isinstance(term, str) and self._term_id(term) >= 0
+
+    def _substring_term_ids(self, fragment: bytes) -> np.ndarray:
+        arrays = self.arrays()
+        vocab = arrays["vocab"]
+        key = np.frombuffer(fragment, dtype=np.uint8)
+        if key.size == 0 or key.size > vocab.shape[0]:
+            return np.zeros((0,), dtype=np.int64)
+        # Comparacao deslocada byte a byte sobre a arena inteira: custo O(len(fragmento) * len(vocabulario)) vetorizado.
+        span = int(vocab.shape[0]) - key.size + 1
+        hits = np.asarray(vocab[:span]) == key[0]
+        for offset in range(1, key.size):
+            hits &= np.asarray(vocab[offset:offset + span]) == key[offset]
+        # O separador nunca aparece num token \w+, entao cada ocorrencia cai dentro de um unico termo.
+        term_ids = np.searchsorted(arrays["terms"], np.flatnonzero(hits), side="right") - 1
+        return term_ids[np.r_[True, term_ids[1:] != term_ids[:-1]]] if term_ids.size else term_ids
+
+    def substring_mask(self, fragment: str, row_count: int) -> np.ndarray:
+        """Mascara das linhas com algum token que contem o fragmento; memoizada por fragmento."""
+        cache_key = (fragment, int(row_count))
+        with self._lock:
+            cached = self._substring_cache.get(cache_key)
+            if cached is not None:
+                self._substring_cache.move_to_end(cache_key)
+                return cached
+
+        mask = np.zeros((int(row_count),), dtype=np.bool_)
+        term_ids = self._substring_term_ids(str(fragment or "").encode("utf-8"))
+        if term_ids.size:
+            offsets = self.arrays()["offsets"]
+            starts = np.asarray(offsets[term_ids], dtype=np.int64)
+            lengths = np.asarray(offsets[term_ids + 1], dtype=np.int64) - starts
+            # Junta as fatias de postings de todos os termos sem laco Python por termo.
+            run_starts = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+            gather = run_starts + np.arange(int(lengths.sum()), dtype=np.int64)
+            mask[np.asarray(self.arrays()["positions"][gather])] = True
+        mask.flags.writeable = False
+
+        with self._lock:
+            self._substring_cache[cache_key] = mask
+            while len(self._substring_cache) > SEARCH_POSTINGS_SUBSTRING_CACHE_ENTRIES:
+                self._substring_cache.popitem(last=False)
+        return mask
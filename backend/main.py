@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import re
@@ -17,7 +18,7 @@ import zipfile
 
 import requests
 from dotenv import load_dotenv
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel
@@ -90,6 +91,7 @@ SEMANTIC_SEARCH_PROGRESS: dict[str, Any] = {
     "message": "",
     "error": None,
     "ragContext": None,
+    "timings": None,
     "events": [],
 }
 
@@ -119,6 +121,7 @@ SEMANTIC_OVERVIEW_PROGRESS: dict[str, Any] = {
     "message": "",
     "error": None,
     "ragContext": None,
+    "timings": None,
     "events": [],
 }
 
@@ -233,6 +236,8 @@ pdf2docx_python_cmd = (os.getenv("PDF2DOCX_PYTHON_CMD") or "python").strip()
 backend_python_cmd = (os.getenv("BACKEND_PYTHON_CMD") or pdf2docx_python_cmd or "python").strip()
 file_retention_hours = int(os.getenv("FILE_RETENTION_HOURS") or "24")
 file_retention_seconds = max(1, file_retention_hours) * 3600
+CLIENT_DISCONNECT_POLL_SECONDS = 0.25
+SEMANTIC_BATCH_MAX_QUERIES = 100
 LETTER_CLASS = "A-Za-zÀ-ÖØ-öø-ÿ"
 KEEP_WORD_HYPHEN_PREFIXES = {
     "além",
@@ -375,6 +380,34 @@ class SemanticSearchRequest(BaseModel):
     excludeLexicalDuplicates: bool = True
     vectorStoreIds: list[str] = []
     ignoreBaseCalibration: bool = False
+    queryScoring: str = "average"
+    collapseChunks: bool = False
+    scoreCutoff: str = "static"
+
+
+class SemanticBatchSearchRequest(BaseModel):
+    indexId: str = ""
+    queries: list[str] = []
+    limit: int = 10
+    minScore: float | None = None
+    excludeLexicalDuplicates: bool = True
+    ignoreBaseCalibration: bool = False
+    queryScoring: str = "average"
+    collapseChunks: bool = False
+    scoreCutoff: str = "static"
+
+
+class HybridSearchRequest(BaseModel):
+    indexId: str = ""
+    query: str = ""
+    limit: int = 10
+    minScore: float | None = None
+    useRagContext: bool = False
+    vectorStoreIds: list[str] = []
+    ignoreBaseCalibration: bool = False
+    fusion: str = "rrf"
+    semanticWeight: float = 0.5
+    queryScoring: str = "average"
 
 
 class SemanticOverviewSearchRequest(BaseModel):
@@ -385,6 +418,10 @@ class SemanticOverviewSearchRequest(BaseModel):
     excludeLexicalDuplicates: bool = True
     vectorStoreIds: list[str] = []
     ignoreBaseCalibration: bool = False
+    parallel: bool = False
+    queryScoring: str = "average"
+    collapseChunks: bool = False
+    scoreCutoff: str = "static"
 
 
 class OnlineDictionarySearchRequest(BaseModel):
@@ -424,6 +461,38 @@ def startup_gc() -> None:
     run_storage_gc()
 
 
+@app.on_event("shutdown")
+async def shutdown_semantic_http_client() -> None:
+    try:
+        from backend.functions.semantic_search_service import aclose_async_embeddings_client
+    except Exception:
+        from functions.semantic_search_service import aclose_async_embeddings_client
+
+    await aclose_async_embeddings_client()
+
+
+class ClientDisconnectedError(Exception):
+    pass
+
+
+async def run_until_client_disconnects(request: Request, awaitable: Any) -> Any:
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=CLIENT_DISCONNECT_POLL_SECONDS)
+            if task in done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnectedError("Cliente desconectado; busca cancelada.")
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+
+
 def meta_path_for(file_id: str) -> Path:
     return META_DIR / f"{file_id}.json"
 
@@ -501,6 +570,18 @@ def require_openai_key() -> None:
         raise HTTPException(status_code=500, detail="OPENAI_API_KEY nao configurada no servidor.")
 
 
+def require_openai_key_for_semantic(index_ids: list[str] | None = None, *, use_rag_context: bool = False) -> None:
+    # Indices com embeddings local/stub rodam sem chave; index_ids None cobre todos os indices (overview).
+    # Le manifests do disco: os handlers async chamam via asyncio.to_thread para nao travar o event loop.
+    try:
+        from backend.functions.semantic_search_service import semantic_search_requires_openai_key
+    except Exception:
+        from functions.semantic_search_service import semantic_search_requires_openai_key
+
+    if semantic_search_requires_openai_key(index_ids, use_rag_context=use_rag_context):
+        require_openai_key()
+
+
 def decode_xml_text(text: str) -> str:
     return text.replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">")\
         .replace("&quot;", '"').replace("&apos;", "'")
@@ -1508,8 +1589,8 @@ def api_semantic_indexes() -> dict[str, Any]:
 
 
 @app.post("/api/apps/semantic/search")
-def api_semantic_search(payload: SemanticSearchRequest) -> dict[str, Any]:
-    require_openai_key()
+async def api_semantic_search(payload: SemanticSearchRequest, request: Request) -> dict[str, Any]:
+    await asyncio.to_thread(require_openai_key_for_semantic, [payload.indexId or ""], use_rag_context=bool(payload.useRagContext))
     index_id = (payload.indexId or "").strip()
     query = (payload.query or "").strip()
     if not index_id:
@@ -1546,6 +1627,7 @@ def api_semantic_search(payload: SemanticSearchRequest) -> dict[str, Any]:
             "message": f"Processando busca semantica na base {index_id.upper()}.",
             "error": None,
             "ragContext": None,
+            "timings": None,
             "event": {
                 "stage": "started",
                 "indexId": index_id,
@@ -1558,22 +1640,45 @@ def api_semantic_search(payload: SemanticSearchRequest) -> dict[str, Any]:
     )
 
     try:
-        from backend.functions.semantic_search_service import search_semantic_index
+        from backend.functions.semantic_search_service import search_semantic_index_async
     except Exception:
-        from functions.semantic_search_service import search_semantic_index
+        from functions.semantic_search_service import search_semantic_index_async
 
+    timings: dict[str, Any] = {}
     try:
-        total, lexical_filtered_count, recommended_min_score, effective_min_score, rag_context, matches = search_semantic_index(
-            index_id=index_id,
-            query=query,
-            limit=limit,
-            api_key=get_openai_api_key(),
-            min_score=min_score,
-            exclude_lexical_duplicates=exclude_lexical_duplicates,
-            use_rag_context=bool(payload.useRagContext),
-            vector_store_ids=payload.vectorStoreIds,
-            ignore_base_calibration=ignore_base_calibration,
+        total, lexical_filtered_count, recommended_min_score, effective_min_score, rag_context, matches = await run_until_client_disconnects(
+            request,
+            search_semantic_index_async(
+                index_id=index_id,
+                query=query,
+                limit=limit,
+                api_key=get_openai_api_key(),
+                min_score=min_score,
+                exclude_lexical_duplicates=exclude_lexical_duplicates,
+                use_rag_context=bool(payload.useRagContext),
+                vector_store_ids=payload.vectorStoreIds,
+                ignore_base_calibration=ignore_base_calibration,
+                query_scoring=payload.queryScoring,
+                collapse_chunks=bool(payload.collapseChunks),
+                score_cutoff=payload.scoreCutoff,
+                timings=timings,
+            ),
         )
+    except ClientDisconnectedError as exc:
+        _update_semantic_search_progress({
+            "status": "cancelled",
+            "finishedAt": _utc_iso_now(),
+            "message": "Semantic Search cancelado: cliente desconectado.",
+            "event": {
+                "stage": "cancelled",
+                "indexId": index_id,
+                "indexLabel": index_id.upper(),
+                "position": 1,
+                "totalIndexes": 1,
+                "note": str(exc),
+            },
+        })
+        raise HTTPException(status_code=499, detail=str(exc))
     except FileNotFoundError as exc:
         _update_semantic_search_progress({
             "status": "error",
@@ -1641,6 +1746,7 @@ def api_semantic_search(payload: SemanticSearchRequest) -> dict[str, Any]:
         "topScore": top_score,
         "message": f"Semantic Search concluido com {total} resultados.",
         "ragContext": rag_context_payload,
+        "timings": timings,
         "event": {
             "stage": "completed",
             "indexId": index_id,
@@ -1650,6 +1756,7 @@ def api_semantic_search(payload: SemanticSearchRequest) -> dict[str, Any]:
             "matchesFound": total,
             "totalMatchesAccumulated": total,
             "topScore": top_score,
+            "timings": timings,
             "note": f"{lexical_filtered_count} duplicados lexicos filtrados." + (f" RAG contextual aplicado via {len((rag_context_payload or {}).get('vectorStoreIds') or [])} vector store(s)." if (rag_context_payload or {}).get("usedRagContext") else ""),
         },
     })
@@ -1668,11 +1775,148 @@ def api_semantic_search(payload: SemanticSearchRequest) -> dict[str, Any]:
             "lexicalFilteredCount": lexical_filtered_count,
             "ragContext": rag_context_payload,
             "ragLlmLog": rag_llm_log,
+            "timings": timings,
             "matches": matches,
         },
     }
 
 
+@app.post("/api/apps/semantic/search/batch")
+async def api_semantic_search_batch(payload: SemanticBatchSearchRequest, request: Request) -> dict[str, Any]:
+    await asyncio.to_thread(require_openai_key_for_semantic, [payload.indexId or ""])
+    index_id = (payload.indexId or "").strip()
+    queries = [str(query or "").strip() for query in payload.queries if str(query or "").strip()]
+    if not index_id:
+        raise HTTPException(status_code=400, detail="Parametro 'indexId' e obrigatorio.")
+    if not queries:
+        raise HTTPException(status_code=400, detail="Parametro 'queries' e obrigatorio.")
+    if len(queries) > SEMANTIC_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Maximo de {SEMANTIC_BATCH_MAX_QUERIES} queries por lote.")
+    limit = max(1, min(int(payload.limit or 10), 50))
+    min_score = max(0.0, float(payload.minScore)) if payload.minScore is not None else None
+    ignore_base_calibration = bool(payload.ignoreBaseCalibration or payload.minScore is not None)
+    exclude_lexical_duplicates = bool(payload.excludeLexicalDuplicates)
+
+    try:
+        from backend.functions.semantic_search_service import search_semantic_index_batch
+    except Exception:
+        from functions.semantic_search_service import search_semantic_index_batch
+
+    try:
+        recommended_min_score, effective_min_score, results = await run_until_client_disconnects(
+            request,
+            asyncio.to_thread(
+                search_semantic_index_batch,
+                index_id,
+                queries,
+                limit,
+                get_openai_api_key(),
+                min_score=min_score,
+                exclude_lexical_duplicates=exclude_lexical_duplicates,
+                ignore_base_calibration=ignore_base_calibration,
+                query_scoring=payload.queryScoring,
+                collapse_chunks=bool(payload.collapseChunks),
+                score_cutoff=payload.scoreCutoff,
+            ),
+        )
+    except ClientDisconnectedError as exc:
+        raise HTTPException(status_code=499, detail=str(exc))
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Falha ao executar Semantic Search em lote: {exc}")
+
+    return {
+        "ok": True,
+        "result": {
+            "indexId": index_id,
+            "requestedMinScore": min_score,
+            "recommendedMinScore": recommended_min_score,
+            "minScore": effective_min_score,
+            "ignoreBaseCalibration": ignore_base_calibration,
+            "excludeLexicalDuplicates": exclude_lexical_duplicates,
+            "results": [
+                {
+                    "query": item["query"],
+                    "total": item["total_found"],
+                    "lexicalFilteredCount": item["lexical_filtered_count"],
+                    "minScore": item["applied_min_score"],
+                    "matches": item["matches"],
+                }
+                for item in results
+            ],
+        },
+    }
+
+
+@app.post("/api/apps/semantic/hybrid")
+async def api_semantic_hybrid_search(payload: HybridSearchRequest, request: Request) -> dict[str, Any]:
+    await asyncio.to_thread(require_openai_key_for_semantic, [payload.indexId or ""], use_rag_context=bool(payload.useRagContext))
+    index_id = (payload.indexId or "").strip()
+    query = (payload.query or "").strip()
+    if not index_id:
+        raise HTTPException(status_code=400, detail="Parametro 'indexId' e obrigatorio.")
+    if not query:
+        raise HTTPException(status_code=400, detail="Parametro 'query' e obrigatorio.")
+    limit = max(1, min(int(payload.limit or 10), 50))
+    min_score = max(0.0, float(payload.minScore)) if payload.minScore is not None else None
+    ignore_base_calibration = bool(payload.ignoreBaseCalibration or payload.minScore is not None)
+
+    try:
+        from backend.functions.hybrid_search_service import search_hybrid_index_async
+    except Exception:
+        from functions.hybrid_search_service import search_hybrid_index_async
+
+    try:
+        hybrid = await run_until_client_disconnects(
+            request,
+            search_hybrid_index_async(
+                index_id=index_id,
+                query=query,
+                limit=limit,
+                api_key=get_openai_api_key(),
+                min_score=min_score,
+                use_rag_context=bool(payload.useRagContext),
+                vector_store_ids=payload.vectorStoreIds,
+                ignore_base_calibration=ignore_base_calibration,
+                query_scoring=payload.queryScoring,
+                fusion=payload.fusion,
+                semantic_weight=payload.semanticWeight,
+            ),
+        )
+    except ClientDisconnectedError as exc:
+        raise HTTPException(status_code=499, detail=str(exc))
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Falha ao executar busca hibrida: {exc}")
+
+    rag_context = hybrid["rag_context"]
+    return {
+        "ok": True,
+        "result": {
+            "indexId": index_id,
+            "query": query,
+            "fusion": (payload.fusion or "rrf").strip().lower(),
+            "semanticWeight": payload.semanticWeight,
+            "total": len(hybrid["matches"]),
+            "lexicalTotal": hybrid["lexical_total"],
+            "semanticTotal": hybrid["semantic_total"],
+            "requestedMinScore": min_score,
+            "recommendedMinScore": hybrid["recommended_min_score"],
+            "minScore": hybrid["effective_min_score"],
+            "ignoreBaseCalibration": ignore_base_calibration,
+            "ragContext": _sanitize_rag_context(rag_context),
+            "ragLlmLog": rag_context.get("llmLog") if isinstance(rag_context, dict) else None,
+            "matches": hybrid["matches"],
+        },
+    }
+
+
 @app.get("/api/apps/lexical/overview/progress")
 def api_lexical_overview_progress() -> dict[str, Any]:
     return {
@@ -1690,8 +1934,8 @@ def api_semantic_search_progress() -> dict[str, Any]:
 
 
 @app.post("/api/apps/semantic/overview")
-def api_semantic_overview(payload: SemanticOverviewSearchRequest) -> dict[str, Any]:
-    require_openai_key()
+async def api_semantic_overview(payload: SemanticOverviewSearchRequest, request: Request) -> dict[str, Any]:
+    await asyncio.to_thread(require_openai_key_for_semantic, use_rag_context=bool(payload.useRagContext))
     term = (payload.term or "").strip()
     if not term:
         raise HTTPException(status_code=400, detail="Parametro 'term' e obrigatorio.")
@@ -1700,9 +1944,9 @@ def api_semantic_overview(payload: SemanticOverviewSearchRequest) -> dict[str, A
     exclude_lexical_duplicates = bool(payload.excludeLexicalDuplicates)
 
     try:
-        from backend.functions.semantic_search_service import search_semantic_overview_with_total
+        from backend.functions.semantic_search_service import search_semantic_overview_async
     except Exception:
-        from functions.semantic_search_service import search_semantic_overview_with_total
+        from functions.semantic_search_service import search_semantic_overview_async
 
     _update_semantic_overview_progress(
         {
@@ -1729,21 +1973,31 @@ def api_semantic_overview(payload: SemanticOverviewSearchRequest) -> dict[str, A
             "message": "Preparando Semantic Overview.",
             "error": None,
             "ragContext": None,
+            "timings": None,
         },
         reset_events=True,
     )
 
+    timings: dict[str, Any] = {}
     try:
-        total_indexes, total_found, lexical_filtered_count, min_recommended_score, max_recommended_score, rag_context, groups = search_semantic_overview_with_total(
-            term=term,
-            limit=limit,
-            api_key=get_openai_api_key(),
-            progress_callback=_update_semantic_overview_progress,
-            min_score=min_score,
-            exclude_lexical_duplicates=exclude_lexical_duplicates,
-            use_rag_context=bool(payload.useRagContext),
-            vector_store_ids=payload.vectorStoreIds,
-            ignore_base_calibration=bool(payload.ignoreBaseCalibration),
+        total_indexes, total_found, lexical_filtered_count, min_recommended_score, max_recommended_score, rag_context, groups = await run_until_client_disconnects(
+            request,
+            search_semantic_overview_async(
+                term=term,
+                limit=limit,
+                api_key=get_openai_api_key(),
+                progress_callback=_update_semantic_overview_progress,
+                min_score=min_score,
+                exclude_lexical_duplicates=exclude_lexical_duplicates,
+                use_rag_context=bool(payload.useRagContext),
+                vector_store_ids=payload.vectorStoreIds,
+                ignore_base_calibration=bool(payload.ignoreBaseCalibration),
+                parallel=bool(payload.parallel),
+                query_scoring=payload.queryScoring,
+                collapse_chunks=bool(payload.collapseChunks),
+                score_cutoff=payload.scoreCutoff,
+                timings=timings,
+            ),
         )
         rag_llm_log = rag_context.get("llmLog") if isinstance(rag_context, dict) else None
         rag_context_payload = _sanitize_rag_context(rag_context)
@@ -1769,15 +2023,30 @@ def api_semantic_overview(payload: SemanticOverviewSearchRequest) -> dict[str, A
                 "topScore": top_score,
                 "message": f"Semantic Overview concluido com {total_found} resultados.",
                 "ragContext": rag_context_payload,
+                "timings": timings,
                 "event": {
                     "stage": "completed",
                     "matchesFound": total_found,
                     "totalMatchesAccumulated": total_found,
                     "topScore": top_score,
+                    "timings": {key: value for key, value in timings.items() if key != "indexes"},
                     "note": f"{len(groups)} bases entraram no top final; calibracao entre {min_recommended_score:.2f} e {max_recommended_score:.2f}; {lexical_filtered_count} duplicados lexicos filtrados." + (f" RAG contextual aplicado via {len((rag_context_payload or {}).get('vectorStoreIds') or [])} vector store(s)." if (rag_context_payload or {}).get("usedRagContext") else ""),
                 },
             }
         )
+    except ClientDisconnectedError as exc:
+        _update_semantic_overview_progress(
+            {
+                "status": "cancelled",
+                "finishedAt": _utc_iso_now(),
+                "message": "Semantic Overview cancelado: cliente desconectado.",
+                "event": {
+                    "stage": "cancelled",
+                    "note": str(exc),
+                },
+            }
+        )
+        raise HTTPException(status_code=499, detail=str(exc))
     except ValueError as exc:
         _update_semantic_overview_progress(
             {
@@ -1825,6 +2094,7 @@ def api_semantic_overview(payload: SemanticOverviewSearchRequest) -> dict[str, A
             "totalIndexes": total_indexes,
             "totalFound": total_found,
             "lexicalFilteredCount": lexical_filtered_count,
+            "timings": timings,
             "groups": groups,
         },
     }
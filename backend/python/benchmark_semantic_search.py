@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from backend.functions.semantic_benchmark import (  # noqa: E402
+    DEFAULT_BENCHMARK_DIMENSIONS,
+    DEFAULT_BENCHMARK_QUERIES,
+    DEFAULT_BENCHMARK_ROWS,
+    DEFAULT_BENCHMARK_SEED,
+    DEFAULT_BENCHMARK_TOP_K,
+    DEFAULT_CHUNKING_REPEATS,
+    build_synthetic_long_texts,
+    run_chunking_benchmark,
+    run_semantic_benchmark,
+)
+from backend.functions.semantic_metadata_store import SemanticMetadataStore, has_metadata_store  # noqa: E402
+
+
+SEMANTIC_DIR = ROOT_DIR / "backend" / "Files" / "Semantic"
+
+
+def _load_fixture_rows(index_id: str) -> list[dict]:
+    index_dir = SEMANTIC_DIR / index_id.strip().lower()
+    metadata_path = index_dir / "metadata.json"
+    if not metadata_path.exists():
+        if has_metadata_store(index_dir):
+            return list(SemanticMetadataStore.open(index_dir))
+        raise FileNotFoundError(f"metadata.json/metadata store nao encontrado para o indice: {index_id}")
+    rows = json.loads(metadata_path.read_text(encoding="utf-8"))
+    if not isinstance(rows, list):
+        raise ValueError(f"Metadata invalida no indice {index_id}")
+    return rows
+
+
+def _run_chunking(args: argparse.Namespace) -> int:
+    if args.fixture:
+        texts = [str(row.get("text_plain") or row.get("text") or "") for row in _load_fixture_rows(args.fixture) if isinstance(row, dict)]
+    else:
+        texts = build_synthetic_long_texts(args.rows, seed=args.seed)
+    report = run_chunking_benchmark(
+        texts,
+        repeats=args.repeats,
+        tokenizer=args.chunk_tokenizer,
+        output_path=args.output.resolve(),
+    )
+    for name in ("reference", "linear"):
+        stats = report[name]
+        print(f"{name}: {stats['elapsedMs']:.1f}ms | {stats['chunks']} chunks | {stats['charsPerSecond'] or 0:.0f} chars/s")
+    print(f"speedup={report['speedup']} | textos identicos={report['identicalTexts']}/{report['config']['texts']}")
+    print(f"Relatorio gravado em {args.output.resolve()}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark offline da busca semantica (recall@k, latencia p50/p95 e memoria) com embeddings stub.",
+    )
+    parser.add_argument("--output", type=Path, default=Path("semantic_benchmark.json"), help="Arquivo JSON de saida.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_BENCHMARK_ROWS, help="Quantidade de linhas do indice.")
+    parser.add_argument("--dimensions", type=int, default=DEFAULT_BENCHMARK_DIMENSIONS, help="Dimensao dos embeddings stub.")
+    parser.add_argument("--queries", type=int, default=DEFAULT_BENCHMARK_QUERIES, help="Quantidade de queries medidas.")
+    parser.add_argument("--k", type=int, default=DEFAULT_BENCHMARK_TOP_K, help="Tamanho do top-k usado no recall.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_BENCHMARK_SEED, help="Semente do corpus e das queries.")
+    parser.add_argument("--shard-rows", type=int, default=None, help="Tambem mede o modo em shards com esse numero de linhas.")
+    parser.add_argument("--parallel-overview", action="store_true", help="Executa o overview em modo paralelo.")
+    parser.add_argument(
+        "--fixture",
+        default=None,
+        help="ID de um indice existente cujo metadata.json (ou metadata store) sera usado como corpus (re-embedado com o stub).",
+    )
+    parser.add_argument(
+        "--chunking",
+        action="store_true",
+        help="Compara o chunker de referencia com o chunker linear no corpus completo, em vez de medir a busca.",
+    )
+    parser.add_argument("--repeats", type=int, default=DEFAULT_CHUNKING_REPEATS, help="Execucoes por chunker no modo --chunking.")
+    parser.add_argument(
+        "--chunk-tokenizer",
+        default=None,
+        help='Unidade de tamanho do chunker linear no modo --chunking ("chars", "approx" ou "tiktoken:<encoding>").',
+    )
+    args = parser.parse_args()
+
+    if args.chunking:
+        return _run_chunking(args)
+
+    source_rows = _load_fixture_rows(args.fixture) if args.fixture else None
+    with tempfile.TemporaryDirectory(prefix="semantic-benchmark-") as work_dir:
+        report = run_semantic_benchmark(
+            Path(work_dir),
+            rows=args.rows,
+            dimensions=args.dimensions,
+            queries=args.queries,
+            k=args.k,
+            seed=args.seed,
+            shard_rows=args.shard_rows,
+            source_rows=source_rows,
+            parallel_overview=args.parallel_overview,
+            output_path=args.output.resolve(),
+        )
+
+    for mode, mode_report in report["modes"].items():
+        for path_name in ("scoreMatches", "overview"):
+            stats = mode_report[path_name]
+            print(
+                f"{mode}/{path_name}: recall@{report['config']['k']}={stats['recallAtK']:.4f} "
+                f"| p50={stats['latencyMs']['p50']:.3f}ms p95={stats['latencyMs']['p95']:.3f}ms "
+                f"| peak={stats['peakTracedBytes'] / 1_048_576:.1f}MiB"
+            )
+    print(f"Relatorio gravado em {args.output.resolve()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import json
 import sys
 from pathlib import Path
 
@@ -11,7 +12,15 @@ ROOT_DIR = Path(__file__).resolve().parents[2]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
+from backend.functions.semantic_deduplication import DEFAULT_DEDUPE_THRESHOLD  # noqa: E402
+from backend.functions.semantic_embedding_providers import (  # noqa: E402
+    EMBEDDING_PROVIDERS,
+    OPENAI_EMBEDDING_PROVIDER,
+    manifest_embedding_provider,
+    normalize_embedding_provider,
+)
 from backend.functions.semantic_index_builder import rebuild_semantic_index  # noqa: E402
+from backend.functions.semantic_rebuild_orchestrator import rebuild_semantic_indexes  # noqa: E402
 
 
 SEMANTIC_DIR = ROOT_DIR / "backend" / "Files" / "Semantic"
@@ -38,39 +47,162 @@ def _get_openai_api_key() -> str:
     return str(values.get("OPENAI_API_KEY") or "").strip()
 
 
+def _resolve_index_provider(index_dir: Path, provider: str | None) -> str:
+    # Sem --provider, o rebuild mantem o provedor registrado no manifest do indice.
+    if provider:
+        return normalize_embedding_provider(provider)
+    manifest_path = index_dir / "manifest.json"
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else None
+    return manifest_embedding_provider(manifest)
+
+
+def _print_orchestrated_entry(entry: dict) -> None:
+    if entry["status"] != "ok":
+        print(f"erro: {entry['indexId']} ({entry['stage']}): {entry['error']}", file=sys.stderr)
+        return
+    print(
+        f"{entry['indexId']}: {entry['rowsBefore']} -> {entry['chunks']} chunks "
+        f"| embedded={entry['embeddedChunks']} reused={entry['reusedChunks']} "
+        f"| tokens~{entry['estimatedTokens']} "
+        f"| {entry['elapsedMs'] / 1000:.1f}s"
+    )
+    if entry.get("warning"):
+        print(f"warning: {entry['indexId']}: {entry['warning']}", file=sys.stderr)
+
+
+def _run_orchestrated(index_dirs: list[Path], api_key: str, args: argparse.Namespace, rebuild_options: dict) -> int:
+    report = rebuild_semantic_indexes(
+        index_dirs,
+        api_key=api_key,
+        max_parallel_indexes=args.parallel_indexes,
+        max_in_flight=args.max_in_flight,
+        report_path=args.report.resolve() if args.report else None,
+        progress_callback=_print_orchestrated_entry,
+        **rebuild_options,
+    )
+    totals = report["totals"]
+    print(
+        f"total: {totals['indexes']} indices ({totals['failed']} com erro) "
+        f"| {totals['chunks']} chunks | tokens~{totals['estimatedTokens']} "
+        f"| {report['elapsedMs'] / 1000:.1f}s"
+    )
+    if args.report:
+        print(f"Relatorio gravado em {args.report.resolve()}")
+    return 1 if totals["failed"] else 0
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Reconstrui indices semanticos com rechunking e novos embeddings.")
     parser.add_argument("index_ids", nargs="*", help="IDs dos indices para reconstruir. Sem argumentos, processa todos.")
     parser.add_argument("--batch-size", type=int, default=64, help="Tamanho do lote de embeddings.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Lotes de embeddings em voo simultaneamente.")
     parser.add_argument("--target-chars", type=int, default=280, help="Tamanho alvo de caracteres por chunk.")
     parser.add_argument("--max-chars", type=int, default=420, help="Tamanho maximo de caracteres por chunk.")
     parser.add_argument("--min-chars", type=int, default=110, help="Tamanho minimo de caracteres por chunk.")
+    parser.add_argument(
+        "--chunk-tokenizer",
+        default=None,
+        help='Mede os chunks em "chars" (padrao), "approx" (~4 caracteres por token) ou "tiktoken:<encoding>"; '
+        "os limites --target-chars/--max-chars/--min-chars passam a valer nessa unidade.",
+    )
+    parser.add_argument(
+        "--chunk-workers",
+        type=int,
+        default=1,
+        help="Processos usados no rechunking das linhas-fonte (a ordem dos chunks nao muda).",
+    )
     parser.add_argument("--require-source-file", action="store_true", help="Falha se o source_file do manifest nao existir.")
+    parser.add_argument(
+        "--provider",
+        choices=EMBEDDING_PROVIDERS,
+        default=None,
+        help="Provedor de embeddings (openai, local ou stub). Sem argumento, usa o registrado no manifest.",
+    )
+    parser.add_argument("--model", default=None, help="Modelo de embeddings. Sem argumento, usa o do manifest ou o padrao do provedor.")
+    parser.add_argument(
+        "--shard-rows",
+        type=int,
+        default=None,
+        help="Divide embeddings.npy em shards com esse numero de linhas (para bases maiores que a RAM).",
+    )
+    parser.add_argument(
+        "--dedupe-threshold",
+        type=float,
+        default=None,
+        help=f"Remove chunks quase duplicados com cosseno acima do limiar (ex.: {DEFAULT_DEDUPE_THRESHOLD}).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignora o store de embeddings por chunk e re-embeda todos os chunks.",
+    )
+    parser.add_argument(
+        "--no-metadata-json",
+        action="store_true",
+        help="Nao grava o metadata.json e remove o existente; o indice passa a depender so do metadata store.",
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Descarta o checkpoint de um rebuild interrompido e recomeca os embeddings do zero.",
+    )
+    parser.add_argument(
+        "--parallel-indexes",
+        type=int,
+        default=1,
+        help="Reconstroi varios indices ao mesmo tempo (rechunking em processos, embeddings com limite global).",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="Limite global de requisicoes de embeddings simultaneas no modo paralelo.",
+    )
+    parser.add_argument("--report", type=Path, default=None, help="Grava um relatorio JSON consolidado por indice.")
     args = parser.parse_args()
 
-    api_key = _get_openai_api_key()
-    if not api_key:
-        print(f"OPENAI_API_KEY nao configurada em {DOTENV_PATH}.", file=sys.stderr)
-        return 1
-
     index_dirs = _resolve_index_dirs(args.index_ids)
     if not index_dirs:
         print("Nenhum indice semantico encontrado.", file=sys.stderr)
         return 1
 
+    api_key = _get_openai_api_key()
+    needs_openai_key = any(
+        _resolve_index_provider(index_dir, args.provider) == OPENAI_EMBEDDING_PROVIDER
+        for index_dir in index_dirs
+    )
+    if not api_key and needs_openai_key:
+        print(f"OPENAI_API_KEY nao configurada em {DOTENV_PATH}.", file=sys.stderr)
+        return 1
+
+    rebuild_options = {
+        "model": args.model,
+        "provider": args.provider,
+        "shard_rows": args.shard_rows,
+        "dedupe_threshold": args.dedupe_threshold,
+        "reuse_embeddings": not args.full,
+        "resume": not args.no_resume,
+        "batch_size": args.batch_size,
+        "max_concurrency": args.concurrency,
+        "target_chars": args.target_chars,
+        "max_chars": args.max_chars,
+        "min_chars": args.min_chars,
+        "chunk_tokenizer": args.chunk_tokenizer,
+        "chunk_workers": args.chunk_workers,
+        "require_source_file": args.require_source_file,
+        "write_metadata_json": not args.no_metadata_json,
+    }
+    if args.parallel_indexes > 1 or args.report:
+        return _run_orchestrated(index_dirs, api_key, args, rebuild_options)
+
     for index_dir in index_dirs:
-        result = rebuild_semantic_index(
-            index_dir,
-            api_key=api_key,
-            batch_size=args.batch_size,
-            target_chars=args.target_chars,
-            max_chars=args.max_chars,
-            min_chars=args.min_chars,
-            require_source_file=args.require_source_file,
-        )
+        result = rebuild_semantic_index(index_dir, api_key=api_key, **rebuild_options)
         print(
             f"{result['index_id']}: {result['rows_before']} -> {result['rows_after']} chunks "
             f"| basis={result['rebuild_basis']} "
+            f"| provider={result['embedding_provider']} "
+            f"| duplicates_removed={result['duplicates_removed']} "
+            f"| embedded={result['embeddings_computed']} reused={result['embeddings_reused']} "
             f"| recommended_min_score={result['recommended_min_score']:.2f}"
         )
         if result.get("warning"):
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-import json
+import argparse
 import sys
 from pathlib import Path
 
@@ -9,49 +9,50 @@ ROOT_DIR = Path(__file__).resolve().parents[2]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-from backend.functions.semantic_index_calibration import (  # noqa: E402
-    CALIBRATION_MARGIN,
-    CALIBRATION_RANDOM_SEED,
-    CALIBRATION_SAMPLE_PAIRS,
-    build_calibration_payload,
-    compute_similarity_stats,
-    load_embeddings_for_calibration,
-    recommend_min_score,
-)
+from backend.functions.semantic_index_calibration import CALIBRATION_METHOD_AUTO, CALIBRATION_METHODS  # noqa: E402
+from backend.functions.semantic_recalibration import recalibrate_semantic_manifests  # noqa: E402
 
 
 SEMANTIC_DIR = ROOT_DIR / "backend" / "Files" / "Semantic"
 
 
-def recalibrate_manifest(index_dir: Path) -> dict[str, float]:
-    manifest_path = index_dir / "manifest.json"
-    if not manifest_path.exists():
-        raise FileNotFoundError(f"Manifest nao encontrado: {manifest_path}")
+def _format_score(value: float | None) -> str:
+    return "-" if value is None else f"{value:.2f}"
 
-    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
-    embeddings = load_embeddings_for_calibration(index_dir)
-    stats = compute_similarity_stats(
-        embeddings,
-        sample_pairs=CALIBRATION_SAMPLE_PAIRS,
-        seed=CALIBRATION_RANDOM_SEED,
-    )
-    recommended = recommend_min_score(stats, margin=CALIBRATION_MARGIN)
-    manifest["recommended_min_score"] = recommended
-    manifest["score_calibration"] = build_calibration_payload(
-        stats,
-        margin=CALIBRATION_MARGIN,
-        seed=CALIBRATION_RANDOM_SEED,
+
+def _print_entry(entry: dict) -> None:
+    if entry["status"] != "ok":
+        print(f"erro: {entry['indexId']}: {entry['error']}", file=sys.stderr)
+        return
+    previous = entry["previousMinScore"]
+    delta = "" if previous is None else f" ({entry['recommendedMinScore'] - previous:+.2f})"
+    previous_p99 = "" if entry["previousP99"] is None else f"{entry['previousP99']:.4f} -> "
+    print(
+        f"{entry['indexId']}: recommended_min_score {_format_score(previous)} -> {entry['recommendedMinScore']:.2f}{delta} "
+        f"| p99 {previous_p99}{entry['p99']:.4f} "
+        f"| rows={entry['rows']} method={entry['method']} "
+        f"| {entry['elapsedMs'] / 1000:.2f}s"
     )
-    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-    return {
-        "recommended_min_score": recommended,
-        "p99": float(stats["p99"]),
-        "rows": float(stats["rows"]),
-    }
 
 
 def main(argv: list[str]) -> int:
-    requested_ids = {(item or "").strip().lower() for item in argv[1:] if (item or "").strip()}
+    parser = argparse.ArgumentParser(description="Recalibra recommended_min_score nos manifests dos indices semanticos.")
+    parser.add_argument("index_ids", nargs="*", help="IDs dos indices para recalibrar. Sem argumentos, processa todos.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processos usados para calibrar indices em paralelo.",
+    )
+    parser.add_argument(
+        "--method",
+        choices=CALIBRATION_METHODS,
+        default=CALIBRATION_METHOD_AUTO,
+        help="Metodo das estatisticas de similaridade (auto escolhe exact ou sampled_sketch pelo tamanho do indice).",
+    )
+    args = parser.parse_args(argv[1:])
+
+    requested_ids = {(item or "").strip().lower() for item in args.index_ids if (item or "").strip()}
     index_dirs = [
         path
         for path in sorted(SEMANTIC_DIR.iterdir(), key=lambda item: item.name.lower())
@@ -61,13 +62,17 @@ def main(argv: list[str]) -> int:
         print("Nenhum indice semantico encontrado para recalibracao.", file=sys.stderr)
         return 1
 
-    for index_dir in index_dirs:
-        result = recalibrate_manifest(index_dir)
-        print(
-            f"{index_dir.name}: recommended_min_score={result['recommended_min_score']:.2f} "
-            f"(p99={result['p99']:.4f}, rows={int(result['rows'])})"
-        )
-    return 0
+    report = recalibrate_semantic_manifests(
+        index_dirs,
+        workers=args.workers,
+        method=args.method,
+        progress_callback=_print_entry,
+    )
+    print(
+        f"total: {len(report['indexes'])} indices ({report['failed']} com erro) "
+        f"| workers={report['workers']} | {report['elapsedMs'] / 1000:.2f}s"
+    )
+    return 1 if report["failed"] else 0
 
 
 if __name__ == "__main__":
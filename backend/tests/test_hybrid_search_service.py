@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from backend.functions import hybrid_search_service
+from backend.functions.hybrid_search_service import fuse_hybrid_rankings, search_hybrid_index_async
+
+
+def _semantic_match(row: int, score: float) -> dict:
+    return {
+        "book": "LO",
+        "index_id": "lo",
+        "index_label": "LO",
+        "row": row,
+        "text": f"semantic {row}",
+        "metadata": {},
+        "score": score,
+        "semantic_score": score,
+        "alignment_score": 0.0,
+    }
+
+
+def _lexical_match(row: int) -> dict:
+    return {
+        "book": "LO",
+        "book_label": "Lexico de Ortopensatas",
+        "file_stem": "LO",
+        "row": row,
+        "number": row,
+        "title": "Recin",
+        "text": f"lexical {row}",
+        "pagina": "",
+        "data": {},
+    }
+
+
+class HybridSearchServiceTests(unittest.TestCase):
+    def test_rrf_promotes_rows_found_by_both_engines(self) -> None:
+        fused = fuse_hybrid_rankings(
+            [_lexical_match(30), _lexical_match(20)],
+            [_semantic_match(10, 0.9), _semantic_match(20, 0.8), _semantic_match(20, 0.7)],
+            index_id="lo",
+            index_label="LO",
+            limit=5,
+        )
+
+        self.assertEqual([item["row"] for item in fused], [20, 10, 30])
+        self.assertEqual(fused[0]["sources"], ["lexical", "semantic"])
+        self.assertEqual((fused[0]["lexical_rank"], fused[0]["semantic_rank"]), (2, 2))
+        self.assertEqual(fused[2]["metadata"], {"title": "Recin", "number": 30})
+        self.assertIsNone(fused[2]["semantic_score"])
+
+    def test_weighted_fusion_respects_semantic_weight(self) -> None:
+        lexical = [_lexical_match(30)]
+        semantic = [_semantic_match(10, 0.6)]
+
+        semantic_first = fuse_hybrid_rankings(lexical, semantic, index_id="lo", index_label="LO", limit=2, fusion="weighted", semantic_weight=0.9)
+        lexical_first = fuse_hybrid_rankings(lexical, semantic, index_id="lo", index_label="LO", limit=2, fusion="weighted", semantic_weight=0.1)
+
+        self.assertEqual([item["row"] for item in semantic_first], [10, 30])
+        self.assertEqual([item["row"] for item in lexical_first], [30, 10])
+        with self.assertRaises(ValueError):
+            fuse_hybrid_rankings(lexical, semantic, index_id="lo", index_label="LO", limit=2, fusion="desconhecido")
+
+    def test_hybrid_search_runs_both_engines_with_lexical_duplicates_kept(self) -> None:
+        calls: dict = {}
+
+        def fake_lexical(**kwargs):
+            calls["lexical"] = kwargs
+            return 1, [_lexical_match(10)]
+
+        async def fake_semantic(index_id, query, limit, api_key, **kwargs):
+            calls["semantic"] = {"index_id": index_id, "limit": limit, **kwargs}
+            return 1, 0, 0.6, 0.6, {"usedRagContext": False}, [_semantic_match(10, 0.9)]
+
+        with patch.object(hybrid_search_service, "_iter_lexical_excel_files", return_value=[Path("LO.xlsx")]), patch.object(
+            hybrid_search_service, "_search_lexical_source_internal", side_effect=fake_lexical
+        ), patch.object(hybrid_search_service, "search_semantic_index_async", side_effect=fake_semantic):
+            result = asyncio.run(search_hybrid_index_async("lo", "recin", 5, "key"))
+
+        self.assertEqual(calls["lexical"]["limit"], 20)
+        self.assertEqual(calls["semantic"]["limit"], 20)
+        self.assertFalse(calls["semantic"]["exclude_lexical_duplicates"])
+        self.assertEqual(result["lexical_total"], 1)
+        self.assertEqual(len(result["matches"]), 1)
+        self.assertEqual(result["matches"][0]["sources"], ["lexical", "semantic"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from backend.functions import semantic_search_service
+from backend.functions.semantic_benchmark import (
+    build_benchmark_queries,
+    build_synthetic_long_texts,
+    build_synthetic_rows,
+    run_chunking_benchmark,
+    run_semantic_benchmark,
+)
+
+
+class SemanticBenchmarkTests(unittest.TestCase):
+    def test_synthetic_corpus_and_queries_are_deterministic(self) -> None:
+        rows = build_synthetic_rows(120, seed=3)
+
+        self.assertEqual(rows, build_synthetic_rows(120, seed=3))
+        self.assertEqual([row["row"] for row in rows[:3]], [2, 3, 4])
+        queries = build_benchmark_queries(rows, 5, seed=3)
+        self.assertEqual(queries, build_benchmark_queries(rows, 5, seed=3))
+        self.assertTrue(all(len(query.split()) == 4 for query in queries))
+
+    def test_benchmark_reports_recall_latency_and_memory_per_mode(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # A pasta "live" fica vazia: o overview so encontra o indice se o benchmark passar a pasta explicitamente.
+            live_dir = Path(tmp_dir) / "live"
+            output_path = Path(tmp_dir) / "report.json"
+            with patch.object(semantic_search_service, "SEMANTIC_DIR", live_dir):
+                report = run_semantic_benchmark(
+                    Path(tmp_dir) / "work",
+                    rows=300,
+                    dimensions=64,
+                    queries=5,
+                    k=5,
+                    shard_rows=100,
+                    output_path=output_path,
+                )
+                self.assertEqual(semantic_search_service.SEMANTIC_DIR, live_dir)
+            stored = json.loads(output_path.read_text(encoding="utf-8"))
+
+        self.assertEqual(stored["config"]["rows"], 300)
+        self.assertEqual(sorted(report["modes"]), ["dense", "sharded"])
+        self.assertEqual(report["modes"]["sharded"]["embeddingShards"], 3)
+        for mode_report in report["modes"].values():
+            self.assertEqual(mode_report["rows"], 300)
+            for path_name in ("scoreMatches", "overview"):
+                stats = mode_report[path_name]
+                self.assertGreater(stats["recallAtK"], 0.0)
+                self.assertLessEqual(stats["recallAtK"], 1.0)
+                self.assertLessEqual(stats["latencyMs"]["p50"], stats["latencyMs"]["p95"])
+                self.assertGreaterEqual(stats["peakTracedBytes"], 0)
+
+    def test_chunking_benchmark_compares_reference_and_linear_chunkers(self) -> None:
+        texts = build_synthetic_long_texts(200, seed=1)
+
+        report = run_chunking_benchmark(texts, repeats=1)
+
+        self.assertEqual(report["config"]["texts"], 4)
+        self.assertEqual(report["identicalTexts"], 4)
+        self.assertEqual(report["reference"]["chunks"], report["linear"]["chunks"])
+        self.assertGreater(report["linear"]["chunks"], len(texts))
+
+
+if __name__ == "__main__":
+    unittest.main()
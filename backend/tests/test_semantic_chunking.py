@@ -1,6 +1,13 @@
 import unittest
 
-from backend.functions.semantic_chunking import chunk_semantic_text, rechunk_semantic_rows
+from backend.functions.semantic_chunking import (
+    approximate_token_count,
+    chunk_semantic_text,
+    chunk_semantic_text_linear,
+    iter_rechunked_semantic_rows,
+    rechunk_semantic_rows,
+    resolve_chunk_measure,
+)
 
 
 class SemanticChunkingTests(unittest.TestCase):
@@ -49,6 +56,80 @@ class SemanticChunkingTests(unittest.TestCase):
         self.assertTrue(all(row["metadata"]["chunk_total"] == len(rebuilt) for row in rebuilt))
         self.assertEqual([row["metadata"]["chunk_index"] for row in rebuilt], list(range(1, len(rebuilt) + 1)))
 
+    def test_iter_rechunked_semantic_rows_consumes_source_lazily(self) -> None:
+        consumed: list[int] = []
+
+        def _rows():
+            for row in (2, 3, 4):
+                consumed.append(row)
+                yield {"row": row, "text": f"Texto curto {row}.", "metadata": {}}
+
+        chunks = iter_rechunked_semantic_rows(_rows(), index_label="LO")
+
+        first = next(chunks)
+        self.assertEqual(first["row"], 2)
+        self.assertEqual(first["embedding_text"], "LO | Texto curto 2.")
+        self.assertEqual(consumed, [2])
+        self.assertEqual([chunk["row"] for chunk in chunks], [3, 4])
+
+    def test_chunk_semantic_text_linear_matches_reference_chunker(self) -> None:
+        texts = [
+            "Frase curta. " * 80,
+            "Invexis, recin, tenepes, gescon, proexis, holopensene, " * 30,
+            "palavra " * 300,
+            "Bloco inicial com ideia completa.\n\n\nSegundo bloco | terceiro bloco \u2022 quarto " * 12,
+            "a" * 900,
+            "Texto curto.",
+            "",
+        ]
+
+        for text in texts:
+            self.assertEqual(chunk_semantic_text_linear(text), chunk_semantic_text(text))
+            self.assertEqual(
+                chunk_semantic_text_linear(text, target_chars=60, max_chars=90, min_chars=20),
+                chunk_semantic_text(text, target_chars=60, max_chars=90, min_chars=20),
+            )
+
+    def test_chunk_semantic_text_linear_limits_chunks_in_tokens(self) -> None:
+        text = "A recin exige autocriticidade, mudanca intraconsciencial e constancia assistencial. " * 20
+        measure = resolve_chunk_measure("approx")
+
+        chunks = chunk_semantic_text_linear(text, target_chars=40, max_chars=60, min_chars=15, measure=measure)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(approximate_token_count(chunk) <= 60 for chunk in chunks))
+        self.assertEqual(" ".join(chunks).split(), text.split())
+
+    def test_resolve_chunk_measure_rejects_unknown_tokenizer(self) -> None:
+        self.assertIsNone(resolve_chunk_measure(None))
+        self.assertIsNone(resolve_chunk_measure("chars"))
+        with self.assertRaises(ValueError):
+            resolve_chunk_measure("sentencepiece")
+
+    def test_rechunk_semantic_rows_parallel_matches_serial_order(self) -> None:
+        rows = [
+            {
+                "row": row,
+                "text": f"Linha {row} sobre invexis e recin. " * (1 + row % 7),
+                "metadata": {"title": f"Verbete {row}"},
+            }
+            for row in range(2, 62)
+        ]
+
+        serial = rechunk_semantic_rows(rows, index_label="EC", target_chars=60, max_chars=90, min_chars=20)
+        parallel = rechunk_semantic_rows(
+            rows,
+            index_label="EC",
+            target_chars=60,
+            max_chars=90,
+            min_chars=20,
+            workers=2,
+            batch_rows=7,
+        )
+
+        self.assertGreater(len(serial), len(rows))
+        self.assertEqual(parallel, serial)
+
 
 if __name__ == "__main__":
     unittest.main()
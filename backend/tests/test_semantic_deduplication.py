@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+
+from backend.functions.semantic_deduplication import apply_near_duplicate_links, find_near_duplicates
+
+
+class SemanticDeduplicationTests(unittest.TestCase):
+    def _embeddings(self) -> np.ndarray:
+        vectors = np.asarray(
+            [
+                [1.0, 0.0, 0.0],
+                [0.0, 1.0, 0.0],
+                [0.999, 0.01, 0.0],
+                [0.0, 0.0, 1.0],
+                [0.0, 1.0, 0.001],
+                [1.0, 0.0, 0.0],
+            ],
+            dtype=np.float32,
+        )
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def test_find_near_duplicates_links_to_first_canonical_row_across_blocks(self) -> None:
+        embeddings = self._embeddings()
+
+        expected = [0, 1, 0, 3, 1, 0]
+        for block_rows in (1, 2, 4, 16):
+            self.assertEqual(find_near_duplicates(embeddings, 0.99, block_rows=block_rows).tolist(), expected)
+        self.assertEqual(find_near_duplicates(embeddings, 1.01).tolist(), list(range(6)))
+
+    def test_apply_near_duplicate_links_keeps_canonical_rows_with_links(self) -> None:
+        rows = [{"row": position + 2, "text": f"t{position}", "metadata": {"title": "T"}} for position in range(6)]
+        canonical = find_near_duplicates(self._embeddings(), 0.99)
+
+        kept_rows, keep = apply_near_duplicate_links(rows, canonical)
+
+        self.assertEqual(keep.tolist(), [True, True, False, True, False, False])
+        self.assertEqual([row["row"] for row in kept_rows], [2, 3, 5])
+        self.assertEqual(kept_rows[0]["metadata"], {"title": "T", "duplicate_rows": [4, 7]})
+        self.assertEqual(kept_rows[1]["metadata"]["duplicate_rows"], [6])
+        self.assertNotIn("duplicate_rows", kept_rows[2]["metadata"])
+        self.assertNotIn("duplicate_rows", rows[0]["metadata"])
+
+
+if __name__ == "__main__":
+    unittest.main()
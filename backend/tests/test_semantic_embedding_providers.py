@@ -0,0 +1,92 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+from backend.functions.semantic_embedding_providers import (
+    EmbeddingRequestError,
+    OpenAIEmbeddingProvider,
+    StubEmbeddingProvider,
+    get_embedding_provider,
+    manifest_embedding_provider,
+    normalize_embedding_provider,
+    parse_retry_after,
+)
+from backend.functions.semantic_search_service import (
+    _aembed_query_texts,
+    _get_semantic_query_vector,
+    semantic_search_requires_openai_key,
+)
+
+
+class SemanticEmbeddingProvidersTests(unittest.TestCase):
+    def test_stub_provider_is_deterministic_and_token_based(self) -> None:
+        provider = StubEmbeddingProvider(model="stub-hash-64")
+
+        first = provider.embed(["Tenepes e recin", "tenepes   E recin!", "gescon"])
+        second = provider.embed(["Tenepes e recin"])
+
+        self.assertEqual(first.shape, (3, 64))
+        np.testing.assert_array_equal(first[0], second[0])
+        np.testing.assert_array_equal(first[0], first[1])
+        self.assertFalse(np.array_equal(first[0], first[2]))
+
+    def test_provider_resolution_defaults_to_openai(self) -> None:
+        self.assertEqual(manifest_embedding_provider({"model": "text-embedding-3-small"}), "openai")
+        self.assertEqual(manifest_embedding_provider({"embedding_provider": "Stub"}), "stub")
+        self.assertIsInstance(get_embedding_provider(None, api_key="key"), OpenAIEmbeddingProvider)
+        with self.assertRaises(ValueError):
+            normalize_embedding_provider("desconhecido")
+
+    def test_query_vector_uses_stub_provider_without_network(self) -> None:
+        cache: dict = {}
+
+        vector = _get_semantic_query_vector(
+            "tenepes",
+            api_key="",
+            model="stub-hash-32",
+            cache=cache,
+            provider="stub",
+        )
+
+        self.assertEqual(vector.shape, (32,))
+        self.assertAlmostEqual(float(np.linalg.norm(vector)), 1.0, places=5)
+        self.assertTrue(all(key.startswith("stub:stub-hash-32") for key in cache))
+
+    def test_async_query_embedding_goes_through_provider(self) -> None:
+        vectors = asyncio.run(_aembed_query_texts(["tenepes", "gescon"], api_key="", model="stub-hash-16", provider="stub"))
+
+        np.testing.assert_array_equal(vectors, StubEmbeddingProvider(model="stub-hash-16").embed(["tenepes", "gescon"]))
+
+    def test_openai_key_is_required_only_for_openai_indexes_or_rag(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            for index_id, provider in (("lo", "stub"), ("dac", "openai")):
+                (root / index_id).mkdir()
+                (root / index_id / "manifest.json").write_text(json.dumps({"embedding_provider": provider}), encoding="utf-8")
+
+            with patch("backend.functions.semantic_search_service.SEMANTIC_DIR", root):
+                self.assertFalse(semantic_search_requires_openai_key(["LO"]))
+                self.assertTrue(semantic_search_requires_openai_key(["lo"], use_rag_context=True))
+                self.assertTrue(semantic_search_requires_openai_key(["dac"]))
+                self.assertTrue(semantic_search_requires_openai_key())
+
+    def test_parse_retry_after_reads_openai_rate_limit_headers(self) -> None:
+        self.assertEqual(parse_retry_after({"retry-after": "3"}), 3.0)
+        self.assertEqual(parse_retry_after({"retry-after-ms": "250"}), 0.25)
+        self.assertEqual(
+            parse_retry_after({"x-ratelimit-reset-requests": "120ms", "x-ratelimit-reset-tokens": "1m2.5s"}),
+            62.5,
+        )
+        self.assertIsNone(parse_retry_after({}))
+        self.assertTrue(EmbeddingRequestError("x", status_code=429).retryable)
+        self.assertTrue(EmbeddingRequestError("x").retryable)
+        self.assertFalse(EmbeddingRequestError("x", status_code=400).retryable)
+
+
+if __name__ == "__main__":
+    unittest.main()
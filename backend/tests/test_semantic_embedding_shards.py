@@ -0,0 +1,202 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+from backend.functions import semantic_embedding_shards, semantic_search_service
+from backend.functions.semantic_embedding_shards import ShardedEmbeddings, split_embedding_shards
+from backend.functions.semantic_index_builder import rebuild_semantic_index
+from backend.functions.semantic_index_calibration import load_embeddings_for_calibration
+
+
+class SemanticEmbeddingShardsTests(unittest.TestCase):
+    def test_sharded_map_scores_and_gather_match_dense_matrix(self) -> None:
+        rng = np.random.default_rng(7)
+        dense = rng.standard_normal((11, 6)).astype(np.float16)
+        sharded = ShardedEmbeddings(split_embedding_shards(dense, 4), max_workers=3)
+        query_vector = rng.standard_normal(6).astype(np.float32)
+        query_matrix = rng.standard_normal((6, 3)).astype(np.float32)
+
+        self.assertEqual(sharded.shape, (11, 6))
+        self.assertEqual(sharded.shard_count, 3)
+        vector_parts = sharded.map_scores(query_vector, lambda start, scores: (start, scores))
+        self.assertEqual([start for start, _ in vector_parts], [0, 4, 8])
+        np.testing.assert_allclose(np.concatenate([scores for _, scores in vector_parts]), dense @ query_vector, rtol=1e-5)
+        sampled = sharded.map_scores(query_matrix, lambda start, scores: (start, scores), row_step=3)
+        self.assertEqual([start for start, _ in sampled], [0, 6, 9])
+        np.testing.assert_allclose(np.concatenate([scores for _, scores in sampled]), (dense @ query_matrix)[::3], rtol=1e-5)
+        with self.assertRaises(TypeError):
+            sharded @ query_vector
+        with self.assertRaises(TypeError):
+            query_matrix.T @ sharded
+        np.testing.assert_array_equal(sharded[np.array([10, 0, 5, -1])], dense[[10, 0, 5, -1]])
+        np.testing.assert_array_equal(sharded[4], dense[4])
+
+    def test_sharded_top_k_merges_shard_candidates_without_full_score_vector(self) -> None:
+        rng = np.random.default_rng(11)
+        dense = rng.standard_normal((103, 8)).astype(np.float16)
+        sharded = ShardedEmbeddings(split_embedding_shards(dense, 10), max_workers=3)
+        query_vector = rng.standard_normal(8).astype(np.float32)
+        dense_scores = dense @ query_vector
+        excluded = set(range(0, 103, 7))
+
+        positions, scores, eligible, dropped = sharded.top_k(
+            query_vector,
+            5,
+            min_score=0.5,
+            exclude=lambda rows: np.isin(rows, list(excluded)),
+        )
+
+        above = np.flatnonzero(dense_scores >= np.float32(0.5))
+        kept = np.array([row for row in above if row not in excluded])
+        expected = kept[np.lexsort((kept, -dense_scores[kept]))][:5]
+        np.testing.assert_array_equal(positions, expected)
+        np.testing.assert_allclose(scores, dense_scores[expected], rtol=1e-5)
+        self.assertEqual(eligible, kept.size)
+        self.assertEqual(dropped, above.size - kept.size)
+
+    def test_sharded_top_k_reduces_variant_columns_and_reuses_module_executor(self) -> None:
+        rng = np.random.default_rng(13)
+        dense = rng.standard_normal((57, 8)).astype(np.float16)
+        sharded = ShardedEmbeddings(split_embedding_shards(dense, 10), max_workers=3)
+        query_matrix = rng.standard_normal((8, 3)).astype(np.float32)
+        dense_scores = (dense @ query_matrix).max(axis=1)
+
+        positions, scores, eligible, _ = sharded.top_k(query_matrix, 4, reduce=lambda variant_scores: variant_scores.max(axis=1))
+        executor = semantic_embedding_shards._SHARD_EXECUTOR
+        all_positions, _, _, _ = sharded.top_k(query_matrix, None, min_score=0.5, reduce=lambda variant_scores: variant_scores.max(axis=1))
+
+        expected = np.lexsort((np.arange(57), -dense_scores))[:4]
+        np.testing.assert_array_equal(positions, expected)
+        np.testing.assert_allclose(scores, dense_scores[expected], rtol=1e-5)
+        self.assertEqual(eligible, 57)
+        self.assertEqual(sorted(all_positions.tolist()), np.flatnonzero(dense_scores >= np.float32(0.5)).tolist())
+        self.assertIsNotNone(executor)
+        self.assertIs(semantic_embedding_shards._SHARD_EXECUTOR, executor)
+        with self.assertRaises(ValueError):
+            sharded.top_k(query_matrix, 4)
+
+    def test_sharded_adaptive_collapsed_and_max_scoring_match_dense_embeddings(self) -> None:
+        rng = np.random.default_rng(17)
+        dense = rng.standard_normal((200, 32)).astype(np.float32)
+        # Um grupo de linhas proximas da query destaca a cauda que os cortes adaptativos isolam.
+        dense[20:28] = dense[5] + 0.4 * dense[20:28]
+        dense /= np.linalg.norm(dense, axis=1, keepdims=True)
+        dense = dense.astype(np.float16)
+        texts = [f"texto {row} {'gescon' if row % 4 == 0 else 'recin'}" for row in range(200)]
+        metadata = [{"row": row // 3 + 1, "text": text, "text_plain": text, "metadata": {}} for row, text in enumerate(texts)]
+        source_groups = np.arange(200, dtype=np.int32) // 3
+        query_matrix = semantic_search_service._variant_query_matrix(dense[[5, 40]].astype(np.float32))
+        weights = np.array([1.0, 0.5], dtype=np.float32)
+        sharded = ShardedEmbeddings(split_embedding_shards(dense, 16), max_workers=2)
+        cases = [
+            {"score_cutoff": "zscore"},
+            {"score_cutoff": "knee"},
+            {"collapse_chunks": True},
+            {"score_cutoff": "knee", "collapse_chunks": True, "query_scoring": "weighted_max"},
+            {"query_scoring": "max"},
+        ]
+        for case in cases:
+            options = dict(case)
+            query_scoring = options.pop("query_scoring", "average")
+            results = []
+            for embeddings in (dense, sharded):
+                query = query_matrix[:, 0]
+                scores, offset, reduce = None, 0.0, None
+                if query_scoring != "average":
+                    scores, offset, reduce = semantic_search_service._variant_scoring(embeddings, query_matrix, weights, query_scoring)
+                    query = query_matrix if reduce is not None else query
+                results.append((offset, semantic_search_service._score_matches(
+                    metadata,
+                    embeddings,
+                    texts,
+                    query,
+                    "delta",
+                    "DELTA",
+                    limit=6,
+                    min_score=0.05 + offset,
+                    exclude_lexical_duplicates=True,
+                    lexical_query="gescon",
+                    scores=scores,
+                    source_groups=source_groups,
+                    score_reduce=reduce,
+                    **options,
+                )))
+
+            (dense_offset, dense_result), (sharded_offset, sharded_result) = results
+            with self.subTest(case=case):
+                self.assertGreater(dense_result["total_found"], 0)
+                self.assertAlmostEqual(sharded_offset, dense_offset, places=5)
+                self.assertAlmostEqual(sharded_result["applied_min_score"], dense_result["applied_min_score"], places=5)
+                self.assertEqual(sharded_result["total_found"], dense_result["total_found"])
+                self.assertEqual(sharded_result["lexical_filtered_count"], dense_result["lexical_filtered_count"])
+                self.assertEqual(
+                    [(match["row"], match.get("sibling_hits")) for match in sharded_result["matches"]],
+                    [(match["row"], match.get("sibling_hits")) for match in dense_result["matches"]],
+                )
+
+    def test_sharded_score_matches_agree_with_dense_embeddings(self) -> None:
+        rng = np.random.default_rng(5)
+        dense = rng.standard_normal((60, 8)).astype(np.float32)
+        dense /= np.linalg.norm(dense, axis=1, keepdims=True)
+        texts = [f"texto {row} {'gescon' if row % 3 == 0 else 'recin'}" for row in range(60)]
+        metadata = [{"row": row + 1, "text": text, "text_plain": text, "metadata": {}} for row, text in enumerate(texts)]
+        query_vector = dense[9]
+        results = []
+        for embeddings in (dense.astype(np.float16), ShardedEmbeddings(split_embedding_shards(dense.astype(np.float16), 16), max_workers=2)):
+            results.append(semantic_search_service._score_matches(
+                metadata,
+                embeddings,
+                texts,
+                query_vector,
+                "delta",
+                "DELTA",
+                limit=5,
+                min_score=0.1,
+                exclude_lexical_duplicates=True,
+                lexical_query="gescon",
+            ))
+
+        dense_result, sharded_result = results
+        self.assertGreater(dense_result["lexical_filtered_count"], 0)
+        self.assertEqual(sharded_result["total_found"], dense_result["total_found"])
+        self.assertEqual(sharded_result["lexical_filtered_count"], dense_result["lexical_filtered_count"])
+        self.assertEqual([match["row"] for match in sharded_result["matches"]], [match["row"] for match in dense_result["matches"]])
+
+    def test_rebuild_with_shard_rows_writes_shards_and_search_streams_them(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            semantic_dir = Path(tmp_dir)
+            index_dir = semantic_dir / "delta"
+            index_dir.mkdir()
+            (index_dir / "manifest.json").write_text(json.dumps({"index_label": "DELTA"}), encoding="utf-8")
+            (index_dir / "metadata.json").write_text(json.dumps([
+                {"row": 2, "text": "Tenepes diaria", "text_plain": "Tenepes diaria", "metadata": {}},
+                {"row": 3, "text": "Recin continua", "text_plain": "Recin continua", "metadata": {}},
+                {"row": 4, "text": "Gescon escrita", "text_plain": "Gescon escrita", "metadata": {}},
+            ]), encoding="utf-8")
+            np.save(index_dir / "embeddings.npy", np.zeros((3, 4), dtype=np.float16))
+
+            result = rebuild_semantic_index(index_dir, api_key="", provider="stub", shard_rows=2)
+
+            manifest = json.loads((index_dir / "manifest.json").read_text(encoding="utf-8"))
+            self.assertEqual(result["embedding_shards"], 2)
+            self.assertEqual([item["rows"] for item in manifest["embedding_shards"]["files"]], [2, 1])
+            self.assertFalse((index_dir / "embeddings.npy").exists())
+            self.assertIsInstance(load_embeddings_for_calibration(index_dir), ShardedEmbeddings)
+
+            with patch.object(semantic_search_service, "SEMANTIC_DIR", semantic_dir):
+                semantic_search_service._SEMANTIC_INDEX_CACHE.pop("delta", None)
+                semantic_search_service.clear_semantic_result_cache()
+                _, _, _, _, _, matches = semantic_search_service.search_semantic_index(
+                    "delta", "gescon escrita", limit=1, api_key="", min_score=0.0, exclude_lexical_duplicates=False,
+                )
+                semantic_search_service._SEMANTIC_INDEX_CACHE.pop("delta", None)
+
+            self.assertEqual(matches[0]["row"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 import json
 import tempfile
+import threading
 import unittest
 from pathlib import Path
 from unittest.mock import patch
@@ -7,7 +8,10 @@ from unittest.mock import patch
 import numpy as np
 import openpyxl  # type: ignore
 
+from backend.functions import semantic_index_builder as builder
+from backend.functions.semantic_embedding_providers import EmbeddingRequestError, StubEmbeddingProvider
 from backend.functions.semantic_index_builder import rebuild_semantic_index
+from backend.functions.semantic_metadata_store import SemanticMetadataStore
 
 
 class SemanticIndexBuilderTests(unittest.TestCase):
@@ -48,12 +52,16 @@ class SemanticIndexBuilderTests(unittest.TestCase):
             result = rebuild_semantic_index(index_dir, api_key="key")
 
             self.assertEqual(result["rebuild_basis"], "source_file")
+            self.assertEqual(result["rows_before"], 1)
             self.assertIsNone(result["warning"])
             rebuilt_manifest = json.loads((index_dir / "manifest.json").read_text(encoding="utf-8"))
             rebuilt_metadata = json.loads((index_dir / "metadata.json").read_text(encoding="utf-8"))
             self.assertEqual(rebuilt_manifest["rebuild_basis"], "source_file")
             self.assertEqual(rebuilt_metadata[0]["text_plain"], "Texto de origem para rebuild semantico.")
             self.assertEqual(rebuilt_metadata[0]["metadata"]["title"], "Titulo 1")
+            self.assertEqual(rebuilt_manifest["metadata_store"]["version"], 2)
+            store = SemanticMetadataStore.open(index_dir)
+            self.assertEqual(store[0], rebuilt_metadata[0])
 
     @patch("backend.functions.semantic_index_builder._embed_rows")
     def test_rebuild_accepts_repo_relative_source_file(self, mock_embed_rows) -> None:
@@ -76,11 +84,19 @@ class SemanticIndexBuilderTests(unittest.TestCase):
             })
             self._write_metadata(index_dir, [{"row": 2, "text": "Snapshot antigo", "text_plain": "Snapshot antigo", "metadata": {"title": "Old"}}])
 
-            result = rebuild_semantic_index(index_dir, api_key="key")
+            result = rebuild_semantic_index(index_dir, api_key="key", write_metadata_json=False)
 
             self.assertEqual(result["rebuild_basis"], "source_file")
-            rebuilt_metadata = json.loads((index_dir / "metadata.json").read_text(encoding="utf-8"))
+            rebuilt_metadata = list(SemanticMetadataStore.open(index_dir))
             self.assertEqual(rebuilt_metadata[0]["text_plain"], "Texto de origem para rebuild semantico.")
+            self.assertFalse((index_dir / "metadata.json").exists())
+
+            source_path.unlink()
+            snapshot = rebuild_semantic_index(index_dir, api_key="key")
+
+            self.assertEqual(snapshot["rebuild_basis"], "metadata_snapshot")
+            self.assertIn("metadata store", snapshot["warning"])
+            self.assertEqual(list(SemanticMetadataStore.open(index_dir))[0]["text_plain"], "Texto de origem para rebuild semantico.")
 
     @patch("backend.functions.semantic_index_builder._embed_rows")
     def test_rebuild_falls_back_to_metadata_snapshot_when_source_file_is_missing(self, mock_embed_rows) -> None:
@@ -108,5 +124,207 @@ class SemanticIndexBuilderTests(unittest.TestCase):
             self.assertEqual(rebuilt_manifest["rebuild_basis"], "metadata_snapshot")
 
 
+    def test_rebuild_with_stub_provider_records_provider_in_manifest(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir) / "delta"
+            index_dir.mkdir(parents=True, exist_ok=True)
+            self._write_manifest(index_dir, {
+                "index_label": "DELTA",
+                "model": "text-embedding-3-small",
+            })
+            self._write_metadata(index_dir, [
+                {"row": 2, "text": "Tenepes diaria", "text_plain": "Tenepes diaria", "metadata": {}},
+                {"row": 3, "text": "Recin continua", "text_plain": "Recin continua", "metadata": {}},
+            ])
+
+            result = rebuild_semantic_index(index_dir, api_key="", provider="stub")
+
+            rebuilt_manifest = json.loads((index_dir / "manifest.json").read_text(encoding="utf-8"))
+            embeddings = np.load(index_dir / "embeddings.npy")
+            self.assertEqual(result["embedding_provider"], "stub")
+            self.assertEqual(rebuilt_manifest["embedding_provider"], "stub")
+            self.assertEqual(rebuilt_manifest["model"], "stub-hash-256")
+            self.assertEqual(embeddings.shape, (2, 256))
+
+    def test_rebuild_with_dedupe_threshold_links_duplicate_rows(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir) / "epsilon"
+            index_dir.mkdir(parents=True, exist_ok=True)
+            self._write_manifest(index_dir, {"index_label": "EPSILON"})
+            self._write_metadata(index_dir, [
+                {"row": 2, "text": "Pensata repetida sobre tenepes.", "text_plain": "Pensata repetida sobre tenepes.", "metadata": {}},
+                {"row": 3, "text": "Recin continua.", "text_plain": "Recin continua.", "metadata": {}},
+                {"row": 4, "text": "Pensata repetida sobre tenepes.", "text_plain": "Pensata repetida sobre tenepes.", "metadata": {}},
+            ])
+
+            result = rebuild_semantic_index(index_dir, api_key="", provider="stub", dedupe_threshold=0.99)
+
+            rebuilt_manifest = json.loads((index_dir / "manifest.json").read_text(encoding="utf-8"))
+            rebuilt_metadata = list(SemanticMetadataStore.open(index_dir))
+            self.assertEqual(result["duplicates_removed"], 1)
+            self.assertEqual(rebuilt_manifest["deduplication"]["removedChunks"], 1)
+            self.assertEqual(np.load(index_dir / "embeddings.npy").shape[0], 2)
+            self.assertEqual([row["row"] for row in rebuilt_metadata], [2, 3])
+            self.assertEqual(rebuilt_metadata[0]["metadata"]["duplicate_rows"], [4])
+            self.assertEqual(SemanticMetadataStore.open(index_dir)[0]["metadata"]["duplicate_rows"], [4])
+
+    def test_rebuild_reads_dedupe_and_calibration_from_checkpoint_memmap(self) -> None:
+        rows = [
+            {"row": 2, "text": "Pensata repetida sobre tenepes.", "text_plain": "Pensata repetida sobre tenepes.", "metadata": {}},
+            {"row": 3, "text": "Recin continua.", "text_plain": "Recin continua.", "metadata": {}},
+            {"row": 4, "text": "Pensata repetida sobre tenepes.", "text_plain": "Pensata repetida sobre tenepes.", "metadata": {}},
+            {"row": 5, "text": "Gescon escrita.", "text_plain": "Gescon escrita.", "metadata": {}},
+        ]
+        outputs = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for resume in (True, False):
+                index_dir = Path(tmp_dir) / f"eta-{resume}"
+                index_dir.mkdir(parents=True, exist_ok=True)
+                self._write_manifest(index_dir, {"index_label": "ETA"})
+                self._write_metadata(index_dir, rows)
+                with patch("backend.functions.semantic_index_builder.compute_similarity_stats", wraps=builder.compute_similarity_stats) as stats:
+                    result = rebuild_semantic_index(
+                        index_dir, api_key="", provider="stub", dedupe_threshold=0.99, shard_rows=2, resume=resume,
+                    )
+                calibrated = stats.call_args.args[0]
+                if resume:
+                    self.assertIsInstance(calibrated, builder._RowSelection)
+                    self.assertIsInstance(calibrated._matrix, np.memmap)
+                    self.assertFalse((index_dir / builder.REBUILD_CHECKPOINT_DIR).exists())
+                shards = sorted((index_dir / "embedding_shards").glob("*.npy"))
+                outputs[resume] = (
+                    result["recommended_min_score"],
+                    np.vstack([np.load(path) for path in shards]),
+                    np.load(index_dir / "chunk_embeddings.npy"),
+                )
+
+        self.assertEqual(outputs[True][0], outputs[False][0])
+        self.assertEqual(outputs[True][1].shape, (3, 256))
+        self.assertEqual(outputs[True][1].dtype, np.float16)
+        np.testing.assert_array_equal(outputs[True][1], outputs[False][1])
+        np.testing.assert_array_equal(outputs[True][2], outputs[False][2])
+        self.assertEqual(outputs[True][2].dtype, np.float16)
+
+    def test_rebuild_reuses_stored_chunk_embeddings(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir) / "zeta"
+            index_dir.mkdir(parents=True, exist_ok=True)
+            self._write_manifest(index_dir, {"index_label": "ZETA"})
+            rows = [
+                {"row": 2, "text": "Tenepes diaria.", "text_plain": "Tenepes diaria.", "metadata": {}},
+                {"row": 3, "text": "Recin continua.", "text_plain": "Recin continua.", "metadata": {}},
+            ]
+            self._write_metadata(index_dir, rows)
+            first = rebuild_semantic_index(index_dir, api_key="", provider="stub")
+            first_embeddings = np.load(index_dir / "embeddings.npy")
+
+            self._write_metadata(index_dir, rows + [{"row": 4, "text": "Proexis nova.", "text_plain": "Proexis nova.", "metadata": {}}])
+            with patch("backend.functions.semantic_index_builder._embed_rows", wraps=builder._embed_rows) as embed_rows:
+                second = rebuild_semantic_index(index_dir, api_key="", provider="stub")
+
+            self.assertEqual((first["embeddings_computed"], first["embeddings_reused"]), (2, 0))
+            self.assertEqual((second["embeddings_computed"], second["embeddings_reused"]), (1, 2))
+            self.assertEqual([row["row"] for row in embed_rows.call_args.args[0]], [4])
+            np.testing.assert_array_equal(np.load(index_dir / "embeddings.npy")[:2], first_embeddings)
+            self.assertEqual(np.load(index_dir / "chunk_embedding_keys.npy").shape, (3,))
+
+            full = rebuild_semantic_index(index_dir, api_key="", provider="stub", reuse_embeddings=False)
+            self.assertEqual(full["embeddings_reused"], 0)
+
+    def test_plan_embedding_batches_respects_size_and_token_budget(self) -> None:
+        texts = ["a" * 40, "b" * 40, "c" * 400, "d", "e", "f"]
+
+        self.assertEqual(builder._plan_embedding_batches(texts, 2, 10_000), [(0, 2), (2, 4), (4, 6)])
+        self.assertEqual(builder._plan_embedding_batches(texts, 10, 30), [(0, 2), (2, 3), (3, 6)])
+
+    @patch("backend.functions.semantic_index_builder.time.sleep")
+    def test_embed_rows_retries_failed_batches_concurrently_in_order(self, _sleep) -> None:
+        class FlakyProvider:
+            name = "stub"
+            model = "stub-hash-8"
+
+            def __init__(self) -> None:
+                self.calls: list[str] = []
+                self.lock = threading.Lock()
+
+            def embed(self, texts: list[str]) -> np.ndarray:
+                with self.lock:
+                    self.calls.append(texts[0])
+                    failures = self.calls.count(texts[0])
+                if texts[0] == "t2" and failures == 1:
+                    raise EmbeddingRequestError("limite", status_code=429, retry_after=0.0)
+                if texts[0] == "t4" and failures == 1:
+                    raise EmbeddingRequestError("indisponivel", status_code=503)
+                return np.asarray([[float(text[1:]) + 1.0, 1.0] for text in texts], dtype=np.float32)
+
+        provider = FlakyProvider()
+        rows = [{"text": f"t{position}"} for position in range(6)]
+        with patch("backend.functions.semantic_index_builder.get_embedding_provider", return_value=provider):
+            embeddings = builder._embed_rows(rows, api_key="", model="stub-hash-8", batch_size=2, provider="stub", max_concurrency=3)
+
+        expected = builder._normalize_rows(np.asarray([[position + 1.0, 1.0] for position in range(6)], dtype=np.float32))
+        np.testing.assert_allclose(embeddings, expected)
+        self.assertEqual(sorted(provider.calls), ["t0", "t2", "t2", "t4", "t4"])
+
+    def test_embed_rows_does_not_retry_client_errors(self) -> None:
+        class BrokenProvider:
+            name = "stub"
+            model = "stub-hash-8"
+            calls = 0
+
+            def embed(self, texts: list[str]) -> np.ndarray:
+                BrokenProvider.calls += 1
+                raise EmbeddingRequestError("invalido", status_code=400)
+
+        with patch("backend.functions.semantic_index_builder.get_embedding_provider", return_value=BrokenProvider()):
+            with self.assertRaises(EmbeddingRequestError):
+                builder._embed_rows([{"text": "a"}], api_key="", model="stub-hash-8", provider="stub")
+        self.assertEqual(BrokenProvider.calls, 1)
+
+    def test_rebuild_resumes_embeddings_from_checkpoint(self) -> None:
+        stub = StubEmbeddingProvider(model="stub-hash-16")
+
+        class FailingProvider:
+            name = "stub"
+            model = "stub-hash-16"
+
+            def __init__(self, fail_on: str | None) -> None:
+                self.fail_on = fail_on
+                self.calls: list[str] = []
+
+            def embed(self, texts: list[str]) -> np.ndarray:
+                self.calls.extend(texts)
+                if self.fail_on is not None and any(self.fail_on in text for text in texts):
+                    raise EmbeddingRequestError("invalido", status_code=400)
+                return stub.embed(texts)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir) / "eta"
+            index_dir.mkdir(parents=True, exist_ok=True)
+            self._write_manifest(index_dir, {"index_label": "ETA"})
+            self._write_metadata(index_dir, [
+                {"row": position + 2, "text": f"Verbete {name}.", "text_plain": f"Verbete {name}.", "metadata": {}}
+                for position, name in enumerate(("alfa", "beta", "gama", "delta"))
+            ])
+            params = {"api_key": "", "provider": "stub", "model": "stub-hash-16", "batch_size": 1, "max_concurrency": 1}
+
+            failing = FailingProvider("gama")
+            with patch("backend.functions.semantic_index_builder.get_embedding_provider", return_value=failing):
+                with self.assertRaises(EmbeddingRequestError):
+                    rebuild_semantic_index(index_dir, **params)
+            checkpoint = json.loads((index_dir / ".rebuild_checkpoint" / "checkpoint.json").read_text(encoding="utf-8"))
+            self.assertEqual(checkpoint["completedBatches"], [0, 1])
+
+            resumed = FailingProvider(None)
+            with patch("backend.functions.semantic_index_builder.get_embedding_provider", return_value=resumed):
+                rebuild_semantic_index(index_dir, **params)
+
+            self.assertEqual(len(resumed.calls), 2)
+            self.assertTrue(all("gama" in text or "delta" in text for text in resumed.calls))
+            self.assertFalse((index_dir / ".rebuild_checkpoint").exists())
+            expected = builder._normalize_rows(stub.embed([f"ETA | Verbete {name}." for name in ("alfa", "beta", "gama", "delta")]))
+            np.testing.assert_allclose(np.load(index_dir / "embeddings.npy"), expected.astype(np.float16), atol=1e-3)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,8 +1,24 @@
 import unittest
+from unittest.mock import patch
 
 import numpy as np
 
-from backend.functions.semantic_index_calibration import compute_similarity_stats, recommend_min_score
+from backend.functions.semantic_embedding_shards import ShardedEmbeddings
+from backend.functions.semantic_index_calibration import (
+    CALIBRATION_HISTOGRAM_BINS,
+    build_calibration_payload,
+    compute_similarity_stats,
+    recommend_min_score,
+)
+
+
+def _normalized_embeddings(rows: int, dimensions: int, seed: int = 0) -> np.ndarray:
+    embeddings = np.random.default_rng(seed).normal(size=(rows, dimensions)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def _all_pair_similarities(embeddings: np.ndarray) -> np.ndarray:
+    return (embeddings @ embeddings.T)[np.triu_indices(embeddings.shape[0], k=1)]
 
 
 class SemanticIndexCalibrationTests(unittest.TestCase):
@@ -28,6 +44,51 @@ class SemanticIndexCalibrationTests(unittest.TestCase):
         self.assertIn("p99", stats)
         self.assertLessEqual(stats["p99"], 1.0)
 
+    def test_exact_stats_match_percentiles_over_all_pairs(self) -> None:
+        embeddings = _normalized_embeddings(230, 12)
+        similarities = _all_pair_similarities(embeddings)
+
+        stats = compute_similarity_stats(embeddings, method="exact", block_rows=64)
+
+        self.assertEqual(stats["method"], "exact")
+        self.assertEqual(stats["samplePairs"], similarities.size)
+        for key, percentile in (("p95", 95), ("p99", 99), ("p999", 99.9)):
+            self.assertAlmostEqual(stats[key], float(np.percentile(similarities, percentile)), places=6)
+        self.assertAlmostEqual(stats["mean"], float(similarities.mean()), places=6)
+        self.assertAlmostEqual(stats["max"], float(similarities.max()), places=6)
+        self.assertEqual(build_calibration_payload(stats)["method"], "exact_all_pairs_p99_plus_margin")
+
+    def test_sampled_sketch_stats_stay_within_histogram_resolution_on_sharded_embeddings(self) -> None:
+        embeddings = _normalized_embeddings(180, 8, seed=1)
+        similarities = _all_pair_similarities(embeddings)
+        sharded = ShardedEmbeddings([embeddings[:70], embeddings[70:]])
+
+        stats = compute_similarity_stats(sharded, method="sampled_sketch", block_rows=50)
+
+        self.assertEqual(stats["method"], "sampled_sketch")
+        self.assertEqual(stats["sampleRows"], 180)
+        for key, percentile in (("p95", 95), ("p99", 99), ("p999", 99.9)):
+            self.assertLess(abs(stats[key] - float(np.percentile(similarities, percentile))), 4.0 / CALIBRATION_HISTOGRAM_BINS)
+        self.assertEqual(build_calibration_payload(stats)["method"], "sampled_rows_pair_histogram_p99_plus_margin")
+
+    def test_sampled_sketch_only_covers_pairs_of_the_row_sample_on_large_indexes(self) -> None:
+        embeddings = _normalized_embeddings(120, 8, seed=2)
+
+        with patch("backend.functions.semantic_index_calibration.CALIBRATION_SAMPLED_SKETCH_ROWS", 40):
+            stats = compute_similarity_stats(embeddings, method="sampled_sketch", block_rows=16)
+
+        self.assertEqual(stats["rows"], 120)
+        self.assertEqual(stats["sampleRows"], 40)
+        self.assertEqual(stats["samplePairs"], 40 * 39 // 2)
+
+    def test_auto_method_uses_exact_for_small_indexes_and_rejects_unknown_methods(self) -> None:
+        embeddings = _normalized_embeddings(20, 4)
+
+        self.assertEqual(compute_similarity_stats(embeddings)["method"], "exact")
+        self.assertEqual(compute_similarity_stats(embeddings, method="sample")["method"], "sample")
+        with self.assertRaises(ValueError):
+            compute_similarity_stats(embeddings, method="tdigest")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,140 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+from backend.functions import semantic_search_service
+from backend.functions.semantic_metadata_store import (
+    MetadataStoreWriter,
+    SemanticMetadataStore,
+    build_metadata_store_payload,
+    encode_metadata_store,
+    metadata_store_paths,
+)
+
+
+class SemanticMetadataStoreTests(unittest.TestCase):
+    def _rows(self) -> list[dict]:
+        return [
+            {
+                "row": 2,
+                "text": "**Recin** aplicada",
+                "text_plain": "Recin aplicada",
+                "metadata": {"title": "Recin", "source_row": 2, "chunk_index": 1, "chunk_total": 2},
+            },
+            {
+                "row": 2,
+                "text": "Tenepes diaria com acentuação.",
+                "text_plain": "Tenepes diaria com acentuação.",
+                "metadata": {"title": "Recin", "source_row": 2, "chunk_index": 2, "chunk_total": 2},
+            },
+            {"row": 7, "text": "Sem metadata", "text_plain": "Sem metadata", "metadata": {}, "book": "lo"},
+        ]
+
+    def _write_store(self, index_dir: Path, rows: list[dict]) -> None:
+        encoded = encode_metadata_store(
+            rows,
+            search_texts=[row["text_plain"].lower() for row in rows],
+            metadata_texts=[str(row["metadata"].get("title") or "").lower() for row in rows],
+        )
+        for key, path in metadata_store_paths(index_dir).items():
+            np.save(path, encoded[key])
+
+    def test_writer_streams_rows_to_the_same_layout_as_the_in_memory_encoder(self) -> None:
+        rows = self._rows() * 3
+        search_texts = [row["text_plain"].lower() for row in rows]
+        metadata_texts = [str(row["metadata"].get("title") or "").lower() for row in rows]
+        expected = encode_metadata_store(rows, search_texts=search_texts, metadata_texts=metadata_texts)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir)
+            with MetadataStoreWriter(index_dir, block_rows=2) as writer:
+                for row, search_text, metadata_text in zip(rows, search_texts, metadata_texts):
+                    writer.append(row, search_text=search_text, metadata_text=metadata_text)
+                writer.commit()
+
+            for key, path in metadata_store_paths(index_dir).items():
+                np.testing.assert_array_equal(np.load(path), expected[key])
+            self.assertEqual(list(SemanticMetadataStore.open(index_dir)), rows)
+            self.assertEqual(sorted(path.name for path in index_dir.iterdir()), sorted(path.name for path in metadata_store_paths(index_dir).values()))
+
+            with MetadataStoreWriter(index_dir) as writer:
+                writer.commit()
+            self.assertEqual(len(SemanticMetadataStore.open(index_dir)), 0)
+
+    def test_store_keeps_empty_text_plain_distinct_from_text(self) -> None:
+        rows = [
+            {"row": 3, "text": "Texto com markdown", "text_plain": "", "metadata": {}},
+            {"row": 4, "text": "", "text_plain": "", "metadata": {}},
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir)
+            self._write_store(index_dir, rows)
+
+            store = SemanticMetadataStore.open(index_dir)
+
+            self.assertEqual(store[0]["text_plain"], "")
+            self.assertEqual(store[0]["text"], "Texto com markdown")
+            self.assertEqual(store[1]["text_plain"], "")
+
+    def test_store_reads_version_one_layout_without_text_plain_flag(self) -> None:
+        rows = self._rows()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir)
+            self._write_store(index_dir, rows)
+            ints_path = metadata_store_paths(index_dir)["ints"]
+            np.save(ints_path, np.load(ints_path)[:, :4])
+
+            store = SemanticMetadataStore.open(index_dir)
+
+            self.assertEqual(store[1]["text_plain"], rows[1]["text"])
+            self.assertEqual(store[0], rows[0])
+
+    def test_store_round_trips_rows_and_columns(self) -> None:
+        rows = self._rows()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir)
+            self._write_store(index_dir, rows)
+
+            store = SemanticMetadataStore.open(index_dir)
+
+            self.assertEqual(len(store), 3)
+            self.assertEqual(store[0], rows[0])
+            self.assertEqual(store[1]["text_plain"], "Tenepes diaria com acentuação.")
+            self.assertEqual(store[-1]["book"], "lo")
+            self.assertEqual(store[2]["metadata"], {})
+            self.assertEqual(store.row_numbers.tolist(), [2, 2, 7])
+            self.assertEqual(store.int_column("chunk_index").tolist(), [1, 2, 0])
+            self.assertEqual(store.string_column("metadata_text"), ("recin", "recin", ""))
+            self.assertEqual(list(store.string_view("metadata_text")), ["recin", "recin", ""])
+            self.assertEqual(store.string_view("search_text")[-1], "sem metadata")
+            with self.assertRaises(IndexError):
+                store[3]
+
+    def test_load_semantic_index_prefers_metadata_store(self) -> None:
+        rows = self._rows()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            semantic_dir = Path(tmp_dir)
+            index_dir = semantic_dir / "alpha"
+            index_dir.mkdir()
+            (index_dir / "manifest.json").write_text(
+                json.dumps({"index_label": "Alpha", "metadata_store": build_metadata_store_payload()}),
+                encoding="utf-8",
+            )
+            np.save(index_dir / "embeddings.npy", np.eye(3, dtype=np.float16))
+            self._write_store(index_dir, rows)
+
+            with patch.object(semantic_search_service, "SEMANTIC_DIR", semantic_dir):
+                semantic_search_service._SEMANTIC_INDEX_CACHE.pop("alpha", None)
+                loaded = semantic_search_service._load_semantic_index("alpha")
+                semantic_search_service._SEMANTIC_INDEX_CACHE.pop("alpha", None)
+
+            self.assertIsInstance(loaded["metadata"], SemanticMetadataStore)
+            self.assertEqual(loaded["search_texts"][0], "recin aplicada")
+            self.assertIn("recin", loaded["metadata_postings"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,30 @@
+import asyncio
+import threading
+import time
 import unittest
 from unittest.mock import patch
 
 import numpy as np
 
-from backend.functions.semantic_search_service import search_semantic_index, search_semantic_overview_with_total
+from backend.functions import semantic_search_service
+from backend.functions.semantic_embedding_providers import EmbeddingRequestError, StubEmbeddingProvider
+from backend.functions.semantic_search_service import (
+    RERANK_CANDIDATE_CAP,
+    _adaptive_min_score,
+    _alignment_scores,
+    _build_contextual_query_variants,
+    _build_search_postings,
+    _collapse_by_source,
+    _combine_query_vectors,
+    _multi_vector_scores,
+    _resolve_query_context_and_vectors_async,
+    clear_semantic_result_cache,
+    search_semantic_index,
+    search_semantic_index_async,
+    search_semantic_index_batch,
+    search_semantic_overview_async,
+    search_semantic_overview_with_total,
+)
 
 
 class SemanticOverviewServiceTests(unittest.TestCase):
@@ -44,6 +65,263 @@ class SemanticOverviewServiceTests(unittest.TestCase):
         self.assertFalse(rag_context["usedRagContext"])
         self.assertEqual(matches[0]["text"], "**Alpha** em *Markdown*")
 
+    @patch("backend.functions.semantic_search_service._load_semantic_index")
+    @patch("backend.functions.semantic_search_service._get_semantic_query_vector")
+    def test_semantic_search_caches_results_until_index_signature_changes(
+        self,
+        mock_get_query_vector,
+        mock_load_index,
+    ) -> None:
+        clear_semantic_result_cache()
+        mock_get_query_vector.return_value = np.array([1.0, 0.0], dtype=np.float32)
+        loaded = {
+            "manifest": {"index_label": "Alpha", "model": "m1"},
+            "metadata": [{"row": 1, "text": "Alpha", "text_plain": "Alpha", "metadata": {}}],
+            "search_texts": ("alpha",),
+            "embeddings": np.array([[0.92, 0.0]], dtype=np.float32),
+            "signature": (("embeddings", (1, 10)),),
+        }
+        mock_load_index.return_value = loaded
+
+        first = search_semantic_index("alpha", "cosmoetica", limit=3, api_key="key", min_score=0.1)
+        first[5][0]["text"] = "mutado pelo chamador"
+        second = search_semantic_index("alpha", "cosmoetica", limit=3, api_key="key", min_score=0.1)
+        search_semantic_index("alpha", "cosmoetica", limit=4, api_key="key", min_score=0.1)
+        loaded["signature"] = (("embeddings", (2, 10)),)
+        search_semantic_index("alpha", "cosmoetica", limit=3, api_key="key", min_score=0.1)
+        clear_semantic_result_cache()
+
+        self.assertEqual(second[5][0]["text"], "Alpha")
+        self.assertEqual(mock_get_query_vector.call_count, 3)
+
+    @patch("backend.functions.semantic_search_service._load_semantic_index")
+    def test_semantic_batch_search_embeds_once_and_matches_single_searches(self, mock_load_index) -> None:
+        clear_semantic_result_cache()
+        texts = ["tenepes diaria", "recin continua", "gescon escrita", "tenepes e recin"]
+        embeddings = StubEmbeddingProvider(model="stub-hash-32").embed(texts)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        mock_load_index.return_value = {
+            "manifest": {"index_label": "Alpha", "model": "stub-hash-32", "embedding_provider": "stub"},
+            "metadata": [{"row": row, "text": text, "text_plain": text, "metadata": {}} for row, text in enumerate(texts, start=1)],
+            "search_texts": tuple(texts),
+            "embeddings": embeddings.astype(np.float16),
+        }
+        queries = ["tenepes", "recin", "gescon"]
+
+        with patch.object(StubEmbeddingProvider, "embed", autospec=True, side_effect=StubEmbeddingProvider.embed) as mock_embed:
+            _, effective_min_score, batch_results = search_semantic_index_batch(
+                "alpha", queries, limit=2, api_key="", min_score=0.0, exclude_lexical_duplicates=False,
+            )
+            self.assertEqual(mock_embed.call_count, 1)
+            single_results = [
+                search_semantic_index("alpha", query, limit=2, api_key="", min_score=0.0, exclude_lexical_duplicates=False)
+                for query in queries
+            ]
+
+        self.assertEqual(effective_min_score, 0.0)
+        self.assertEqual([item["query"] for item in batch_results], queries)
+        for batch_item, single in zip(batch_results, single_results):
+            self.assertEqual(batch_item["total_found"], single[0])
+            self.assertEqual([match["row"] for match in batch_item["matches"]], [match["row"] for match in single[5]])
+
+    def test_collapse_by_source_keeps_best_chunk_per_group(self) -> None:
+        scores = np.array([0.5, 0.9, 0.7, 0.4, 0.9, 0.8], dtype=np.float32)
+        source_groups = np.array([0, 0, 1, 1, 2, 2], dtype=np.int32)
+
+        eligible_positions = np.array([0, 1, 2, 4, 5])
+        representatives, group_sizes = _collapse_by_source(eligible_positions, scores[eligible_positions], source_groups)
+
+        self.assertEqual(representatives.tolist(), [1, 2, 4])
+        self.assertEqual(group_sizes.tolist(), [2, 1, 2])
+
+    @patch("backend.functions.semantic_search_service._load_semantic_index")
+    @patch("backend.functions.semantic_search_service._get_semantic_query_vector")
+    def test_semantic_search_collapses_chunks_by_source_row(
+        self,
+        mock_get_query_vector,
+        mock_load_index,
+    ) -> None:
+        clear_semantic_result_cache()
+        mock_get_query_vector.return_value = np.array([1.0, 0.0], dtype=np.float32)
+        mock_load_index.return_value = {
+            "manifest": {"index_label": "Alpha", "model": "m1"},
+            "metadata": [
+                {"row": 5, "text": "Chunk 1", "text_plain": "Chunk 1", "metadata": {"source_row": 5, "chunk_index": 1, "chunk_total": 3}},
+                {"row": 5, "text": "Chunk 2", "text_plain": "Chunk 2", "metadata": {"source_row": 5, "chunk_index": 2, "chunk_total": 3}},
+                {"row": 5, "text": "Chunk 3", "text_plain": "Chunk 3", "metadata": {"source_row": 5, "chunk_index": 3, "chunk_total": 3}},
+                {"row": 9, "text": "Outro", "text_plain": "Outro", "metadata": {}},
+            ],
+            "search_texts": ("chunk 1", "chunk 2", "chunk 3", "outro"),
+            "embeddings": np.array([[0.8, 0.0], [0.95, 0.0], [0.9, 0.0], [0.7, 0.0]], dtype=np.float32),
+        }
+
+        total, _, _, _, _, matches = search_semantic_index(
+            "alpha", "tema", limit=2, api_key="key", min_score=0.1, collapse_chunks=True,
+        )
+        _, _, _, _, _, uncollapsed = search_semantic_index("alpha", "tema", limit=2, api_key="key", min_score=0.1)
+
+        self.assertEqual(total, 2)
+        self.assertEqual([(match["row"], match["text"]) for match in matches], [(5, "Chunk 2"), (9, "Outro")])
+        self.assertEqual([match["sibling_hits"] for match in matches], [2, 0])
+        self.assertEqual([match["row"] for match in uncollapsed], [5, 5])
+        self.assertNotIn("sibling_hits", uncollapsed[0])
+
+    def test_adaptive_min_score_cuts_below_score_distribution(self) -> None:
+        background = np.random.default_rng(0).normal(0.2, 0.02, size=2000).astype(np.float32)
+        scores = np.concatenate([background, np.array([0.71, 0.69, 0.68], dtype=np.float32)])
+
+        zscore_cutoff = _adaptive_min_score(scores, "zscore")
+        knee_cutoff = _adaptive_min_score(scores, "knee")
+
+        self.assertGreater(zscore_cutoff, float(background.mean()) + 0.05)
+        self.assertLess(zscore_cutoff, 0.68)
+        self.assertGreater(knee_cutoff, float(background.max()))
+        self.assertAlmostEqual(knee_cutoff, 0.68, places=6)
+        self.assertEqual(_adaptive_min_score(np.full(50, 0.4, dtype=np.float32), "knee"), 0.0)
+
+    @patch("backend.functions.semantic_search_service._load_semantic_index")
+    @patch("backend.functions.semantic_search_service._get_semantic_query_vector")
+    def test_semantic_search_adaptive_cutoff_drops_weak_matches(
+        self,
+        mock_get_query_vector,
+        mock_load_index,
+    ) -> None:
+        clear_semantic_result_cache()
+        mock_get_query_vector.return_value = np.array([1.0, 0.0], dtype=np.float32)
+        strong = [0.92, 0.9]
+        weak = [0.31 + 0.001 * position for position in range(40)]
+        values = strong + weak
+        mock_load_index.return_value = {
+            "manifest": {"index_label": "Alpha", "model": "m1"},
+            "metadata": [{"row": row, "text": f"Texto {row}", "text_plain": f"Texto {row}", "metadata": {}} for row in range(1, len(values) + 1)],
+            "search_texts": tuple(f"texto {row}" for row in range(1, len(values) + 1)),
+            "embeddings": np.array([[value, float(np.sqrt(1.0 - value * value))] for value in values], dtype=np.float32),
+        }
+
+        static_total, _, _, static_min, _, _ = search_semantic_index(
+            "alpha", "tema", limit=50, api_key="key", min_score=0.1, exclude_lexical_duplicates=False,
+        )
+        total, _, _, applied_min, _, matches = search_semantic_index(
+            "alpha", "tema", limit=50, api_key="key", min_score=0.1, exclude_lexical_duplicates=False, score_cutoff="knee",
+        )
+
+        self.assertEqual(static_total, len(values))
+        self.assertEqual(static_min, 0.1)
+        self.assertEqual(total, 2)
+        self.assertEqual([match["row"] for match in matches], [1, 2])
+        self.assertGreater(applied_min, 0.35)
+        with self.assertRaises(ValueError):
+            search_semantic_index("alpha", "tema", limit=1, api_key="key", score_cutoff="otsu")
+
+    @patch("backend.functions.semantic_search_service._load_semantic_index")
+    @patch("backend.functions.semantic_search_service._get_semantic_query_vector")
+    def test_semantic_search_caps_rerank_candidate_pool(
+        self,
+        mock_get_query_vector,
+        mock_load_index,
+    ) -> None:
+        clear_semantic_result_cache()
+        mock_get_query_vector.return_value = np.array([1.0, 0.0], dtype=np.float32)
+        values = [0.5 + 0.004 * position for position in range(100)]
+        mock_load_index.return_value = {
+            "manifest": {"index_label": "Alpha", "model": "m1"},
+            "metadata": [{"row": row, "text": f"Texto {row}", "text_plain": f"Texto {row}", "metadata": {}} for row in range(1, len(values) + 1)],
+            "search_texts": tuple(f"texto {row}" for row in range(1, len(values) + 1)),
+            "embeddings": np.array([[value, float(np.sqrt(1.0 - value * value))] for value in values], dtype=np.float32),
+        }
+
+        with patch.object(semantic_search_service, "_alignment_scores", wraps=semantic_search_service._alignment_scores) as alignment:
+            search_semantic_index("alpha", "texto", limit=20, api_key="key", min_score=0.1, exclude_lexical_duplicates=False)
+
+        self.assertEqual(alignment.call_args.args[2].size, RERANK_CANDIDATE_CAP)
+
+    def test_multi_vector_scores_take_best_variant_per_row(self) -> None:
+        embeddings = np.array([[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]], dtype=np.float16)
+        query_matrix = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+        weights = np.array([1.0, 0.5], dtype=np.float32)
+
+        max_scores, _ = _multi_vector_scores(embeddings, query_matrix, weights, "max")
+        weighted_scores, _ = _multi_vector_scores(embeddings, query_matrix, weights, "weighted_max")
+
+        np.testing.assert_allclose(max_scores, [1.0, 1.0, 0.8], atol=1e-3)
+        np.testing.assert_allclose(weighted_scores, [1.0, 0.5, 0.6], atol=1e-3)
+
+    def test_multi_vector_threshold_offset_keeps_null_pass_rate_of_average_vector(self) -> None:
+        rng = np.random.default_rng(7)
+        embeddings = rng.normal(size=(20000, 32)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        query_matrix = rng.normal(size=(32, 4)).astype(np.float32)
+        query_matrix /= np.linalg.norm(query_matrix, axis=0, keepdims=True)
+        weights = np.array([1.0, 0.9, 0.8, 0.7], dtype=np.float32)
+        average_vector = query_matrix @ (weights / weights.sum())
+        average_vector /= np.linalg.norm(average_vector)
+        # Limiar "calibrado" para o vetor medio: deixa passar 1% das linhas sem relacao com a query.
+        recommended_min_score = float(np.percentile(embeddings @ average_vector, 99.0))
+
+        for mode in ("max", "weighted_max"):
+            scores, offset = _multi_vector_scores(embeddings, query_matrix, weights, mode)
+            self.assertGreater(offset, 0.0)
+            self.assertGreater(float(np.mean(scores >= recommended_min_score)), 0.013)
+            self.assertAlmostEqual(float(np.mean(scores >= recommended_min_score + offset)), 0.01, delta=0.003)
+
+    @patch("backend.functions.semantic_search_service._load_semantic_index")
+    def test_semantic_search_max_query_scoring_keeps_alias_matches_sharp(self, mock_load_index) -> None:
+        clear_semantic_result_cache()
+        texts = ["reciclagem intraconsciencial", "gescon escrita tarefa"]
+        embeddings = StubEmbeddingProvider(model="stub-hash-64").embed(texts)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        mock_load_index.return_value = {
+            "manifest": {"index_label": "Alpha", "model": "stub-hash-64", "embedding_provider": "stub"},
+            "metadata": [{"row": row, "text": text, "text_plain": text, "metadata": {}} for row, text in enumerate(texts, start=1)],
+            "search_texts": tuple(texts),
+            "embeddings": embeddings.astype(np.float16),
+        }
+
+        scores_by_mode = {}
+        for mode in ("average", "max", "weighted_max"):
+            _, _, _, _, _, matches = search_semantic_index(
+                "alpha", "recin", limit=1, api_key="", min_score=0.0, exclude_lexical_duplicates=False, query_scoring=mode,
+            )
+            self.assertEqual(matches[0]["row"], 1)
+            scores_by_mode[mode] = matches[0]["semantic_score"]
+
+        self.assertAlmostEqual(scores_by_mode["max"], 1.0, places=2)
+        self.assertAlmostEqual(scores_by_mode["weighted_max"], 0.72, places=2)
+        self.assertLess(scores_by_mode["average"], scores_by_mode["max"])
+        with self.assertRaises(ValueError):
+            search_semantic_index("alpha", "recin", limit=1, api_key="", query_scoring="soma")
+
+    @patch("backend.functions.semantic_search_service._load_semantic_index")
+    @patch("backend.functions.semantic_search_service._get_semantic_query_vector")
+    def test_semantic_search_reports_stage_timings_and_cache_hits(
+        self,
+        mock_get_query_vector,
+        mock_load_index,
+    ) -> None:
+        clear_semantic_result_cache()
+        mock_get_query_vector.return_value = np.array([1.0, 0.0], dtype=np.float32)
+        mock_load_index.return_value = {
+            "manifest": {"index_label": "Alpha", "model": "m1"},
+            "metadata": [{"row": 1, "text": "Alpha", "text_plain": "Alpha", "metadata": {}}],
+            "search_texts": ("alpha",),
+            "embeddings": np.array([[0.92, 0.0]], dtype=np.float32),
+            "signature": (("embeddings", (3, 10)),),
+        }
+
+        first_timings: dict = {}
+        second_timings: dict = {}
+        search_semantic_index("alpha", "cosmoetica", limit=3, api_key="key", min_score=0.1, timings=first_timings)
+        search_semantic_index("alpha", "cosmoetica", limit=3, api_key="key", min_score=0.1, timings=second_timings)
+        clear_semantic_result_cache()
+
+        self.assertTrue(
+            {"indexLoad", "ragContext", "queryEmbedding", "matmul", "lexicalFilter", "rerank", "total"}
+            <= set(first_timings["stagesMs"])
+        )
+        self.assertEqual(first_timings["cache"], {"index": False, "result": False, "queryVector": False})
+        self.assertTrue(second_timings["cache"]["result"])
+        self.assertNotIn("matmul", second_timings["stagesMs"])
+
     @patch("backend.functions.semantic_search_service._load_semantic_index")
     @patch("backend.functions.semantic_search_service._get_semantic_query_vector")
     def test_semantic_search_filters_lexical_duplicates_and_min_score(
@@ -97,6 +375,43 @@ class SemanticOverviewServiceTests(unittest.TestCase):
         self.assertFalse(rag_context["usedRagContext"])
         self.assertEqual([match["row"] for match in matches], [2])
 
+    @patch("backend.functions.semantic_search_service._load_semantic_index")
+    @patch("backend.functions.semantic_search_service._get_semantic_query_vector")
+    def test_semantic_search_uses_search_postings_for_lexical_duplicates(
+        self,
+        mock_get_query_vector,
+        mock_load_index,
+    ) -> None:
+        search_texts = (
+            "cosmoetica aplicada no dia a dia",
+            "autocosmoetica e maturidade",
+            "maturidade assistencial ampliada",
+            "cosmoetica em trecho de score baixo",
+        )
+        mock_get_query_vector.return_value = np.array([1.0, 0.0], dtype=np.float32)
+        mock_load_index.return_value = {
+            "manifest": {"index_label": "Alpha", "model": "m1"},
+            "metadata": [
+                {"row": position + 1, "text": text, "text_plain": text, "metadata": {}}
+                for position, text in enumerate(search_texts)
+            ],
+            "search_texts": search_texts,
+            "search_postings": _build_search_postings(search_texts),
+            "embeddings": np.array([[0.93, 0.0], [0.81, 0.0], [0.74, 0.0], [0.18, 0.0]], dtype=np.float32),
+        }
+
+        total, lexical_filtered_count, _, _, _, matches = search_semantic_index(
+            "alpha",
+            "cosmoetica",
+            limit=5,
+            api_key="key",
+            min_score=0.3,
+        )
+
+        self.assertEqual(total, 1)
+        self.assertEqual(lexical_filtered_count, 2)
+        self.assertEqual([match["row"] for match in matches], [3])
+
     @patch("backend.functions.semantic_search_service._load_semantic_index")
     @patch("backend.functions.semantic_search_service._get_semantic_query_vector")
     def test_semantic_search_reranks_candidate_pool_by_query_alignment(
@@ -146,6 +461,36 @@ class SemanticOverviewServiceTests(unittest.TestCase):
         self.assertGreater(matches[0]["score"], matches[0]["semantic_score"])
         self.assertGreater(matches[0]["alignment_score"], 0.0)
 
+    def test_alignment_scores_match_with_and_without_precomputed_postings(self) -> None:
+        search_texts = (
+            "trecho generico sobre assistencia e convivencia",
+            "maturidade assistencial aplicada no cotidiano",
+            "assistencial maturidade invertida",
+        )
+        metadata_texts = ("panorama geral", "maturidade assistencial", "")
+        positions = np.array([2, 0, 1], dtype=np.int64)
+
+        precomputed = _alignment_scores(
+            "maturidade assistencial",
+            ("maturidade", "assistencial"),
+            positions,
+            search_texts,
+            metadata_texts,
+            search_postings=_build_search_postings(search_texts),
+            metadata_postings=_build_search_postings(metadata_texts),
+        )
+        on_the_fly = _alignment_scores(
+            "maturidade assistencial",
+            ("maturidade", "assistencial"),
+            positions,
+            search_texts,
+            metadata_texts,
+        )
+
+        np.testing.assert_allclose(precomputed, on_the_fly)
+        self.assertEqual(int(np.argmax(precomputed)), 2)
+        self.assertEqual(float(precomputed[1]), 0.0)
+
     @patch("backend.functions.semantic_search_service.resolve_semantic_query_context")
     @patch("backend.functions.semantic_search_service._load_semantic_index")
     @patch("backend.functions.semantic_search_service._get_semantic_query_vector")
@@ -354,6 +699,77 @@ class SemanticOverviewServiceTests(unittest.TestCase):
         self.assertIs(first_cache, second_cache)
         self.assertIn("shared", first_cache)
 
+    @patch("backend.functions.semantic_search_service.list_semantic_indexes")
+    @patch("backend.functions.semantic_search_service._load_semantic_index")
+    @patch("backend.functions.semantic_search_service._get_semantic_query_vector")
+    def test_semantic_overview_parallel_mode_matches_sequential_ranking(
+        self,
+        mock_get_query_vector,
+        mock_load_index,
+        mock_list_indexes,
+    ) -> None:
+        mock_list_indexes.return_value = [
+            {"id": "alpha", "label": "Alpha", "model": "m1"},
+            {"id": "beta", "label": "Beta", "model": "m1"},
+            {"id": "broken", "label": "Broken", "model": "m1"},
+        ]
+        mock_get_query_vector.return_value = np.array([1.0, 0.0], dtype=np.float32)
+        loaded_indexes = {
+            "alpha": {
+                "manifest": {"index_label": "Alpha", "model": "m1"},
+                "metadata": [
+                    {"row": 1, "text": "alpha-1", "metadata": {}},
+                    {"row": 2, "text": "alpha-2", "metadata": {}},
+                ],
+                "search_texts": ("trecho alpha um", "trecho alpha dois"),
+                "embeddings": np.array([[0.92, 0.0], [0.51, 0.0]], dtype=np.float32),
+            },
+            "beta": {
+                "manifest": {"index_label": "Beta", "model": "m1"},
+                "metadata": [
+                    {"row": 10, "text": "beta-1", "metadata": {}},
+                    {"row": 11, "text": "beta-2", "metadata": {}},
+                ],
+                "search_texts": ("trecho beta um", "trecho beta dois"),
+                "embeddings": np.array([[0.88, 0.0], [0.51, 0.0]], dtype=np.float32),
+            },
+        }
+
+        def _load(index_id: str, semantic_dir=None) -> dict:
+            if index_id not in loaded_indexes:
+                raise ValueError("old metadata")
+            return loaded_indexes[index_id]
+
+        mock_load_index.side_effect = _load
+        results = []
+        for parallel in (False, True):
+            events = []
+            timings = {}
+            results.append(search_semantic_overview_with_total(
+                "cosmoetica",
+                limit=3,
+                api_key="key",
+                progress_callback=lambda update: events.append(update.get("event") or {}),
+                min_score=0.0,
+                parallel=parallel,
+                timings=timings,
+            ))
+            stages = sorted((event.get("indexId"), event.get("stage")) for event in events)
+            self.assertIn(("alpha", "index_completed"), stages)
+            self.assertIn(("beta", "index_started"), stages)
+            self.assertIn(("broken", "error"), stages)
+            self.assertEqual(sorted(timings["indexes"]), ["alpha", "beta"])
+            self.assertIn("matmul", timings["stagesMs"])
+            self.assertTrue(all("timings" in event for event in events if event.get("stage") == "index_completed"))
+
+        sequential, parallel_result = results
+        self.assertEqual(parallel_result[:6], sequential[:6])
+        self.assertEqual(
+            [[match["text"] for match in group["matches"]] for group in parallel_result[6]],
+            [["alpha-1", "alpha-2"], ["beta-1"]],
+        )
+        self.assertEqual(parallel_result[6], sequential[6])
+
     @patch("backend.functions.semantic_search_service.list_semantic_indexes")
     @patch("backend.functions.semantic_search_service._load_semantic_index")
     @patch("backend.functions.semantic_search_service._get_semantic_query_vector")
@@ -442,6 +858,212 @@ class SemanticOverviewServiceTests(unittest.TestCase):
         self.assertEqual(rag_context["references"], ["WVBooks"])
         self.assertEqual(len(groups), 1)
 
+    @patch("backend.functions.semantic_search_service.resolve_semantic_query_context")
+    @patch("backend.functions.semantic_search_service._aembed_query_texts")
+    def test_async_query_vectors_embed_base_variants_while_rag_resolves(
+        self,
+        mock_aembed_query_texts,
+        mock_resolve_semantic_query_context,
+    ) -> None:
+        mock_resolve_semantic_query_context.return_value = {
+            "usedRagContext": True,
+            "sourceQuery": "tenepes",
+            "vectorStoreIds": ["vs_123"],
+            "definitions": [],
+            "relatedTerms": [],
+            "disambiguatedQuery": "tenepes no contexto da assistencialidade",
+            "references": [],
+        }
+        embedded_batches: list[list[str]] = []
+
+        async def _fake_embed(texts: list[str], *, api_key: str, model: str) -> np.ndarray:
+            embedded_batches.append(list(texts))
+            return np.asarray([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+        mock_aembed_query_texts.side_effect = _fake_embed
+        rag_payload = mock_resolve_semantic_query_context.return_value
+
+        def _slow_rag(*_args, **_kwargs):
+            time.sleep(0.05)
+            return rag_payload
+
+        mock_resolve_semantic_query_context.side_effect = _slow_rag
+        timings: dict = {}
+
+        rag_context, query_cache, embedding_errors = asyncio.run(_resolve_query_context_and_vectors_async(
+            "tenepes",
+            api_key="key",
+            models=["m1", "m1"],
+            use_rag_context=True,
+            vector_store_ids=["vs_123"],
+            timings=timings,
+        ))
+
+        variants = _build_contextual_query_variants("tenepes", rag_context)
+        expected = _combine_query_vectors(
+            np.asarray([[float(len(text)), 1.0] for text, _ in variants], dtype=np.float32),
+            variants,
+        )
+        self.assertTrue(rag_context["usedRagContext"])
+        self.assertEqual(embedding_errors, {})
+        self.assertEqual(len(embedded_batches), 2)
+        self.assertEqual(embedded_batches[1], ["tenepes no contexto da assistencialidade"])
+        vector_key = "m1::" + "||".join(text for text, _ in variants)
+        self.assertEqual(list(query_cache), [vector_key, f"{vector_key}::multi"])
+        np.testing.assert_allclose(query_cache[vector_key], expected, rtol=1e-6)
+        self.assertEqual(query_cache[f"{vector_key}::multi"].shape, (2, len(variants)))
+        self.assertEqual(set(timings["stagesMs"]), {"ragContext", "queryEmbedding"})
+        self.assertGreaterEqual(timings["stagesMs"]["ragContext"], 45.0)
+        self.assertLess(timings["stagesMs"]["queryEmbedding"], timings["stagesMs"]["ragContext"])
+
+    @patch("backend.functions.semantic_search_service._score_matches")
+    @patch("backend.functions.semantic_search_service._resolve_query_scores")
+    @patch("backend.functions.semantic_search_service._resolve_query_context_and_vectors_async")
+    @patch("backend.functions.semantic_search_service._load_semantic_index")
+    def test_cancelled_async_search_stops_scoring_thread_between_stages(
+        self,
+        mock_load_index,
+        mock_resolve_context,
+        mock_resolve_query_scores,
+        mock_score_matches,
+    ) -> None:
+        clear_semantic_result_cache()
+        mock_load_index.return_value = {
+            "manifest": {"index_label": "Alpha", "model": "m1"},
+            "metadata": [{"row": 1, "text": "Alpha", "metadata": {}}],
+            "search_texts": ("alpha",),
+            "embeddings": np.array([[1.0, 0.0]], dtype=np.float32),
+        }
+
+        async def _fake_context(*args, **kwargs):
+            return {"usedRagContext": False}, {}, {}
+
+        mock_resolve_context.side_effect = _fake_context
+        scoring_started = threading.Event()
+        release = threading.Event()
+
+        def _blocking_scores(*args, **kwargs):
+            scoring_started.set()
+            release.wait(5)
+            return np.array([1.0, 0.0], dtype=np.float32), None, 0.0, None
+
+        mock_resolve_query_scores.side_effect = _blocking_scores
+
+        async def _run() -> None:
+            task = asyncio.create_task(search_semantic_index_async("alpha", "cosmoetica", limit=3, api_key="key"))
+            await asyncio.to_thread(scoring_started.wait, 5)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            release.set()
+
+        # asyncio.run so retorna depois que o executor padrao termina a thread de scoring.
+        asyncio.run(_run())
+
+        mock_score_matches.assert_not_called()
+
+    @patch("backend.functions.semantic_search_service.list_semantic_indexes")
+    @patch("backend.functions.semantic_search_service._load_semantic_index")
+    @patch("backend.functions.semantic_search_service._aembed_query_texts")
+    def test_semantic_overview_async_reports_failing_provider_per_index(
+        self,
+        mock_aembed_query_texts,
+        mock_load_index,
+        mock_list_indexes,
+    ) -> None:
+        stub = StubEmbeddingProvider(model="stub-hash-16")
+        mock_list_indexes.return_value = [
+            {"id": "alpha", "label": "Alpha", "model": "m1", "embeddingProvider": "openai"},
+            {"id": "beta", "label": "Beta", "model": "stub-hash-16", "embeddingProvider": "stub"},
+        ]
+        beta_embeddings = stub.embed(["tenepes diaria", "outro assunto"])
+        beta_embeddings /= np.linalg.norm(beta_embeddings, axis=1, keepdims=True)
+        loaded = {
+            "alpha": {
+                "manifest": {"index_label": "Alpha", "model": "m1"},
+                "metadata": [{"row": 1, "text": "alpha", "metadata": {}}],
+                "search_texts": ("alpha",),
+                "embeddings": np.array([[1.0, 0.0]], dtype=np.float32),
+            },
+            "beta": {
+                "manifest": {"index_label": "Beta", "model": "stub-hash-16", "embedding_provider": "stub"},
+                "metadata": [{"row": 5, "text": "tenepes diaria", "metadata": {}}, {"row": 6, "text": "outro assunto", "metadata": {}}],
+                "search_texts": ("tenepes diaria", "outro assunto"),
+                "embeddings": beta_embeddings,
+            },
+        }
+        mock_load_index.side_effect = lambda index_id, semantic_dir=None: loaded[index_id]
+
+        async def _fake_embed(texts, *, api_key, model, provider=None):
+            if provider is None:
+                raise EmbeddingRequestError("Falha ao gerar embeddings: HTTP 503", status_code=503)
+            return stub.embed(texts)
+
+        mock_aembed_query_texts.side_effect = _fake_embed
+        events: list[dict] = []
+
+        total_indexes, total, _, _, _, _, groups = asyncio.run(search_semantic_overview_async(
+            "tenepes",
+            limit=5,
+            api_key="key",
+            progress_callback=lambda update: events.append(update.get("event") or {}),
+            min_score=0.5,
+            exclude_lexical_duplicates=False,
+        ))
+
+        self.assertEqual(total_indexes, 2)
+        self.assertEqual(total, 1)
+        self.assertEqual([group["indexId"] for group in groups], ["beta"])
+        errors = [event for event in events if event.get("stage") == "error"]
+        self.assertEqual([event["indexId"] for event in errors], ["alpha"])
+        self.assertIn("HTTP 503", errors[0]["note"])
+        self.assertEqual(sum(1 for call in mock_aembed_query_texts.call_args_list if "provider" not in call.kwargs), 1)
+
+    @patch("backend.functions.semantic_search_service.list_semantic_indexes")
+    @patch("backend.functions.semantic_search_service._load_semantic_index")
+    @patch("backend.functions.semantic_search_service._get_semantic_query_vector")
+    def test_semantic_overview_parallel_serializes_progress_callback(
+        self,
+        mock_get_query_vector,
+        mock_load_index,
+        mock_list_indexes,
+    ) -> None:
+        index_ids = [f"base{position}" for position in range(6)]
+        mock_list_indexes.return_value = [{"id": index_id, "label": index_id, "model": "m1"} for index_id in index_ids]
+        mock_get_query_vector.return_value = np.array([1.0, 0.0], dtype=np.float32)
+        mock_load_index.side_effect = lambda index_id, semantic_dir=None: {
+            "manifest": {"index_label": index_id, "model": "m1"},
+            "metadata": [{"row": 1, "text": index_id, "metadata": {}}],
+            "search_texts": (index_id,),
+            "embeddings": np.array([[0.9, 0.0]], dtype=np.float32),
+        }
+        state = {"active": 0, "max_active": 0, "calls": 0}
+        state_lock = threading.Lock()
+
+        def _progress(update: dict) -> None:
+            with state_lock:
+                state["active"] += 1
+                state["calls"] += 1
+                state["max_active"] = max(state["max_active"], state["active"])
+            time.sleep(0.005)
+            with state_lock:
+                state["active"] -= 1
+
+        total_indexes, total, *_ = search_semantic_overview_with_total(
+            "tema",
+            limit=10,
+            api_key="key",
+            progress_callback=_progress,
+            min_score=0.0,
+            exclude_lexical_duplicates=False,
+            parallel=True,
+            max_workers=4,
+        )
+
+        self.assertEqual((total_indexes, total), (6, 6))
+        self.assertEqual(state["calls"], 12)
+        self.assertEqual(state["max_active"], 1)
+
     @patch("backend.functions.semantic_search_service.list_semantic_indexes")
     def test_semantic_overview_returns_empty_when_no_indexes(self, mock_list_indexes) -> None:
         mock_list_indexes.return_value = []
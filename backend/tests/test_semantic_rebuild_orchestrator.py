@@ -0,0 +1,61 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from backend.functions.semantic_rebuild_orchestrator import rebuild_semantic_indexes
+
+
+class SemanticRebuildOrchestratorTests(unittest.TestCase):
+    def _write_index(self, index_dir: Path, texts: list[str]) -> None:
+        index_dir.mkdir(parents=True, exist_ok=True)
+        (index_dir / "manifest.json").write_text(json.dumps({"index_label": index_dir.name.upper()}), encoding="utf-8")
+        (index_dir / "metadata.json").write_text(
+            json.dumps([
+                {"row": position + 2, "text": text, "text_plain": text, "metadata": {}}
+                for position, text in enumerate(texts)
+            ]),
+            encoding="utf-8",
+        )
+
+    def test_rebuilds_indexes_in_parallel_and_writes_consolidated_report(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            self._write_index(root / "alpha", ["Tenepes diaria.", "Recin continua."])
+            self._write_index(root / "beta", ["Proexis completada."])
+            (root / "broken").mkdir()
+            report_path = root / "report.json"
+
+            report = rebuild_semantic_indexes(
+                [root / "alpha", root / "beta", root / "broken"],
+                api_key="",
+                provider="stub",
+                max_parallel_indexes=2,
+                prepare_workers=2,
+                report_path=report_path,
+            )
+
+            stored = json.loads(report_path.read_text(encoding="utf-8"))
+            self.assertEqual(stored, report)
+            self.assertEqual([entry["indexId"] for entry in report["indexes"]], ["alpha", "beta", "broken"])
+            alpha, beta, broken = report["indexes"]
+            self.assertEqual((alpha["status"], alpha["rowsBefore"], alpha["chunks"]), ("ok", 2, 2))
+            self.assertEqual((beta["status"], beta["chunks"], beta["embeddedChunks"]), ("ok", 1, 1))
+            self.assertGreater(alpha["estimatedTokens"], 0)
+            self.assertGreaterEqual(alpha["elapsedMs"], alpha["prepareMs"])
+            self.assertEqual((broken["status"], broken["stage"]), ("error", "prepare"))
+            self.assertEqual(report["totals"], {
+                "indexes": 3,
+                "failed": 1,
+                "rowsBefore": 3,
+                "chunks": 3,
+                "embeddedChunks": 3,
+                "estimatedTokens": alpha["estimatedTokens"] + beta["estimatedTokens"],
+            })
+            self.assertEqual(np.load(root / "alpha" / "embeddings.npy").shape, (2, 256))
+
+
+if __name__ == "__main__":
+    unittest.main()
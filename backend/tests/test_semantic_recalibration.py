@@ -0,0 +1,54 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from backend.functions.semantic_recalibration import recalibrate_semantic_manifests
+
+
+class SemanticRecalibrationTests(unittest.TestCase):
+    def _write_index(self, index_dir: Path, rows: int, seed: int) -> None:
+        index_dir.mkdir(parents=True, exist_ok=True)
+        embeddings = np.random.default_rng(seed).normal(size=(rows, 16)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.save(index_dir / "embeddings.npy", embeddings.astype(np.float16))
+        (index_dir / "manifest.json").write_text(
+            json.dumps({"index_label": index_dir.name.upper(), "recommended_min_score": 0.9}),
+            encoding="utf-8",
+        )
+
+    def test_recalibrates_indexes_in_parallel_and_reports_threshold_diff(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            self._write_index(root / "alpha", 40, seed=1)
+            self._write_index(root / "beta", 25, seed=2)
+            (root / "broken").mkdir()
+            progress: list[str] = []
+
+            report = recalibrate_semantic_manifests(
+                [root / "alpha", root / "beta", root / "broken"],
+                workers=2,
+                progress_callback=lambda entry: progress.append(entry["indexId"]),
+            )
+
+            self.assertEqual(sorted(progress), ["alpha", "beta", "broken"])
+            self.assertEqual([entry["indexId"] for entry in report["indexes"]], ["alpha", "beta", "broken"])
+            self.assertEqual(report["failed"], 1)
+            alpha, beta, broken = report["indexes"]
+            self.assertEqual(broken["status"], "error")
+            for entry in (alpha, beta):
+                manifest = json.loads((root / entry["indexId"] / "manifest.json").read_text(encoding="utf-8"))
+                self.assertEqual(entry["previousMinScore"], 0.9)
+                self.assertIsNone(entry["previousP99"])
+                self.assertEqual(entry["method"], "exact")
+                self.assertEqual(manifest["recommended_min_score"], entry["recommendedMinScore"])
+                self.assertEqual(manifest["score_calibration"]["method"], "exact_all_pairs_p99_plus_margin")
+                self.assertGreaterEqual(entry["elapsedMs"], 0.0)
+            self.assertEqual(alpha["rows"], 40)
+            self.assertEqual(list((root / "alpha").glob("*.tmp")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+from backend.functions import semantic_search_service
+from backend.functions.semantic_metadata_store import build_metadata_store_payload, encode_metadata_store, metadata_store_paths
+from backend.functions.semantic_search_text import (
+    SearchPostings,
+    encode_search_postings,
+    has_search_postings,
+    metadata_search_texts,
+    row_search_text,
+    search_postings_paths,
+)
+
+
+class SemanticSearchTextTests(unittest.TestCase):
+    def test_row_and_metadata_search_texts_are_normalized(self) -> None:
+        rows = [
+            {"text": "**Recin** Aplicada", "metadata": {"title": "Tenepes", "tags": ["Gescon"]}},
+            {"text_plain": "Sem metadata"},
+        ]
+
+        self.assertEqual(row_search_text(rows[0]), "recin aplicada")
+        self.assertEqual(metadata_search_texts(rows), ("tenepes gescon", ""))
+
+    def test_postings_lookup_matches_in_memory_and_persisted(self) -> None:
+        texts = ("recin aplicada", "tenepes diaria recin", "", "ação")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_dir = Path(tmp_dir)
+            encoded = encode_search_postings(texts)
+            for key, path in search_postings_paths(index_dir, "search").items():
+                np.save(path, encoded[key])
+
+            self.assertTrue(has_search_postings(index_dir, "search"))
+            self.assertFalse(has_search_postings(index_dir, "metadata"))
+            for postings in (SearchPostings.build(texts), SearchPostings.deferred(texts), SearchPostings.open(index_dir, "search")):
+                self.assertEqual(len(postings), 5)
+                self.assertEqual(postings.get("recin").tolist(), [0, 1])
+                self.assertEqual(postings.get("ação").tolist(), [3])
+                self.assertIsNone(postings.get("rec"))
+                self.assertIn("diaria", postings)
+                self.assertNotIn("zeta", postings)
+
+    def test_substring_mask_matches_tokens_containing_fragment(self) -> None:
+        texts = ("recin aplicada", "tenepes diaria", "precinto", "ação reação", "")
+        postings = SearchPostings.build(texts)
+
+        self.assertEqual(np.flatnonzero(postings.substring_mask("recin", len(texts))).tolist(), [0, 2])
+        self.assertEqual(np.flatnonzero(postings.substring_mask("ação", len(texts))).tolist(), [3])
+        self.assertEqual(np.flatnonzero(postings.substring_mask("a", len(texts))).tolist(), [0, 1, 3])
+        self.assertFalse(postings.substring_mask("s d", len(texts)).any())
+        self.assertFalse(postings.substring_mask("zeta", len(texts)).any())
+        self.assertIs(postings.substring_mask("recin", len(texts)), postings.substring_mask("recin", len(texts)))
+
+    def test_load_semantic_index_opens_persisted_postings(self) -> None:
+        rows = [
+            {"row": 2, "text": "Recin aplicada", "text_plain": "Recin aplicada", "metadata": {"title": "Recin"}},
+            {"row": 3, "text": "Tenepes", "text_plain": "Tenepes", "metadata": {}},
+        ]
+        search_texts = tuple(row_search_text(row) for row in rows)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            semantic_dir = Path(tmp_dir)
+            index_dir = semantic_dir / "alpha"
+            index_dir.mkdir()
+            (index_dir / "manifest.json").write_text(
+                json.dumps({"index_label": "Alpha", "metadata_store": build_metadata_store_payload()}),
+                encoding="utf-8",
+            )
+            np.save(index_dir / "embeddings.npy", np.eye(2, dtype=np.float16))
+            encoded = encode_metadata_store(rows, search_texts=search_texts, metadata_texts=metadata_search_texts(rows))
+            for key, path in metadata_store_paths(index_dir).items():
+                np.save(path, encoded[key])
+            postings = encode_search_postings(search_texts)
+            for key, path in search_postings_paths(index_dir, "search").items():
+                np.save(path, postings[key])
+
+            with patch.object(semantic_search_service, "SEMANTIC_DIR", semantic_dir):
+                semantic_search_service._SEMANTIC_INDEX_CACHE.pop("alpha", None)
+                loaded = semantic_search_service._load_semantic_index("alpha")
+                semantic_search_service._SEMANTIC_INDEX_CACHE.pop("alpha", None)
+
+            self.assertIsInstance(loaded["search_postings"].arrays()["positions"], np.memmap)
+            self.assertEqual(loaded["search_postings"].get("tenepes").tolist(), [1])
+            self.assertEqual(loaded["metadata_postings"].get("recin").tolist(), [0])
+
+
+if __name__ == "__main__":
+    unittest.main()